@@ -47,6 +47,25 @@ app.conf.beat_schedule = {
         'task': 'planning.tasks.send_deadline_notification',
         'schedule': crontab(minute='*/15'),  # Toutes les 15 minutes
     },
+    # Snapshots KPI du dashboard (toutes les nuits à 00h30)
+    'refresh-daily-kpis': {
+        'task': 'admin_platform.tasks.refresh_daily_kpis',
+        'schedule': crontab(hour=0, minute=30),
+    },
+    # Agrégats mensuels des ventes (toutes les nuits à 00h45)
+    'refresh-sales-rollup': {
+        'task': 'admin_platform.tasks.refresh_sales_rollup',
+        'schedule': crontab(hour=0, minute=45),
+    },
+    # Purge des rapports générés expirés (toutes les nuits à 03h00)
+    'purge-report-jobs': {
+        'task': 'admin_platform.tasks.purge_report_jobs',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'retry-pending-invoice-pdfs': {
+        'task': 'invoices.tasks.retry_pending_invoice_pdfs',
+        'schedule': crontab(minute='*/30'),
+    },
 }
 
 # Fuseau horaire pour les tâches planifiées
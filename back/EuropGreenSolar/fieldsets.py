@@ -0,0 +1,115 @@
+"""
+Champs à la demande des listes et fiches (?fields= / ?expand=).
+
+En lecture (GET), un serializer `SparseFieldsetMixin` racine (objet ou élément
+d'une liste) accepte :
+
+    ?fields=id,status,offer   ne renvoie que ces champs ("id" est toujours servi)
+    ?expand=technical_visit   ajoute des champs détaillés, absents par défaut
+
+Sans paramètre, la représentation est inchangée. Les serializers imbriqués et
+les écritures ne sont pas concernés.
+
+Les relations chargées suivent les champs servis : chaque champ déclare dans
+`field_relations` ses `select_related` / `prefetch_related`, appliqués au
+queryset par `SparseFieldsetViewMixin.filter_queryset`. Une liste réduite à
+quelques colonnes ne paie donc ni jointure ni préchargement inutiles, et un
+champ étendu reste sans N+1.
+"""
+
+from collections import namedtuple
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+# Champ toujours servi, même absent de ?fields= (clé des lignes côté front)
+ALWAYS_SERVED = ('id',)
+
+# Relations à charger quand un champ est servi (chemins de select_related / prefetch_related)
+Relations = namedtuple('Relations', ['select', 'prefetch'], defaults=[(), ()])
+
+
+def query_names(request, param):
+    """Noms d'une liste séparée par des virgules (?fields=a,b&fields=c), dans l'ordre."""
+    if request is None or request.method not in SAFE_METHODS:
+        return []
+    names = []
+    for value in request.query_params.getlist(param):
+        for name in value.split(','):
+            name = name.strip()
+            if name and name not in names:
+                names.append(name)
+    return names
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer à champs réduits (?fields=) ou étendus (?expand=).
+
+    expandable_fields : {nom: (classe de serializer, kwargs)} ajoutés sur ?expand=
+    field_relations   : {nom: Relations(select=..., prefetch=...)} à charger quand
+                        le champ est servi
+    """
+
+    expandable_fields = {}
+    field_relations = {}
+
+    def _is_root(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS or not self._is_root():
+            return fields
+
+        for name in query_names(request, EXPAND_PARAM):
+            if name in self.expandable_fields:
+                serializer_class, kwargs = self.expandable_fields[name]
+                fields[name] = serializer_class(read_only=True, **kwargs)
+
+        requested = query_names(request, FIELDS_PARAM)
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested or name in ALWAYS_SERVED}
+        return fields
+
+    @classmethod
+    def serves_field(cls, request, name):
+        """Le champ `name` figure-t-il dans la réponse à `request` ?"""
+        requested = query_names(request, FIELDS_PARAM)
+        if requested and name not in requested and name not in ALWAYS_SERVED:
+            return False
+        if name in cls.expandable_fields:
+            return name in query_names(request, EXPAND_PARAM)
+        return True
+
+    @classmethod
+    def queryset_relations(cls, request):
+        """(select_related, prefetch_related) des champs servis pour `request`."""
+        select, prefetch = [], []
+        for name, relations in cls.field_relations.items():
+            if not cls.serves_field(request, name):
+                continue
+            select.extend(path for path in relations.select if path not in select)
+            prefetch.extend(lookup for lookup in relations.prefetch if lookup not in prefetch)
+        return select, prefetch
+
+
+class SparseFieldsetViewMixin:
+    """Charge les relations des champs servis par le serializer de l'action."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, SparseFieldsetMixin):
+            return queryset
+        select, prefetch = serializer_class.queryset_relations(self.request)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
@@ -0,0 +1,173 @@
+"""
+Pagination par curseur (keyset) des listes principales.
+
+Les pages sont découpées sur le couple (created_at, id), du plus récent au plus
+ancien : le curseur mémorise la dernière ligne servie et la page suivante est
+lue par `WHERE (created_at, id) < (curseur)` via l'index (created_at, id).
+Le coût d'une page ne dépend donc ni de sa position ni de la taille de la table,
+et une ligne insérée entre deux pages n'entraîne ni doublon ni saut.
+
+Réponse paginée :
+    {"next": url|null, "previous": url|null, "results": [...]}
+    + "count" si ?with_count=true (COUNT(*) sur le queryset filtré, en option
+      car il redevient proportionnel à la taille de la table)
+
+Activation : la pagination s'applique dès que la requête porte `cursor` ou
+`page_size`. Sans eux, la liste complète est renvoyée comme avant (tableau JSON)
+tant que LIST_PAGINATION_REQUIRED est à False, le temps de migrer le front.
+
+Recherche : l'ordre (created_at, id) est imposé par le curseur. Une liste
+paginée filtrée par `?search=` n'est donc pas classée par pertinence ; les vues
+le signalent à `search_queryset(..., ranked=False)` via `is_active`, ce qui
+évite aussi de calculer un `search_rank` que la pagination écarterait.
+"""
+
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination keyset sur (created_at, id), ordre décroissant stable.
+
+    Paramètres : cursor, page_size (défaut 50, max 500), with_count=true.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'with_count'
+    # (horodatage, départage) : toutes les listes paginées ont une clé primaire UUID
+    ordering_fields = ('created_at', 'id')
+    tie_type = uuid.UUID
+    # True : pagine même sans cursor / page_size (sinon LIST_PAGINATION_REQUIRED)
+    always_paginate = False
+    invalid_cursor_message = 'Curseur invalide'
+
+    def is_active(self, request):
+        """La requête sera paginée (et donc triée par (created_at, id))."""
+        if self.always_paginate or getattr(settings, 'LIST_PAGINATION_REQUIRED', False):
+            return True
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_active(request):
+            return None
+
+        params = request.query_params
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = queryset.count() if params.get(self.count_query_param) == 'true' else None
+
+        position, reverse = self.decode_cursor(params.get(self.cursor_query_param))
+        field, tie = self.ordering_fields
+        if position is None:
+            queryset = queryset.order_by(f'-{field}', f'-{tie}')
+        elif reverse:
+            # Page précédente : lecture ascendante depuis le curseur, puis remise dans l'ordre
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': position[0]}) | Q(**{field: position[0], f'{tie}__gt': position[1]})
+            ).order_by(field, tie)
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{field}__lt': position[0]}) | Q(**{field: position[0], f'{tie}__lt': position[1]})
+            ).order_by(f'-{field}', f'-{tie}')
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Sens de lecture : `has_more` concerne la direction parcourue
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None and (has_more if reverse else True)
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    # ------------------------------------------------------------------
+    # Curseurs
+    # ------------------------------------------------------------------
+
+    def encode_cursor(self, obj, reverse):
+        field, tie = self.ordering_fields
+        raw = json.dumps([getattr(obj, field).isoformat(), str(getattr(obj, tie)), int(reverse)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, encoded):
+        """Retourne ((created_at, id), reverse), ou (None, False) pour la première page."""
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            value, tie, reverse = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            return (datetime.fromisoformat(value), self.tie_type(tie)), bool(reverse)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _link(self, obj, reverse):
+        url = replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(obj, reverse))
+        return remove_query_param(url, self.count_query_param) if self.count is not None else url
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'description': 'Présent avec ?with_count=true'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {'name': self.cursor_query_param, 'required': False, 'in': 'query',
+             'description': 'Curseur de page (liens next / previous)', 'schema': {'type': 'string'}},
+            {'name': self.page_size_query_param, 'required': False, 'in': 'query',
+             'description': f'Taille de page (défaut {self.page_size}, max {self.max_page_size})',
+             'schema': {'type': 'integer'}},
+            {'name': self.count_query_param, 'required': False, 'in': 'query',
+             'description': 'true pour inclure le nombre total de résultats', 'schema': {'type': 'boolean'}},
+        ]
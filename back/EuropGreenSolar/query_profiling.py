@@ -0,0 +1,110 @@
+"""
+Instrumentation des requêtes SQL et de la latence par vue.
+
+`QueryProfilingMiddleware` mesure pour chaque requête HTTP :
+- le nombre de requêtes SQL et leur durée cumulée ;
+- le temps total de traitement (hors consommation d'une réponse en streaming) ;
+- la vue appelée, sous la forme "ViewSet.action" (ex : "OfferViewSet.list").
+
+Les mesures sont attachées à la réponse (`response.query_stats`, utilisé par
+les budgets des tests, voir `EuropGreenSolar.testing`) et, hors production,
+exposées dans l'en-tête `Server-Timing` (onglet Réseau du navigateur).
+Les requêtes dépassant QUERY_PROFILING_WARN_QUERIES ou
+QUERY_PROFILING_WARN_MS sont journalisées.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Compte les requêtes SQL et leur durée cumulée.
+
+    Branché via `connection.execute_wrapper` : contrairement à
+    CaptureQueriesContext, ne conserve pas le SQL et n'a pas de limite
+    de 9000 requêtes (listes en N+1).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+def view_label(request):
+    """
+    Nom lisible de la vue résolue : "ViewSet.action" pour DRF, nom de route sinon.
+
+    Retourne None si l'URL n'a pas été résolue (404).
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if view_class is None:
+        return match.view_name
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f"{view_class.__name__}.{action}"
+
+
+class QueryProfilingMiddleware:
+    """
+    Mesure requêtes SQL, temps SQL et temps total de chaque requête HTTP.
+
+    À placer en tête de MIDDLEWARE pour inclure le coût des autres middlewares
+    (authentification JWT, auditlog).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.server_timing = getattr(settings, 'SERVER_TIMING_HEADERS', settings.DEBUG)
+        self.warn_queries = getattr(settings, 'QUERY_PROFILING_WARN_QUERIES', 50)
+        self.warn_ms = getattr(settings, 'QUERY_PROFILING_WARN_MS', 1000)
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with connection.execute_wrapper(stats):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        label = view_label(request)
+        response.query_stats = {
+            'view': label,
+            'queries': stats.count,
+            'db_ms': stats.duration_ms,
+            'total_ms': total_ms,
+        }
+
+        if self.server_timing:
+            response['Server-Timing'] = (
+                f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries", '
+                f'app;dur={total_ms - stats.duration_ms:.1f}, '
+                f'total;dur={total_ms:.1f}'
+            )
+
+        if stats.count >= self.warn_queries or total_ms >= self.warn_ms:
+            logger.warning(
+                "%s %s (%s) : %d requêtes SQL, %.1f ms SQL, %.1f ms au total",
+                request.method, request.path, label, stats.count, stats.duration_ms, total_ms,
+            )
+        return response
@@ -0,0 +1,184 @@
+"""
+Recherche plein texte tolérante (accents, casse, fautes de frappe) des listes.
+
+Sous PostgreSQL, chaque modèle recherché possède un "document" : ses champs
+texte concaténés, sans accents et en majuscules. Un index GIN trigrammes
+(extension pg_trgm) porte exactement cette expression :
+
+    upper(egs_unaccent(coalesce(first_name, '') || ' ' || coalesce(email, '') ...))
+
+Une recherche retient les lignes dont le document contient le terme (LIKE,
+servi par l'index) ou lui ressemble assez (opérateur %> de pg_trgm, pour les
+fautes de frappe), et les classe par `word_similarity` (annotation
+`search_rank`), sauf sous pagination keyset qui impose l'ordre (created_at, id). `egs_unaccent` est une enveloppe IMMUTABLE de `unaccent`,
+condition pour l'utiliser dans un index.
+
+Sous SQLite (développement), la recherche reste un OU de `icontains` sur les
+mêmes champs, sans classement.
+
+Les index sont créés par l'opération de migration `CreateSearchIndex`, sans
+effet hors PostgreSQL. L'expression du document doit rester identique entre
+la migration et les vues : ajouter un champ demande une nouvelle migration.
+"""
+
+from django.db import connections
+from django.db.migrations.operations.base import Operation
+from django.db.models import BooleanField, F, FloatField, Func, Q, TextField
+from django.db.models.functions import Greatest
+
+
+UNACCENT_FUNCTION = 'egs_unaccent'
+
+SEARCH_SETUP_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    # unaccent() est STABLE (dictionnaire modifiable) : enveloppe IMMUTABLE pour l'indexer
+    f"""
+    CREATE OR REPLACE FUNCTION {UNACCENT_FUNCTION}(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$
+    """,
+]
+
+
+def document_sql(columns):
+    """Expression SQL du document à partir de colonnes déjà compilées."""
+    joined = " || ' ' || ".join(f"COALESCE({column}, '')" for column in columns)
+    return f"upper({UNACCENT_FUNCTION}({joined}))"
+
+
+def term_sql():
+    """Terme recherché, normalisé comme le document."""
+    return f"upper({UNACCENT_FUNCTION}(%s))"
+
+
+class SearchDocument(Func):
+    """Document recherchable d'un modèle (voir le docstring du module)."""
+
+    output_field = TextField()
+
+    def __init__(self, *fields):
+        super().__init__(*(F(field) for field in fields))
+
+    def as_sql(self, compiler, connection, **extra_context):
+        columns, params = [], []
+        for expression in self.get_source_expressions():
+            sql, expression_params = compiler.compile(expression)
+            columns.append(sql)
+            params.extend(expression_params)
+        return document_sql(columns), params
+
+
+class SearchMatch(Func):
+    """Le document contient le terme, ou lui ressemble (similarité de mots pg_trgm)."""
+
+    output_field = BooleanField()
+
+    def __init__(self, document, term):
+        super().__init__(document)
+        self.term = term
+
+    def as_sql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.get_source_expressions()[0])
+        escaped = self.term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        sql = (
+            f"({document} LIKE '%%' || {term_sql()} || '%%' "
+            f"OR {document} %%> {term_sql()})"
+        )
+        return sql, (*params, escaped, *params, self.term)
+
+
+class SearchRank(Func):
+    """Pertinence du document pour le terme (0 à 1)."""
+
+    output_field = FloatField()
+
+    def __init__(self, document, term):
+        super().__init__(document)
+        self.term = term
+
+    def as_sql(self, compiler, connection, **extra_context):
+        document, params = compiler.compile(self.get_source_expressions()[0])
+        return f"word_similarity({term_sql()}, {document})", (self.term, *params)
+
+
+def search_queryset(queryset, term, *documents, ranked=True):
+    """
+    Filtre `queryset` sur `term` dans un ou plusieurs documents.
+
+    Chaque document est un tuple de chemins de champs d'une même table, indexé
+    par une migration `CreateSearchIndex` (ex : ('first_name', 'last_name', 'email'),
+    ('client__first_name', 'client__last_name')). Sous PostgreSQL, les résultats
+    sont annotés `search_rank` et triés par pertinence décroissante.
+
+    `ranked=False` filtre sans classer : à passer quand l'ordre est imposé
+    ailleurs, comme par la pagination keyset (`KeysetPagination.is_active`).
+    """
+    term = (term or '').strip()
+    if not term:
+        return queryset
+
+    if connections[queryset.db].vendor != 'postgresql':
+        condition = Q()
+        for fields in documents:
+            for field in fields:
+                condition |= Q(**{f'{field}__icontains': term})
+        return queryset.filter(condition)
+
+    matches = Q()
+    ranks = []
+    for fields in documents:
+        document = SearchDocument(*fields)
+        matches |= Q(SearchMatch(document, term))
+        ranks.append(SearchRank(document, term))
+    if not ranked:
+        return queryset.filter(matches)
+    rank = ranks[0] if len(ranks) == 1 else Greatest(*ranks)
+    ordering = [field for field in queryset.query.order_by if field not in ('search_rank', '-search_rank')]
+    return queryset.filter(matches).annotate(search_rank=rank).order_by('-search_rank', *ordering)
+
+
+class CreateSearchIndex(Operation):
+    """
+    Crée l'index GIN trigrammes du document `fields` de `model_name`.
+
+    Installe au besoin pg_trgm, unaccent et egs_unaccent. Sans effet hors
+    PostgreSQL (SQLite en développement).
+    """
+
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name, name, fields):
+        self.model_name = model_name
+        self.name = name
+        self.fields = fields
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        model = to_state.apps.get_model(app_label, self.model_name)
+        quote = schema_editor.quote_name
+        columns = [quote(model._meta.get_field(field).column) for field in self.fields]
+        for sql in SEARCH_SETUP_SQL:
+            schema_editor.execute(sql, params=None)
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(self.name)} ON {quote(model._meta.db_table)} "
+            f"USING gin (({document_sql(columns)}) gin_trgm_ops)",
+            params=None,
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(self.name)}", params=None)
+
+    def describe(self):
+        return f"Create trigram search index {self.name} on {self.model_name}"
+
+    @property
+    def migration_name_fragment(self):
+        return self.name.lower()
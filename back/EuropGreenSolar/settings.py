@@ -64,6 +64,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'EuropGreenSolar.query_profiling.QueryProfilingMiddleware',  # CUSTOM: requêtes SQL / latence par vue (en tête)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -74,6 +75,7 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'authentication.auditlog_middleware.AuditlogActorMiddleware',  # CUSTOM: définit l'actor pour auditlog
     'auditlog.middleware.AuditlogMiddleware',  # django-auditlog (APRÈS AuditlogActorMiddleware)
+    'admin_platform.audit_sink.AuditBufferMiddleware',  # Écriture groupée des logs d'audit (APRÈS auditlog)
 ]
 
 ROOT_URLCONF = 'EuropGreenSolar.urls'
@@ -196,7 +198,7 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'authentication.auth_method.CookieJWTAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'authentication.auth_method.CachedJWTAuthentication'
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -270,6 +272,36 @@ CELERY_TASK_SOFT_TIME_LIMIT = 270  # Avertissement à 4m30
 CELERY_TASK_ACKS_LATE = True  # Confirmer seulement après exécution
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Une tâche à la fois par worker
 
+# ============================================================================
+# Cache (Redis) - Dashboard et rapports
+# ============================================================================
+
+# Base Redis dédiée au cache (séparée de celle du broker Celery)
+REDIS_CACHE_DB = config('REDIS_CACHE_DB', default='1')
+
+# Redis par défaut en production, cache mémoire local en développement
+USE_REDIS_CACHE = config('USE_REDIS_CACHE', default=not DEBUG, cast=bool)
+
+if USE_REDIS_CACHE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://:{REDIS_PASSWORD_ENCODED}@{REDIS_HOST}:{REDIS_PORT}/{REDIS_CACHE_DB}',
+            'KEY_PREFIX': 'europgreen',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Durée de vie des réponses du dashboard/rapports en cache, en secondes (défaut: 5 minutes)
+REPORTS_CACHE_TIMEOUT = config('REPORTS_CACHE_TIMEOUT', default=300, cast=int)
+# Cache des utilisateurs authentifiés (User + UserAccess, par jeton), en secondes ; 0 pour désactiver
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 # ============================================================================
 # Système de Rappels de Tâches - Configuration
 # ============================================================================
@@ -283,6 +315,46 @@ REMINDER_HOURS_BEFORE = config('REMINDER_HOURS_BEFORE', default=3, cast=int)
 # Heure par défaut pour les rappels quotidiens et tâches sans heure (défaut: 08h00)
 REMINDER_TIME_HOUR = config('REMINDER_TIME_HOUR', default=8, cast=int)
 
+# ============================================================================
+# Dashboard - Snapshots KPI journaliers
+# ============================================================================
+
+# Nombre de jours passés recalculés chaque nuit (défaut: 7 jours)
+KPI_SNAPSHOT_REFRESH_DAYS = config('KPI_SNAPSHOT_REFRESH_DAYS', default=7, cast=int)
+
+# Nombre de mois (mois courant inclus) des agrégats de ventes recalculés chaque nuit (défaut: 3 mois)
+SALES_ROLLUP_REFRESH_MONTHS = config('SALES_ROLLUP_REFRESH_MONTHS', default=3, cast=int)
+
+# ============================================================================
+# Rapports - Génération asynchrone (jobs Celery)
+# ============================================================================
+
+# Durée pendant laquelle un rapport généré est réutilisé pour les mêmes paramètres (défaut: 1 heure)
+REPORT_JOB_TTL = config('REPORT_JOB_TTL', default=3600, cast=int)
+
+# Délai au-delà duquel un job jamais démarré est considéré perdu et passé en échec (défaut: 15 minutes)
+REPORT_JOB_PENDING_TIMEOUT = config('REPORT_JOB_PENDING_TIMEOUT', default=900, cast=int)
+
+# Durée de conservation des jobs et de leurs fichiers (défaut: 7 jours)
+REPORT_JOB_RETENTION_DAYS = config('REPORT_JOB_RETENTION_DAYS', default=7, cast=int)
+
+# SIREN de la société (nom du fichier des écritures comptables : {SIREN}FEC{AAAAMMJJ}.txt)
+COMPANY_SIREN = config('COMPANY_SIREN', default='932121536')
+
+# Export FEC incrémental : relecture avant le watermark précédent, pour reprendre les
+# écritures validées après le début de l'export précédent (défaut: 10 minutes)
+FEC_EXPORT_OVERLAP_SECONDS = config('FEC_EXPORT_OVERLAP_SECONDS', default=600, cast=int)
+
+# ============================================================================
+# Factures - PDF générés en arrière-plan à la facture soldée (jobs Celery)
+# ============================================================================
+
+# Nouvelles tentatives après un échec de rendu (délai 1, 2, 4... minutes), puis statut "failed"
+INVOICE_PDF_MAX_RETRIES = config('INVOICE_PDF_MAX_RETRIES', default=3, cast=int)
+
+# Délai après lequel un PDF resté en attente est remis en file (défaut: 15 minutes)
+INVOICE_PDF_PENDING_RETRY_MINUTES = config('INVOICE_PDF_PENDING_RETRY_MINUTES', default=15, cast=int)
+
 # ============================================================================
 # Logging Configuration - Debug CERFA
 # ============================================================================
@@ -316,6 +388,40 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
         },
+        'EuropGreenSolar.query_profiling': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
+# ============================================================================
+# Instrumentation des requêtes (EuropGreenSolar.query_profiling)
+# ============================================================================
+
+# En-tête Server-Timing (requêtes SQL, temps SQL, temps total) : hors production uniquement
+SERVER_TIMING_HEADERS = config('SERVER_TIMING_HEADERS', default=DEBUG, cast=bool)
+
+# Seuils au-delà desquels une requête HTTP est journalisée (warning)
+QUERY_PROFILING_WARN_QUERIES = config('QUERY_PROFILING_WARN_QUERIES', default=50, cast=int)
+QUERY_PROFILING_WARN_MS = config('QUERY_PROFILING_WARN_MS', default=1000, cast=int)
+
+
+# ============================================================================
+# Pagination des listes (EuropGreenSolar.pagination)
+# ============================================================================
+
+# False : pagination par curseur uniquement si ?cursor= ou ?page_size= est fourni
+# (tableau complet sinon, format attendu par le front actuel).
+# True : toutes les listes sont paginées (page de 50 par défaut).
+LIST_PAGINATION_REQUIRED = config('LIST_PAGINATION_REQUIRED', default=False, cast=bool)
+
+# ============================================================================
+# Écriture des logs d'audit (admin_platform.audit_sink)
+# ============================================================================
+
+# sync (défaut) : un INSERT par modification, dans la transaction (comportement d'auditlog)
+# buffered : un bulk_create par requête HTTP, en fin de requête
+# celery : lot de la requête écrit par la tâche write_audit_entries, au commit
+AUDIT_LOG_SINK = config('AUDIT_LOG_SINK', default='sync')
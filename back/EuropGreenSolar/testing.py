@@ -0,0 +1,71 @@
+"""
+Utilitaires de test : budgets de requêtes SQL et de latence par endpoint.
+
+S'appuie sur les mesures de `QueryProfilingMiddleware` (`response.query_stats`).
+Un budget dépassé fait échouer le test avec la vue, le nombre de requêtes
+et les temps mesurés : une régression N+1 casse la CI au lieu de passer
+inaperçue.
+
+    class OfferBudgetTests(QueryBudgetMixin, TestCase):
+        QUERY_BUDGETS = [
+            EndpointBudget('/offers/', queries=6),
+            EndpointBudget('/admin-platform/dashboard/overview/', queries=12, total_ms=2000),
+        ]
+
+        def test_budgets(self):
+            self.client.force_authenticate(admin)
+            self.assertEndpointBudgets()
+
+Les budgets de requêtes sont à mesurer sur plusieurs objets (un N+1 ne se
+voit pas avec un seul) ; les budgets de latence restent indicatifs en CI.
+"""
+
+from typing import NamedTuple, Optional
+
+
+class EndpointBudget(NamedTuple):
+    """Budget d'un endpoint : requêtes SQL maximum et, optionnellement, temps SQL / total (ms)."""
+
+    url: str
+    queries: int
+    db_ms: Optional[float] = None
+    total_ms: Optional[float] = None
+    method: str = 'get'
+    data: Optional[dict] = None
+    status: int = 200
+
+
+class QueryBudgetMixin:
+    """Assertions de budget pour les TestCase utilisant `self.client` (Client ou APIClient)."""
+
+    QUERY_BUDGETS = []
+
+    def assertWithinBudget(self, response, queries=None, db_ms=None, total_ms=None):
+        """Vérifie les mesures de `QueryProfilingMiddleware` attachées à `response`."""
+        stats = getattr(response, 'query_stats', None)
+        if stats is None:
+            self.fail("Mesures absentes : QueryProfilingMiddleware n'est pas dans MIDDLEWARE")
+
+        measured = (
+            f"{stats['view']} : {stats['queries']} requêtes SQL, "
+            f"{stats['db_ms']:.1f} ms SQL, {stats['total_ms']:.1f} ms au total"
+        )
+        if queries is not None and stats['queries'] > queries:
+            self.fail(f"Budget de {queries} requêtes dépassé - {measured}")
+        if db_ms is not None and stats['db_ms'] > db_ms:
+            self.fail(f"Budget SQL de {db_ms} ms dépassé - {measured}")
+        if total_ms is not None and stats['total_ms'] > total_ms:
+            self.fail(f"Budget de {total_ms} ms dépassé - {measured}")
+        return stats
+
+    def assertEndpointBudgets(self, budgets=None):
+        """Appelle chaque endpoint de `budgets` (défaut : QUERY_BUDGETS) et vérifie son budget."""
+        for budget in budgets if budgets is not None else self.QUERY_BUDGETS:
+            with self.subTest(url=budget.url, method=budget.method):
+                response = getattr(self.client, budget.method)(budget.url, budget.data)
+                self.assertEqual(response.status_code, budget.status)
+                if getattr(response, 'streaming', False):
+                    b''.join(response.streaming_content)
+                self.assertWithinBudget(
+                    response, queries=budget.queries, db_ms=budget.db_ms, total_ms=budget.total_ms,
+                )
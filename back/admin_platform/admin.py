@@ -3,7 +3,7 @@ Configuration de l'interface d'administration pour admin_platform.
 """
 
 from django.contrib import admin
-from .models import EmailLog
+from .models import EmailLog, DailyKPI, ReportJob, AccountingExportCursor, MonthlySalesRollup
 
 
 @admin.register(EmailLog)
@@ -25,3 +25,57 @@ class EmailLogAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(DailyKPI)
+class DailyKPIAdmin(admin.ModelAdmin):
+    """Consultation des snapshots journaliers du dashboard (calculés automatiquement)."""
+    
+    list_display = ['date', 'requests_count', 'offers_count', 'signed_quotes_count',
+                    'completed_installations_count', 'revenue_paid', 'computed_at']
+    date_hierarchy = 'date'
+    ordering = ['-date']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(MonthlySalesRollup)
+class MonthlySalesRollupAdmin(admin.ModelAdmin):
+    """Consultation des agrégats mensuels des ventes (commande rebuild_sales_rollup pour les reconstruire)."""
+    
+    list_display = ['month', 'salesperson', 'signed_quotes_count', 'signed_revenue',
+                    'payments_count', 'paid_revenue', 'computed_at']
+    list_select_related = ['salesperson']
+    date_hierarchy = 'month'
+    ordering = ['-month']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    """Suivi des rapports générés en arrière-plan."""
+    
+    list_display = ['id', 'report_type', 'status', 'created_by', 'created_at', 'completed_at']
+    list_filter = ['report_type', 'status']
+    readonly_fields = ['report_type', 'params', 'params_hash', 'status', 'file', 'error',
+                       'created_by', 'created_at', 'started_at', 'completed_at']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(AccountingExportCursor)
+class AccountingExportCursorAdmin(admin.ModelAdmin):
+    """Watermarks de l'export FEC incrémental (vider le watermark pour tout réexporter)."""
+    
+    list_display = ['consumer', 'watermark', 'last_export_at', 'last_export_invoices', 'last_export_payments']
+    readonly_fields = ['last_export_at', 'last_export_invoices', 'last_export_payments']
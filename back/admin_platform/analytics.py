@@ -0,0 +1,137 @@
+"""
+Requêtes d'analyse de conversion des demandes (funnel, sources, cohortes).
+
+Toutes les fonctions reposent sur une seule requête d'agrégation conditionnelle
+sur `ProspectRequest` : chaque étape du funnel est un `Count(..., filter=...)`
+sur les jointures offre → devis / fiche d'installation. Le nombre de requêtes
+reste donc constant quel que soit le nombre de sources ou de mois.
+
+Les étapes sont calculées en cohorte : parmi les demandes créées sur la
+période, combien ont atteint chaque étape (offre, devis signé, mise en service).
+C'est la seule définition du funnel : le dashboard (overview, conversion_funnel,
+sources_breakdown, conversion-cohorts) la sert via `conversion_summary` /
+`conversion_cohorts`.
+"""
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncMonth
+
+from request.models import ProspectRequest
+from billing.models import Quote
+from installations.models import Form
+
+
+# Libellés et clés des étapes du funnel, dans l'ordre
+FUNNEL_STAGES = (
+    ('requests', 'Demandes reçues'),
+    ('offers', 'Offres créées'),
+    ('signed_quotes', 'Devis signés'),
+    ('completed_installations', 'Installations terminées'),
+)
+
+_PERIOD_TRUNC = {
+    'day': TruncDate,
+    'month': TruncMonth,
+}
+
+
+def _conversion_aggregates():
+    """Agrégats conditionnels communs : une colonne par étape du funnel."""
+    return {
+        'requests': Count('id', distinct=True),
+        'converted': Count('id', filter=Q(converted_decision=True), distinct=True),
+        'offers': Count('offer', distinct=True),
+        'signed_quotes': Count(
+            'id', filter=Q(offer__quotes__status=Quote.Status.ACCEPTED), distinct=True
+        ),
+        'completed_installations': Count(
+            'id', filter=Q(offer__installations_form__status=Form.Status.COMMISSIONING), distinct=True
+        ),
+    }
+
+
+def conversion_rows(start_date, end_date, period=None):
+    """
+    Compteurs de conversion par source (et par jour/mois si `period` est fourni).
+
+    Paramètres:
+    - start_date, end_date : bornes (datetime) sur `created_at` des demandes
+    - period : None, 'day' ou 'month'
+
+    Retourne une liste de dicts :
+    {"source_type", ["period"], "requests", "converted", "offers", "signed_quotes",
+     "completed_installations"}
+    Une seule requête SQL, quel que soit le nombre de sources ou de périodes.
+    """
+    queryset = ProspectRequest.objects.filter(created_at__range=[start_date, end_date])
+    group_by = ['source_type']
+    if period is not None:
+        queryset = queryset.annotate(period=_PERIOD_TRUNC[period]('created_at'))
+        group_by.insert(0, 'period')
+
+    return list(
+        queryset
+        .values(*group_by)
+        .annotate(**_conversion_aggregates())
+        .order_by(*group_by)
+    )
+
+
+def _rate(count, base):
+    return round(count / base * 100, 2) if base > 0 else 0
+
+
+def _summarize(rows):
+    """Totalise des lignes de conversion_rows et calcule le funnel + la répartition par source."""
+    totals = {key: 0 for key, _ in FUNNEL_STAGES}
+    totals['converted'] = 0
+    sources = []
+    for row in sorted(rows, key=lambda r: r['requests'], reverse=True):
+        for key in totals:
+            totals[key] += row[key]
+        sources.append({
+            'source_type': row['source_type'],
+            'count': row['requests'],
+            'converted': row['converted'],
+            'conversion_rate': _rate(row['converted'], row['requests']),
+        })
+
+    base = totals['requests'] if totals['requests'] > 0 else 1
+    stages = [
+        {
+            'name': label,
+            'count': totals[key],
+            'percentage': 100 if key == 'requests' else round(totals[key] / base * 100, 2),
+        }
+        for key, label in FUNNEL_STAGES
+    ]
+    return {'stages': stages, 'sources': sources, 'totals': totals}
+
+
+def conversion_summary(start_date, end_date):
+    """
+    Funnel complet et conversion par source de la période, en une requête.
+
+    Retourne:
+    {
+        "stages": [{"name": "Demandes reçues", "count": 100, "percentage": 100}, ...],
+        "sources": [{"source_type": "web_form", "count": 45, "converted": 12, "conversion_rate": 26.67}, ...],
+        "totals": {"requests": 100, "converted": 30, "offers": 75, ...}
+    }
+    """
+    return _summarize(conversion_rows(start_date, end_date))
+
+
+def conversion_cohorts(start_date, end_date):
+    """
+    Cohortes mensuelles (mois de création de la demande), en une requête.
+
+    Retourne une liste triée par mois : [{"month": datetime, "stages": [...], "sources": [...], "totals": {...}}]
+    """
+    by_month = {}
+    for row in conversion_rows(start_date, end_date, period='month'):
+        by_month.setdefault(row['period'], []).append(row)
+    return [
+        {'month': month, **_summarize(rows)}
+        for month, rows in sorted(by_month.items())
+    ]
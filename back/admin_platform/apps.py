@@ -7,6 +7,8 @@ class AdminPlatformConfig(AppConfig):
     verbose_name = "Plateforme d'administration"
     
     def ready(self):
-        """Appelé au démarrage de Django - Charge l'enregistrement auditlog"""
+        """Appelé au démarrage de Django - Charge l'enregistrement auditlog et les signaux"""
         # Import ici pour éviter les imports circulaires
         import admin_platform.auditlog_registry  # noqa
+        import admin_platform.signals  # noqa
+        import admin_platform.audit_sink  # noqa  (receveurs des blocs buffered_audit)
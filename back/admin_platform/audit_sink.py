@@ -0,0 +1,247 @@
+"""
+Écriture groupée des entrées d'audit (django-auditlog), sur option.
+
+Par défaut (AUDIT_LOG_SINK = "sync"), rien n'est intercepté : auditlog insère
+un LogEntry à chaque sauvegarde d'un modèle audité, dans la transaction de
+l'écriture, avec l'acteur de `auditlog.context.set_actor`.
+
+Un bloc `buffered_audit()` regroupe les entrées de création, modification,
+suppression et many-to-many des modèles audités et les écrit en un seul
+`bulk_create` (puis les indexe pour la timeline, voir `audit_subjects`) à la
+sortie du bloc, dans la transaction courante :
+
+- les écritures automatiques d'auditlog sont suspendues pendant le bloc
+  (`auditlog.context.disable_auditlog`) et remplacées par les receveurs de ce
+  module, qui construisent les entrées avec `LogEntryManager.log_create` /
+  `log_m2m_changes` (`BufferedLogEntryManager`) et respectent `pre_log` ;
+- l'acteur et l'adresse IP sont ceux passés au bloc ;
+- les entrées d'une transaction vouée au rollback ne sont pas écrites ; une
+  exception rattrapée à l'intérieur du bloc n'en retire pas les entrées
+  (ouvrir le bloc dans le savepoint concerné).
+
+AUDIT_LOG_SINK active ce regroupement pour chaque requête HTTP
+(`AuditBufferMiddleware`) :
+- "buffered" : écriture en fin de requête ;
+- "celery" : le lot est confié à la tâche `write_audit_entries` au commit
+  (réessayée en cas d'échec). Si la file est indisponible, le lot est écrit
+  directement.
+
+Les entrées créées explicitement (`LogEntry.objects.create`) et les accès
+(`accessed`) restent écrits immédiatement.
+"""
+
+import json
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from auditlog.context import disable_auditlog
+from auditlog.diff import model_instance_diff
+from auditlog.models import LogEntry, LogEntryManager
+from auditlog.registry import auditlog
+from auditlog.signals import pre_log
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+from EuropGreenSolar.utils.helpers import get_client_ip
+
+from .audit_subjects import index_audit_entries
+
+
+logger = logging.getLogger(__name__)
+
+SINK_SYNC = 'sync'
+SINK_BUFFERED = 'buffered'
+SINK_CELERY = 'celery'
+
+# Lot du bloc buffered_audit() en cours
+_current_batch = ContextVar('audit_batch', default=None)
+
+
+def sink_mode():
+    return getattr(settings, 'AUDIT_LOG_SINK', SINK_SYNC)
+
+
+class BufferedLogEntryManager(LogEntryManager):
+    """Manager d'auditlog dont `create` ajoute l'entrée au lot au lieu de l'insérer."""
+
+    def __init__(self, batch):
+        super().__init__()
+        self.model = LogEntry
+        self.batch = batch
+
+    def create(self, **kwargs):
+        kwargs.setdefault('actor', self.batch.actor)
+        kwargs.setdefault('remote_addr', self.batch.remote_addr)
+        entry = self.model(**kwargs)
+        self.batch.append(entry)
+        return entry
+
+
+class AuditBatch(list):
+    """Entrées d'audit d'un bloc buffered_audit(), écrites par `flush()`."""
+
+    def __init__(self, actor=None, remote_addr=None, deferred=False):
+        super().__init__()
+        self.actor = actor
+        self.remote_addr = remote_addr
+        self.deferred = deferred
+        self.manager = BufferedLogEntryManager(self)
+
+    def log(self, instance, action, changes, force_log=False):
+        """Entrée de `instance` (comme auditlog : rien sans changement, veto possible par pre_log)."""
+        results = pre_log.send(instance.__class__, instance=instance, action=action)
+        if any(result is False for _receiver, result in results):
+            return None
+        if not changes and not force_log:
+            return None
+        return self.manager.log_create(instance, action=action, changes=changes, force_log=force_log)
+
+    def flush(self):
+        entries, self[:] = list(self), []
+        if not entries:
+            return
+        using = router.db_for_write(LogEntry)
+        if transaction.get_connection(using).in_atomic_block and transaction.get_rollback(using):
+            # Transaction vouée au rollback : les objets audités disparaissent aussi
+            return
+        if self.deferred:
+            rows = serialize_entries(entries)
+            transaction.on_commit(lambda: enqueue_audit_entries(rows), using=using)
+        else:
+            write_entries(entries)
+
+
+@contextmanager
+def buffered_audit(actor=None, remote_addr=None, deferred=False):
+    """
+    Regroupe les entrées d'audit du bloc en un seul INSERT à sa sortie.
+
+    `deferred=True` : écriture par la tâche Celery write_audit_entries, au commit.
+    Un bloc imbriqué rejoint le lot du bloc englobant.
+    """
+    batch = _current_batch.get()
+    if batch is not None:
+        yield batch
+        return
+    batch = AuditBatch(actor=actor, remote_addr=remote_addr, deferred=deferred)
+    token = _current_batch.set(batch)
+    try:
+        with disable_auditlog():
+            yield batch
+    finally:
+        _current_batch.reset(token)
+        batch.flush()
+
+
+def enqueue_audit_entries(rows):
+    """Confie un lot sérialisé à Celery, ou l'écrit directement si la file est indisponible."""
+    from .tasks import write_audit_entries
+
+    try:
+        write_audit_entries.delay(rows)
+    except Exception:
+        logger.exception("File Celery indisponible : écriture directe de %d entrées d'audit", len(rows))
+        write_entries(deserialize_entries(rows))
+
+
+def write_entries(entries):
+    """bulk_create des entrées puis indexation de la timeline (aucun signal post_save)."""
+    LogEntry.objects.bulk_create(entries)
+    index_audit_entries(entries)
+    return len(entries)
+
+
+def serialize_entries(entries):
+    """Entrées -> lignes JSON (message Celery)."""
+    fields = [field for field in LogEntry._meta.concrete_fields if not field.primary_key]
+    rows = [{field.attname: field.value_from_object(entry) for field in fields} for entry in entries]
+    return json.loads(json.dumps(rows, cls=DjangoJSONEncoder))
+
+
+def deserialize_entries(rows):
+    """Lignes JSON -> entrées non enregistrées."""
+    fields = {field.attname: field for field in LogEntry._meta.concrete_fields if not field.primary_key}
+    return [
+        LogEntry(**{name: fields[name].to_python(value) for name, value in row.items() if name in fields})
+        for row in rows
+    ]
+
+
+# ----------------------------------------------------------------------
+# Receveurs actifs pendant un bloc buffered_audit() (auditlog suspendu)
+# ----------------------------------------------------------------------
+
+def _batch_for(sender, raw=False):
+    """Lot courant si `sender` est audité et l'écriture à tracer, sinon None."""
+    batch = _current_batch.get()
+    if batch is None or not auditlog.contains(sender):
+        return None
+    if raw and getattr(settings, 'AUDITLOG_DISABLE_ON_RAW_SAVE', False):
+        return None
+    return batch
+
+
+def _log_create(sender, instance, created, raw=False, **kwargs):
+    batch = _batch_for(sender, raw)
+    if batch is not None and created:
+        batch.log(instance, LogEntry.Action.CREATE, model_instance_diff(None, instance))
+
+
+def _log_update(sender, instance, raw=False, update_fields=None, **kwargs):
+    batch = _batch_for(sender, raw)
+    if batch is None or instance._state.adding:
+        return
+    old = sender.objects.filter(pk=instance.pk).first()
+    batch.log(instance, LogEntry.Action.UPDATE, model_instance_diff(old, instance, fields_to_check=update_fields))
+
+
+def _log_delete(sender, instance, **kwargs):
+    batch = _batch_for(sender)
+    if batch is not None and instance.pk is not None:
+        batch.log(instance, LogEntry.Action.DELETE, model_instance_diff(instance, None))
+
+
+def _log_m2m_changes(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    batch = _batch_for(instance.__class__)
+    if batch is None:
+        return
+    field_name = next(
+        (field.name for field in instance._meta.many_to_many if field.remote_field.through is sender), None
+    )
+    if field_name is None:
+        return
+    changed = model.objects.all() if action == 'post_clear' else model.objects.filter(pk__in=pk_set)
+    operation = 'add' if action == 'post_add' else 'delete'
+    batch.manager.log_m2m_changes(changed, instance, operation, field_name)
+
+
+post_save.connect(_log_create, dispatch_uid='audit_sink_create')
+pre_save.connect(_log_update, dispatch_uid='audit_sink_update')
+post_delete.connect(_log_delete, dispatch_uid='audit_sink_delete')
+m2m_changed.connect(_log_m2m_changes, dispatch_uid='audit_sink_m2m')
+
+
+class AuditBufferMiddleware:
+    """
+    Regroupe les entrées d'audit de la requête (AUDIT_LOG_SINK = "buffered" ou
+    "celery") ; sans effet en mode "sync".
+
+    À placer après les middlewares d'auditlog (utilisateur authentifié).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = sink_mode()
+        if mode == SINK_SYNC:
+            return self.get_response(request)
+        user = getattr(request, 'user', None)
+        actor = user if user is not None and user.is_authenticated else None
+        with buffered_audit(actor=actor, remote_addr=get_client_ip(request), deferred=mode == SINK_CELERY):
+            return self.get_response(request)
@@ -0,0 +1,108 @@
+"""
+Index des sujets de l'audit (AuditSubject), base de la timeline des utilisateurs.
+
+Chaque entrée d'audit est rattachée, à l'écriture :
+- à son acteur ;
+- au propriétaire de l'objet audité, en remontant jusqu'à l'apporteur de la
+  demande d'origine (`ProspectRequest.source`) : demande -> offre -> devis /
+  fiche d'installation -> facture. Un utilisateur est son propre propriétaire.
+
+La résolution se fait par lots : une requête par type d'objet. Un objet déjà
+supprimé (entrée DELETE) hérite des propriétaires des entrées précédentes du
+même objet.
+"""
+
+from collections import defaultdict
+
+from auditlog.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+
+from .models import AuditSubject
+
+
+# Chemin vers l'utilisateur propriétaire, par modèle audité
+OWNER_PATHS = {
+    'users.user': 'pk',
+    'request.prospectrequest': 'source_id',
+    'offers.offer': 'request__source_id',
+    'billing.quote': 'offer__request__source_id',
+    'installations.form': 'offer__request__source_id',
+    'invoices.invoice': 'installation__offer__request__source_id',
+}
+
+
+def _owners(content_type_id, object_pks):
+    """{object_pk: {subject_id}} des objets d'un type donné."""
+    model = ContentType.objects.get_for_id(content_type_id).model_class()
+    path = OWNER_PATHS.get(model._meta.label_lower) if model else None
+    if path is None:
+        return {}
+
+    owners = defaultdict(set)
+    for pk, owner_id in model.objects.filter(pk__in=object_pks).values_list('pk', path):
+        if owner_id:
+            owners[str(pk)].add(owner_id)
+
+    missing = set(object_pks) - owners.keys()
+    if missing:
+        previous = AuditSubject.objects.filter(
+            relation=AuditSubject.Relation.OWNER,
+            log_entry__content_type_id=content_type_id,
+            log_entry__object_pk__in=missing,
+        ).values_list('log_entry__object_pk', 'subject_id').distinct()
+        for object_pk, subject_id in previous:
+            owners[object_pk].add(subject_id)
+    return owners
+
+
+def index_audit_entries(entries, batch_size=1000):
+    """
+    Crée les AuditSubject des entrées `entries` (LogEntry enregistrées).
+
+    Idempotent : les rattachements existants sont ignorés. Retourne le nombre
+    de rattachements calculés.
+    """
+    by_type = defaultdict(list)
+    for entry in entries:
+        by_type[entry.content_type_id].append(entry)
+
+    rows = []
+    for content_type_id, group in by_type.items():
+        # object_pk peut être la clé d'origine (UUID) sur une entrée tout juste créée
+        owners = _owners(content_type_id, {str(entry.object_pk) for entry in group})
+        for entry in group:
+            subjects = {subject_id: AuditSubject.Relation.OWNER for subject_id in owners.get(str(entry.object_pk), ())}
+            if entry.actor_id:
+                subjects.setdefault(entry.actor_id, AuditSubject.Relation.ACTOR)
+            rows.extend(
+                AuditSubject(log_entry_id=entry.pk, subject_id=subject_id, relation=relation, timestamp=entry.timestamp)
+                for subject_id, relation in subjects.items()
+            )
+
+    AuditSubject.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return len(rows)
+
+
+def rebuild_audit_subjects(reset=False, batch_size=2000):
+    """
+    Indexe toutes les entrées d'audit, dans l'ordre d'écriture.
+
+    Sans `reset`, complète l'index existant. Avec `reset`, le vide d'abord pour
+    refléter les propriétaires actuels (ex : source d'une demande modifiée) ;
+    les objets déjà supprimés perdent alors leur propriétaire.
+
+    Retourne le nombre de rattachements calculés.
+    """
+    if reset:
+        AuditSubject.objects.all().delete()
+    written = 0
+    last_id = 0
+    while True:
+        batch = list(
+            LogEntry.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'content_type_id', 'object_pk', 'actor_id', 'timestamp')[:batch_size]
+        )
+        if not batch:
+            return written
+        written += index_audit_entries(batch, batch_size=batch_size)
+        last_id = batch[-1].id
@@ -3,8 +3,8 @@ Vues pour le tableau de bord administrateur.
 Fournit des statistiques et KPIs sur l'activité de l'entreprise.
 """
 
-from django.db.models import Count, Sum, F, DecimalField
-from django.db.models.functions import TruncMonth, Coalesce
+from django.db.models import Sum, F, DecimalField
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from rest_framework import viewsets, permissions
 from rest_framework.decorators import action
@@ -16,9 +16,12 @@ from decimal import Decimal
 # Import des modèles
 from request.models import ProspectRequest
 from offers.models import Offer
-from billing.models import Quote, QuoteLine
-from installations.models import Form
-from invoices.models import Invoice
+from billing.models import QuoteLine
+from installations.models import Form, CommissionLedger
+
+from . import analytics
+from .kpi import get_daily_kpis, sum_daily_kpis
+from .report_cache import cached_action, get_cache_stats
 
 
 class DashboardViewSet(viewsets.ViewSet):
@@ -91,6 +94,16 @@ class DashboardViewSet(viewsets.ViewSet):
         
         return start_date, end_date
     
+    def _get_daily_kpis(self, request):
+        """
+        KPIs jour par jour de la période demandée.
+        
+        Historique lu depuis les snapshots DailyKPI, jour courant calculé en direct :
+        le coût ne dépend plus du volume de données.
+        """
+        start_date, end_date = self._get_date_range(request)
+        return get_daily_kpis(timezone.localdate(start_date), timezone.localdate(end_date))
+    
     @extend_schema(
         summary="Vue d'ensemble - KPIs principaux",
         description="Retourne les 4 indicateurs clés : projets actifs, CA, taux de conversion, commissions à verser.",
@@ -101,6 +114,7 @@ class DashboardViewSet(viewsets.ViewSet):
         ]
     )
     @action(detail=False, methods=['get'])
+    @cached_action('dashboard')
     def overview(self, request):
         """
         KPIs principaux pour les cards du dashboard.
@@ -117,9 +131,7 @@ class DashboardViewSet(viewsets.ViewSet):
             "commissions_due": 12500.00
         }
         """
-        start_date, end_date = self._get_date_range(request)
-        
-        # 1. Projets actifs (demandes + offres + installations en cours)
+        # 1. Projets actifs (demandes + offres + installations en cours, état courant)
         active_requests = ProspectRequest.objects.filter(
             status__in=['new', 'followup', 'in_progress']
         ).count()
@@ -136,49 +148,23 @@ class DashboardViewSet(viewsets.ViewSet):
         
         active_projects = active_requests + active_offers + active_installations
         
-        # 2. Chiffre d'affaires
-        # CA total (factures payées)
-        revenue_total = Invoice.objects.filter(
-            status='paid',
-            created_at__range=[start_date, end_date]
-        ).aggregate(total=Coalesce(Sum('total'), Decimal('0')))['total']
-        
-        # CA en attente (factures émises non payées)
-        revenue_pending = Invoice.objects.filter(
-            status__in=['issued', 'partially_paid'],
-            created_at__range=[start_date, end_date]
-        ).aggregate(total=Coalesce(Sum('total'), Decimal('0')))['total']
-        
-        # CA potentiel (devis envoyés/en négociation non signés)
-        revenue_potential = Quote.objects.filter(
-            status__in=['sent', 'pending'],
-            created_at__range=[start_date, end_date]
-        ).aggregate(total=Coalesce(Sum('total'), Decimal('0')))['total']
-        
-        # 3. Taux de conversion global (demandes → installations terminées)
-        total_requests = ProspectRequest.objects.filter(
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        completed_installations = Form.objects.filter(
-            status='commissioning',
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        conversion_rate = (completed_installations / total_requests * 100) if total_requests > 0 else 0
+        # 2. Chiffre d'affaires (snapshots journaliers)
+        # CA total : factures payées / en attente : factures émises non payées /
+        # potentiel : devis envoyés ou en négociation non signés
+        kpis = sum_daily_kpis(self._get_daily_kpis(request))
+        revenue_total = kpis['revenue_paid']
+        revenue_pending = kpis['revenue_pending']
+        revenue_potential = kpis['revenue_potential']
         
-        # 4. Commissions à verser (non payées)
-        commissions_collaborator = Form.objects.filter(
-            commission_paid=False,
-            commission_amount__gt=0
-        ).aggregate(total=Coalesce(Sum('commission_amount'), Decimal('0')))['total']
-        
-        commissions_sales = Form.objects.filter(
-            sales_commission_paid=False,
-            sales_commission_amount__gt=0
-        ).aggregate(total=Coalesce(Sum('sales_commission_amount'), Decimal('0')))['total']
+        # 3. Taux de conversion global (demandes → installations terminées),
+        # même définition (cohorte) que le funnel
+        start_date, end_date = self._get_date_range(request)
+        conversion_rate = analytics.conversion_summary(start_date, end_date)['stages'][-1]['percentage']
         
-        commissions_due = commissions_collaborator + commissions_sales
+        # 4. Commissions à verser (non payées), depuis le registre des commissions
+        commissions_due = CommissionLedger.objects.filter(
+            paid=False
+        ).aggregate(total=Coalesce(Sum('amount'), Decimal('0')))['total']
         
         return Response({
             'active_projects': active_projects,
@@ -199,6 +185,7 @@ class DashboardViewSet(viewsets.ViewSet):
         ]
     )
     @action(detail=False, methods=['get'])
+    @cached_action('dashboard')
     def conversion_funnel(self, request):
         """
         Données pour le funnel de conversion.
@@ -213,54 +200,51 @@ class DashboardViewSet(viewsets.ViewSet):
             ]
         }
         """
+        # Demandes de la période et étapes atteintes (cohorte), en une requête
         start_date, end_date = self._get_date_range(request)
+        stages = analytics.conversion_summary(start_date, end_date)['stages']
         
-        # Compter chaque étape
-        requests_count = ProspectRequest.objects.filter(
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        offers_count = Offer.objects.filter(
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        signed_quotes_count = Quote.objects.filter(
-            status='accepted',
-            created_at__range=[start_date, end_date]
-        ).count()
-        
-        completed_installations = Form.objects.filter(
-            status='commissioning',
-            created_at__range=[start_date, end_date]
-        ).count()
+        return Response({'stages': stages})
+    
+    @extend_schema(
+        summary="Cohortes de conversion",
+        description="Funnel de conversion par mois de création des demandes (cohortes), avec le détail par source.",
+        parameters=[
+            OpenApiParameter(name='period', description='Période', required=False, type=str),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='conversion-cohorts')
+    @cached_action('dashboard')
+    def conversion_cohorts(self, request):
+        """
+        Parcours des demandes créées chaque mois jusqu'à la mise en service.
         
-        # Calculer les pourcentages (base = demandes)
-        base = requests_count if requests_count > 0 else 1
+        Retourne:
+        {
+            "cohorts": [
+                {
+                    "month": "2025-01",
+                    "label": "Jan 2025",
+                    "stages": [{"name": "Demandes reçues", "count": 40, "percentage": 100}, ...],
+                    "sources": [{"source_type": "web_form", "count": 25, "converted": 8, "conversion_rate": 32.0}, ...]
+                },
+                ...
+            ]
+        }
+        """
+        start_date, end_date = self._get_date_range(request)
         
-        stages = [
-            {
-                'name': 'Demandes reçues',
-                'count': requests_count,
-                'percentage': 100
-            },
+        cohorts = [
             {
-                'name': 'Offres créées',
-                'count': offers_count,
-                'percentage': round((offers_count / base) * 100, 2)
-            },
-            {
-                'name': 'Devis signés',
-                'count': signed_quotes_count,
-                'percentage': round((signed_quotes_count / base) * 100, 2)
-            },
-            {
-                'name': 'Installations terminées',
-                'count': completed_installations,
-                'percentage': round((completed_installations / base) * 100, 2)
+                'month': cohort['month'].strftime('%Y-%m'),
+                'label': cohort['month'].strftime('%b %Y'),
+                'stages': cohort['stages'],
+                'sources': cohort['sources'],
             }
+            for cohort in analytics.conversion_cohorts(start_date, end_date)
         ]
         
-        return Response({'stages': stages})
+        return Response({'cohorts': cohorts})
     
     @extend_schema(
         summary="Évolution du chiffre d'affaires",
@@ -270,6 +254,7 @@ class DashboardViewSet(viewsets.ViewSet):
         ]
     )
     @action(detail=False, methods=['get'])
+    @cached_action('dashboard')
     def revenue_chart(self, request):
         """
         Évolution du CA sur la période sélectionnée.
@@ -282,21 +267,11 @@ class DashboardViewSet(viewsets.ViewSet):
         """
         start_date, end_date = self._get_date_range(request)
         
-        # Grouper par mois (utiliser created_at pour cohérence avec overview)
-        revenue_by_month = Invoice.objects.filter(
-            status='paid',
-            created_at__range=[start_date, end_date]
-        ).annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            total=Coalesce(Sum('total'), Decimal('0'))
-        ).order_by('month')
-        
-        # Créer un dictionnaire des revenus par mois (datetime -> float)
-        revenue_dict = {
-            item['month']: float(item['total'])
-            for item in revenue_by_month
-        }
+        # Grouper par mois les CA journaliers (date de création, cohérent avec overview)
+        revenue_dict = {}
+        for day in self._get_daily_kpis(request):
+            month = (day['date'].year, day['date'].month)
+            revenue_dict[month] = revenue_dict.get(month, 0) + float(day['revenue_paid'])
         
         # Générer tous les mois de la période
         labels = []
@@ -304,12 +279,7 @@ class DashboardViewSet(viewsets.ViewSet):
         current = start_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
         while current <= end_date:
-            # Chercher la valeur en comparant année et mois seulement
-            month_value = 0
-            for db_month, total in revenue_dict.items():
-                if db_month.year == current.year and db_month.month == current.month:
-                    month_value = total
-                    break
+            month_value = revenue_dict.get((current.year, current.month), 0)
             
             labels.append(current.strftime('%b %Y'))
             data.append(month_value)
@@ -330,6 +300,7 @@ class DashboardViewSet(viewsets.ViewSet):
         description="Distribution des demandes par source pour graphique pie chart.",
     )
     @action(detail=False, methods=['get'])
+    @cached_action('dashboard')
     def sources_breakdown(self, request):
         """
         Répartition des demandes par source.
@@ -341,18 +312,9 @@ class DashboardViewSet(viewsets.ViewSet):
             "conversion_rates": [35.5, 42.1, ...]
         }
         """
+        # Demandes de la période par source, triées par volume (même requête que le funnel)
         start_date, end_date = self._get_date_range(request)
-        
-        sources = ProspectRequest.objects.filter(
-            created_at__range=[start_date, end_date]
-        ).values('source_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
-        
-        # Calculer taux de conversion par source
-        labels = []
-        data = []
-        conversion_rates = []
+        sources = analytics.conversion_summary(start_date, end_date)['sources']
         
         source_labels = {
             'call_center': 'Call Center',
@@ -362,22 +324,9 @@ class DashboardViewSet(viewsets.ViewSet):
             'commercial': 'Commercial'
         }
         
-        for source in sources:
-            source_type = source['source_type']
-            count = source['count']
-            
-            # Calculer taux de conversion pour cette source
-            converted = ProspectRequest.objects.filter(
-                source_type=source_type,
-                created_at__range=[start_date, end_date],
-                converted_decision=True
-            ).count()
-            
-            conversion_rate = (converted / count * 100) if count > 0 else 0
-            
-            labels.append(source_labels.get(source_type, source_type))
-            data.append(count)
-            conversion_rates.append(round(conversion_rate, 2))
+        labels = [source_labels.get(source['source_type'], source['source_type']) for source in sources]
+        data = [source['count'] for source in sources]
+        conversion_rates = [source['conversion_rate'] for source in sources]
         
         return Response({
             'labels': labels,
@@ -390,6 +339,7 @@ class DashboardViewSet(viewsets.ViewSet):
         description="Statistiques de vente par type de produit.",
     )
     @action(detail=False, methods=['get'])
+    @cached_action('dashboard')
     def products_performance(self, request):
         """
         Performance des produits vendus.
@@ -440,3 +390,23 @@ class DashboardViewSet(viewsets.ViewSet):
             'quantities': quantities,
             'revenue': revenue
         })
+    
+    @extend_schema(
+        summary="Statistiques du cache",
+        description="Nombre de hits/misses et taux de succès du cache par action du dashboard et des rapports.",
+    )
+    @action(detail=False, methods=['get'], url_path='cache-stats')
+    def cache_stats(self, request):
+        """
+        Taux de succès du cache dashboard/rapports.
+        
+        Retourne:
+        {
+            "actions": [
+                {"prefix": "dashboard", "action": "overview", "hits": 120, "misses": 8, "hit_rate": 93.75},
+                ...
+            ],
+            "total": {"hits": 150, "misses": 20, "hit_rate": 88.24}
+        }
+        """
+        return Response(get_cache_stats())
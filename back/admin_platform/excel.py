@@ -0,0 +1,148 @@
+"""
+Écriture des rapports Excel (XLSX) à mémoire bornée.
+
+`ReportWriter` utilise le mode write-only d'openpyxl : les lignes sont écrites
+au fil de l'eau (aucune grille de cellules conservée en mémoire) avec des
+styles nommés partagés, puis le classeur est écrit dans un fichier temporaire
+renvoyé en streaming par une FileResponse (ou enregistré dans un fichier
+fourni, ex : artefact d'un job de rapport asynchrone).
+"""
+
+import tempfile
+
+from django.http import FileResponse
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+    from openpyxl.utils import get_column_letter
+    EXCEL_AVAILABLE = True
+except ImportError:
+    EXCEL_AVAILABLE = False
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+AMOUNT_FORMAT = '#,##0.00'
+EURO_FORMAT = '#,##0.00 €'
+
+_TITLE_COLOR = '1F4E78'
+_HEADER_COLOR = '4472C4'
+_PAID_COLOR = 'C6EFCE'
+_UNPAID_COLOR = 'FFC7CE'
+
+
+def _build_named_styles():
+    """Styles nommés communs à tous les rapports (enregistrés une fois par classeur)."""
+    thin = Side(style='thin')
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    header_font = Font(bold=True, color='FFFFFF')
+    header_fill = PatternFill(start_color=_HEADER_COLOR, end_color=_HEADER_COLOR, fill_type='solid')
+    paid_fill = PatternFill(start_color=_PAID_COLOR, end_color=_PAID_COLOR, fill_type='solid')
+    unpaid_fill = PatternFill(start_color=_UNPAID_COLOR, end_color=_UNPAID_COLOR, fill_type='solid')
+
+    definitions = {
+        'report_title': dict(font=Font(size=16, bold=True, color=_TITLE_COLOR)),
+        'report_section': dict(font=Font(size=12, bold=True)),
+        'report_header': dict(font=header_font, fill=header_fill, alignment=Alignment(horizontal='center')),
+        'report_header_bordered': dict(
+            font=header_font, fill=header_fill, border=border,
+            alignment=Alignment(horizontal='center', vertical='center'),
+        ),
+        'report_cell_bordered': dict(border=border),
+        'report_amount_bordered': dict(border=border, number_format=AMOUNT_FORMAT),
+        'report_euro': dict(number_format=EURO_FORMAT),
+        'report_kpi': dict(font=Font(size=14, bold=True)),
+        'report_kpi_euro': dict(font=Font(size=14, bold=True), number_format=EURO_FORMAT),
+        'report_total': dict(font=Font(bold=True)),
+        'report_total_amount': dict(font=Font(bold=True), number_format=AMOUNT_FORMAT),
+        'report_total_euro': dict(font=Font(size=12, bold=True), number_format=EURO_FORMAT),
+        'report_paid': dict(fill=paid_fill),
+        'report_unpaid': dict(fill=unpaid_fill),
+        'report_paid_euro': dict(fill=paid_fill, number_format=EURO_FORMAT),
+        'report_unpaid_euro': dict(fill=unpaid_fill, number_format=EURO_FORMAT),
+    }
+
+    styles = []
+    for name, attributes in definitions.items():
+        style = NamedStyle(name=name)
+        for attribute, value in attributes.items():
+            setattr(style, attribute, value)
+        styles.append(style)
+    return styles
+
+
+class ReportWriter:
+    """
+    Générateur de rapport XLSX en mode write-only.
+
+    Les lignes doivent être écrites dans l'ordre (pas d'accès aléatoire aux
+    cellules). Une valeur peut être passée seule ou sous forme de tuple
+    `(valeur, nom_de_style)`.
+
+    Exemple:
+        writer = ReportWriter("Rapport", column_widths=[25, 18])
+        writer.title("RAPPORT")
+        writer.header(['Nom', 'Montant'])
+        writer.row(['Dupont', (1250.0, 'report_euro')])
+        return writer.response("rapport.xlsx")
+    """
+
+    def __init__(self, sheet_title, column_widths=None, filename=None):
+        self.filename = filename
+        self.workbook = openpyxl.Workbook(write_only=True)
+        for style in _build_named_styles():
+            self.workbook.add_named_style(style)
+        self.sheet = self.workbook.create_sheet(sheet_title)
+
+        # Les largeurs doivent être définies avant l'écriture de la première ligne
+        for index, width in enumerate(column_widths or [], start=1):
+            self.sheet.column_dimensions[get_column_letter(index)].width = width
+
+    def _cell(self, value):
+        if isinstance(value, tuple):
+            value, style = value
+            cell = WriteOnlyCell(self.sheet, value=value)
+            if style:
+                cell.style = style
+            return cell
+        return value
+
+    def row(self, values):
+        """Écrit une ligne de valeurs (éventuellement stylées)."""
+        self.sheet.append([self._cell(value) for value in values])
+
+    def blank(self, count=1):
+        """Écrit `count` lignes vides."""
+        for _ in range(count):
+            self.sheet.append([])
+
+    def title(self, text):
+        self.row([(text, 'report_title')])
+
+    def section(self, text):
+        self.row([(text, 'report_section')])
+
+    def header(self, labels, style='report_header'):
+        self.row([(label, style) for label in labels])
+
+    def save(self, fileobj):
+        """Écrit le classeur dans un fichier binaire ouvert."""
+        self.workbook.save(fileobj)
+
+    def response(self, filename=None):
+        """
+        Écrit le classeur dans un fichier temporaire et le renvoie en streaming.
+
+        Le fichier est supprimé à la fermeture de la réponse.
+        """
+        output = tempfile.TemporaryFile()
+        self.save(output)
+        output.seek(0)
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename or self.filename,
+            content_type=XLSX_CONTENT_TYPE,
+        )
@@ -0,0 +1,420 @@
+"""
+Export des écritures comptables au format FEC (Fichier des Écritures Comptables).
+
+Disposition conforme à l'article A47 A-1 du LPF : 18 colonnes séparées par des
+tabulations, dates AAAAMMJJ, montants avec virgule décimale.
+
+- Journal des ventes (VE) : une écriture par facture émise
+  (débit 411 client TTC / crédit 706 HT / crédit 44571 TVA)
+- Journal de banque (BQ) : une écriture par paiement (débit 512 / crédit 411)
+
+Les brouillons et factures annulées ne sont pas exportés.
+
+Mode incrémental : un `AccountingExportCursor` par consommateur mémorise la
+borne haute du dernier export, et `AccountingExportEntry` la dernière écriture
+transmise pour chaque facture et chaque paiement. Sont relus, via les index
+dédiés, les factures et paiements modifiés (`updated_at`) et les suppressions
+(`AccountingTombstone`) depuis cette borne :
+- objet jamais exporté : écriture initiale ;
+- colonnes comptables modifiées (montants, dates, client, annulation) :
+  contrepassation des lignes transmises, puis nouvelle écriture ;
+- modification sans effet comptable (paid_total, statut de paiement) : rien ;
+- objet supprimé : contrepassation.
+La relecture recouvre FEC_EXPORT_OVERLAP_SECONDS avant la borne : une ligne
+enregistrée avant le début d'un export mais validée après n'est pas perdue, et
+les objets relus sans changement ne sont pas réémis. La borne et les écritures
+transmises ne sont enregistrées qu'une fois le fichier entièrement généré, et
+seulement si aucun autre export du même consommateur n'a abouti entre-temps :
+sinon le fichier est interrompu (erreur journalisée) et rien n'est enregistré.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from invoices.models import Invoice, Payment
+
+from .models import AccountingExportCursor, AccountingExportEntry, AccountingTombstone
+from .reports import CsvReport, EXPORT_CHUNK_SIZE
+
+
+logger = logging.getLogger(__name__)
+
+
+FEC_COLUMNS = [
+    'JournalCode', 'JournalLib', 'EcritureNum', 'EcritureDate', 'CompteNum', 'CompteLib',
+    'CompAuxNum', 'CompAuxLib', 'PieceRef', 'PieceDate', 'EcritureLib', 'Debit', 'Credit',
+    'EcritureLet', 'DateLet', 'ValidDate', 'Montantdevise', 'Idevise',
+]
+
+SALES_JOURNAL = ('VE', 'Ventes')
+BANK_JOURNAL = ('BQ', 'Banque')
+
+CLIENTS_ACCOUNT = ('411000', 'Clients')
+SALES_ACCOUNT = ('706000', 'Prestations de services')
+VAT_ACCOUNT = ('445710', 'TVA collectée')
+BANK_ACCOUNT = ('512000', 'Banque')
+
+EXCLUDED_STATUSES = (Invoice.Status.DRAFT, Invoice.Status.CANCELLED)
+
+FEC_CONTENT_TYPE = 'text/plain; charset=utf-8'
+
+
+def _amount(value):
+    return f"{value:.2f}".replace('.', ',') if value else '0,00'
+
+
+def _date(value):
+    return value.strftime('%Y%m%d') if value else ''
+
+
+def _line(journal, number, date, account, aux, piece_ref, label, debit, credit, valid_date):
+    return [
+        journal[0], journal[1], number, _date(date), account[0], account[1],
+        aux[0], aux[1], piece_ref, _date(date), label, _amount(debit), _amount(credit),
+        '', '', valid_date, '', '',
+    ]
+
+
+def _client_account(row):
+    """Compte auxiliaire client : identifiant et nom du client (ou destinataire standalone)."""
+    if row['client_id']:
+        return str(row['client_id']).split('-')[0].upper(), f"{row['client_last_name']} {row['client_first_name']}".strip()
+    name = row['custom_recipient_company'] or row['custom_recipient_name'] or 'Client divers'
+    return 'DIVERS', name
+
+
+INVOICE_FIELDS = (
+    'id', 'number', 'status', 'issue_date', 'subtotal', 'discount_amount', 'tax_rate', 'total',
+    'custom_recipient_name', 'custom_recipient_company',
+)
+PAYMENT_FIELDS = (
+    'id', 'date', 'method', 'reference', 'amount',
+    'invoice__status', 'invoice__custom_recipient_name', 'invoice__custom_recipient_company',
+)
+
+
+def _invoice_rows(invoices):
+    return invoices.values(
+        *INVOICE_FIELDS,
+        client_id=F('installation__client_id'),
+        client_last_name=F('installation__client__last_name'),
+        client_first_name=F('installation__client__first_name'),
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _payment_rows(payments):
+    return payments.values(
+        *PAYMENT_FIELDS,
+        invoice_number=F('invoice__number'),
+        client_id=F('invoice__installation__client_id'),
+        client_last_name=F('invoice__installation__client__last_name'),
+        client_first_name=F('invoice__installation__client__first_name'),
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def invoice_entry(row, valid_date):
+    """Lignes du journal des ventes d'une facture (TTC = HT + TVA), None si non exportable."""
+    if row['status'] in EXCLUDED_STATUSES:
+        return None
+    total = row['total'] or Decimal('0')
+    net = (row['subtotal'] or Decimal('0')) - (row['discount_amount'] or Decimal('0'))
+    vat = min((net * (row['tax_rate'] or Decimal('0')) / 100).quantize(Decimal('0.01')), total)
+    aux = _client_account(row)
+    label = f"Facture {row['number']} {aux[1]}"[:100]
+    entry = (SALES_JOURNAL, row['number'])
+
+    lines = [
+        _line(*entry, row['issue_date'], CLIENTS_ACCOUNT, aux, row['number'], label, total, 0, valid_date),
+        _line(*entry, row['issue_date'], SALES_ACCOUNT, ('', ''), row['number'], label, 0, total - vat, valid_date),
+    ]
+    if vat:
+        lines.append(_line(*entry, row['issue_date'], VAT_ACCOUNT, ('', ''), row['number'], label, 0, vat, valid_date))
+    return lines
+
+
+def payment_entry(row, valid_date):
+    """Lignes du journal de banque d'un paiement (encaissement client), None si non exportable."""
+    if row['invoice__status'] in EXCLUDED_STATUSES:
+        return None
+    aux = _client_account({
+        'client_id': row['client_id'],
+        'client_last_name': row['client_last_name'],
+        'client_first_name': row['client_first_name'],
+        'custom_recipient_name': row['invoice__custom_recipient_name'],
+        'custom_recipient_company': row['invoice__custom_recipient_company'],
+    })
+    number = f"RG-{row['id'].hex[:8].upper()}"
+    piece_ref = row['reference'] or row['invoice_number']
+    label = f"Règlement {row['invoice_number']} {row['method']}".strip()[:100]
+
+    return [
+        _line(BANK_JOURNAL, number, row['date'], BANK_ACCOUNT, ('', ''), piece_ref, label, row['amount'], 0, valid_date),
+        _line(BANK_JOURNAL, number, row['date'], CLIENTS_ACCOUNT, aux, piece_ref, label, 0, row['amount'], valid_date),
+    ]
+
+
+def iter_invoice_entries(invoices, valid_date):
+    """Écritures du journal des ventes, une liste de lignes par facture exportable."""
+    for row in _invoice_rows(invoices.exclude(status__in=EXCLUDED_STATUSES)):
+        yield invoice_entry(row, valid_date)
+
+
+def iter_payment_entries(payments, valid_date):
+    """Écritures du journal de banque, une liste de lignes par paiement exportable."""
+    for row in _payment_rows(payments.exclude(invoice__status__in=EXCLUDED_STATUSES)):
+        yield payment_entry(row, valid_date)
+
+
+def _fec_filename(closing_date):
+    siren = getattr(settings, 'COMPANY_SIREN', '')
+    return f"{siren}FEC{_date(closing_date)}.txt"
+
+
+def _fec_report(filename, sales_entries, bank_entries, on_complete=None):
+    """
+    Fichier FEC en streaming : journal des ventes puis journal de banque.
+
+    `sales_entries` / `bank_entries` : itérables d'écritures (listes de lignes).
+    `on_complete(sales_count, bank_count)` est appelé une fois la dernière
+    ligne produite (jamais si la génération est interrompue).
+    """
+    def _format(entry):
+        return ''.join('\t'.join(line) + '\r\n' for line in entry)
+
+    def _stream():
+        yield '\t'.join(FEC_COLUMNS) + '\r\n'
+        sales_count = bank_count = 0
+        for entry in sales_entries:
+            sales_count += 1
+            yield _format(entry)
+        for entry in bank_entries:
+            bank_count += 1
+            yield _format(entry)
+        if on_complete:
+            on_complete(sales_count, bank_count)
+
+    return CsvReport(filename, _stream(), content_type=FEC_CONTENT_TYPE)
+
+
+def build_fec_export(start_date, end_date):
+    """FEC complet de la période (factures par date d'émission, paiements par date)."""
+    invoices = Invoice.objects.filter(
+        issue_date__range=[start_date.date(), end_date.date()]
+    ).order_by('issue_date', 'number')
+    payments = Payment.objects.filter(
+        date__range=[start_date.date(), end_date.date()]
+    ).order_by('date', 'created_at')
+    valid_date = _date(timezone.localdate())
+    return _fec_report(
+        _fec_filename(end_date),
+        iter_invoice_entries(invoices, valid_date),
+        iter_payment_entries(payments, valid_date),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Export incrémental
+# ---------------------------------------------------------------------------
+
+# Colonnes comparées entre deux exports : journal, numéro, dates, comptes, pièce, montants
+# (les libellés, noms du client, ne déclenchent pas de contrepassation)
+FINGERPRINT_COLUMNS = (0, 2, 3, 4, 6, 8, 9, 11, 12)
+
+
+def entry_fingerprint(lines):
+    """Empreinte des colonnes comptables d'une écriture ('' si pas d'écriture)."""
+    if not lines:
+        return ''
+    payload = json.dumps([[line[index] for index in FINGERPRINT_COLUMNS] for line in lines])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _renumber(lines, number):
+    return [[*line[:2], number, *line[3:]] for line in lines]
+
+
+def _reversal(lines, number, valid_date):
+    """Contrepassation : mêmes comptes, débit et crédit inversés, datée du jour de l'export."""
+    return [
+        [
+            line[0], line[1], number, valid_date, line[4], line[5], line[6], line[7], line[8], line[9],
+            f"Annulation {line[10]}"[:100], line[12], line[11], '', '', valid_date, '', '',
+        ]
+        for line in lines
+    ]
+
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _IncrementalExport:
+    """
+    Écritures d'un export incrémental, comparées à celles déjà transmises.
+
+    Les écritures transmises à enregistrer sont accumulées dans `changes` et
+    écrites par `commit()`, une fois le fichier entièrement généré.
+    """
+
+    def __init__(self, cursor, reset, valid_date):
+        self.cursor = cursor
+        # Borne lue au début de l'export : un autre export qui l'avance entre-temps invalide celui-ci
+        self.started_from = cursor.watermark
+        self.reset = reset
+        self.valid_date = valid_date
+        self.changes = {}
+
+    def _stored(self, source, object_ids):
+        if self.reset:
+            return {}
+        entries = AccountingExportEntry.objects.filter(cursor=self.cursor, source=source, object_id__in=object_ids)
+        return {entry.object_id: entry for entry in entries}
+
+    def _revise(self, source, object_id, previous, lines):
+        """Contrepassation et / ou nouvelle écriture d'un objet, [] si rien n'a changé."""
+        fingerprint = entry_fingerprint(lines)
+        if previous is None and lines is None:
+            return []
+        if previous is not None and previous.fingerprint == fingerprint:
+            return []
+
+        entries = []
+        if previous is None:
+            entry = AccountingExportEntry(
+                cursor=self.cursor, source=source, object_id=object_id, entry_number=lines[0][2],
+            )
+        else:
+            entry = previous
+            entry.revision += 1
+            if previous.lines:
+                entries.append(_reversal(previous.lines, f"{entry.entry_number}-A{entry.revision}", self.valid_date))
+            if lines is not None:
+                lines = _renumber(lines, f"{entry.entry_number}-R{entry.revision}")
+        if lines is not None:
+            entries.append(lines)
+
+        entry.fingerprint = fingerprint
+        entry.lines = lines or []
+        self.changes[(source, object_id)] = entry
+        return entries
+
+    def revisions(self, source, rows, build):
+        """Écritures des objets `rows` (values) nouveaux ou modifiés."""
+        for chunk in _chunks(rows):
+            stored = self._stored(source, [row['id'] for row in chunk])
+            for row in chunk:
+                yield from self._revise(source, row['id'], stored.get(row['id']), build(row, self.valid_date))
+
+    def deletions(self, source, object_ids):
+        """Contrepassations des objets supprimés déjà transmis."""
+        for chunk in _chunks(object_ids):
+            for object_id, previous in self._stored(source, chunk).items():
+                yield from self._revise(source, object_id, previous, None)
+
+    def seed(self, watermark):
+        """
+        Consommateur exporté avant le suivi des écritures : les objets inchangés
+        depuis son dernier export sont considérés transmis dans leur état actuel.
+        """
+        journals = (
+            (AccountingExportEntry.Source.INVOICE, Invoice, _invoice_rows, invoice_entry),
+            (AccountingExportEntry.Source.PAYMENT, Payment, _payment_rows, payment_entry),
+        )
+        for source, model, rows, build in journals:
+            entries = (
+                AccountingExportEntry(
+                    cursor=self.cursor, source=source, object_id=row['id'], entry_number=lines[0][2],
+                    fingerprint=entry_fingerprint(lines), lines=lines,
+                )
+                for row in rows(model.objects.filter(updated_at__lte=watermark))
+                if (lines := build(row, self.valid_date))
+            )
+            for chunk in _chunks(entries):
+                AccountingExportEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+
+    def commit(self, until, sales_count, bank_count):
+        """Enregistre les écritures transmises et avance le watermark (refusé si un autre export a abouti)."""
+        now = timezone.now()
+        with transaction.atomic():
+            locked = AccountingExportCursor.objects.select_for_update().get(pk=self.cursor.pk)
+            if locked.watermark != self.started_from:
+                logger.error(
+                    "Export FEC concurrent pour %s : borne %s devenue %s, export non enregistré",
+                    self.cursor.consumer, self.started_from, locked.watermark,
+                )
+                raise RuntimeError(f"Export FEC concurrent pour {self.cursor.consumer} : relancer l'export")
+            if self.reset:
+                AccountingExportEntry.objects.filter(cursor=self.cursor).delete()
+            for entry in self.changes.values():
+                entry.exported_at = now
+            AccountingExportEntry.objects.bulk_create(
+                self.changes.values(),
+                batch_size=EXPORT_CHUNK_SIZE,
+                update_conflicts=True,
+                unique_fields=['cursor', 'source', 'object_id'],
+                update_fields=['revision', 'fingerprint', 'lines', 'exported_at'],
+            )
+            AccountingExportCursor.objects.filter(pk=self.cursor.pk).update(
+                watermark=until,
+                last_export_at=now,
+                last_export_invoices=sales_count,
+                last_export_payments=bank_count,
+            )
+
+
+def build_incremental_fec_export(consumer, reset=False):
+    """
+    FEC des seules écritures nouvelles, corrigées ou supprimées depuis le dernier export de `consumer`.
+
+    La borne haute est figée au début de l'export ; la relecture commence
+    FEC_EXPORT_OVERLAP_SECONDS avant la borne précédente (voir le docstring du
+    module). `reset=True` repart de zéro : réexport complet de l'état courant,
+    sans contrepassation, et oubli des écritures transmises.
+    """
+    cursor, _ = AccountingExportCursor.objects.get_or_create(consumer=consumer)
+    until = timezone.now()
+    since = None
+    if not reset and cursor.watermark:
+        since = cursor.watermark - timedelta(seconds=getattr(settings, 'FEC_EXPORT_OVERLAP_SECONDS', 600))
+    export = _IncrementalExport(cursor, reset, _date(timezone.localdate()))
+    if since and not cursor.entries.exists():
+        export.seed(cursor.watermark)
+
+    invoices = Invoice.objects.filter(updated_at__lte=until)
+    payments = Payment.objects.filter(updated_at__lte=until)
+    deleted = AccountingTombstone.objects.none()
+    if since:
+        changed_invoices = Invoice.objects.filter(updated_at__gt=since).values('pk')
+        invoices = invoices.filter(updated_at__gt=since)
+        # Une facture annulée ou réattribuée modifie aussi les écritures de ses paiements
+        payments = payments.filter(Q(updated_at__gt=since) | Q(invoice_id__in=changed_invoices))
+        deleted = AccountingTombstone.objects.filter(deleted_at__gt=since, deleted_at__lte=until)
+
+    def _deleted_ids(source):
+        return deleted.filter(source=source).values_list('object_id', flat=True).distinct().iterator()
+
+    def _journal(source, rows, build):
+        yield from export.revisions(source, rows, build)
+        yield from export.deletions(source, _deleted_ids(source))
+
+    return _fec_report(
+        _fec_filename(timezone.localtime(until)),
+        _journal(AccountingExportEntry.Source.INVOICE, _invoice_rows(invoices.order_by('updated_at', 'pk')), invoice_entry),
+        _journal(AccountingExportEntry.Source.PAYMENT, _payment_rows(payments.order_by('updated_at', 'pk')), payment_entry),
+        on_complete=lambda sales_count, bank_count: export.commit(until, sales_count, bank_count),
+    )
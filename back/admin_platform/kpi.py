@@ -0,0 +1,271 @@
+"""
+Calcul et stockage des snapshots journaliers de KPIs (DailyKPI).
+
+Le dashboard ne relit plus toutes les tables à chaque chargement :
+- les jours passés sont lus depuis `DailyKPI` (une ligne par jour) ;
+- le jour courant est calculé à la volée (delta "live").
+
+Les snapshots manquants (premier lancement, jour invalidé par un signal) sont
+reconstruits à la demande avec des requêtes groupées par jour, donc en un
+nombre constant de requêtes quelle que soit la longueur de la période.
+
+Le chiffre d'affaires vient de ces snapshots ; le funnel, la conversion par
+source et le taux de conversion du dashboard sont calculés en cohorte par
+`analytics.conversion_summary` (une seule définition du funnel).
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from request.models import ProspectRequest
+from offers.models import Offer
+from billing.models import Quote
+from installations.models import Form
+from invoices.models import Invoice
+
+from .models import DailyKPI
+
+
+# Champs numériques d'un snapshot (hors répartition par source)
+COUNT_FIELDS = (
+    'requests_count',
+    'converted_requests_count',
+    'offers_count',
+    'signed_quotes_count',
+    'completed_installations_count',
+)
+AMOUNT_FIELDS = (
+    'revenue_paid',
+    'revenue_pending',
+    'revenue_potential',
+)
+KPI_FIELDS = COUNT_FIELDS + AMOUNT_FIELDS
+
+FIRST_ACTIVITY_CACHE_KEY = 'kpi:first_activity_day'
+
+
+def empty_kpis():
+    """Retourne un snapshot vide (tous les compteurs à zéro)."""
+    kpis = {field: 0 for field in COUNT_FIELDS}
+    kpis.update({field: Decimal('0') for field in AMOUNT_FIELDS})
+    kpis['requests_by_source'] = {}
+    return kpis
+
+
+def _group_by_day(queryset, start_day, end_day, **aggregates):
+    """
+    Agrège un queryset par jour de création (fuseau local).
+
+    Retourne {date: {alias: valeur}} pour les seuls jours ayant des données.
+    """
+    rows = (
+        queryset
+        .filter(created_at__date__range=(start_day, end_day))
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(**aggregates)
+        .order_by()
+    )
+    return {row.pop('day'): row for row in rows}
+
+
+def _sum_amount(field, **filters):
+    """Somme d'un montant restreinte par `filters`, 0 si aucune ligne."""
+    return Coalesce(Sum(field, filter=Q(**filters)), Decimal('0'))
+
+
+def compute_daily_kpis(start_day: date, end_day: date) -> dict:
+    """
+    Calcule les KPIs de chaque jour de [start_day, end_day] depuis les tables métier.
+
+    Nombre de requêtes constant (une par table), indépendant de la période
+    et du nombre de sources.
+    Retourne {date: kpis} avec une entrée pour chaque jour de la période.
+    """
+    # Demandes et répartition par source : une requête groupée par (jour, source), sans
+    # jointure (le funnel en cohorte est servi par analytics.conversion_summary)
+    sources = (
+        ProspectRequest.objects
+        .filter(created_at__date__range=(start_day, end_day))
+        .annotate(day=TruncDate('created_at'))
+        .values('day', 'source_type')
+        .annotate(requests=Count('id'), converted=Count('id', filter=Q(converted_decision=True)))
+        .order_by()
+    )
+    offers = _group_by_day(
+        Offer.objects.all(), start_day, end_day,
+        offers_count=Count('id'),
+    )
+    quotes = _group_by_day(
+        Quote.objects.all(), start_day, end_day,
+        signed_quotes_count=Count('id', filter=Q(status=Quote.Status.ACCEPTED)),
+        revenue_potential=_sum_amount('total', status__in=[Quote.Status.SENT, Quote.Status.PENDING]),
+    )
+    installations = _group_by_day(
+        Form.objects.all(), start_day, end_day,
+        completed_installations_count=Count('id', filter=Q(status=Form.Status.COMMISSIONING)),
+    )
+    invoices = _group_by_day(
+        Invoice.objects.all(), start_day, end_day,
+        revenue_paid=_sum_amount('total', status=Invoice.Status.PAID),
+        revenue_pending=_sum_amount('total', status__in=[Invoice.Status.ISSUED, Invoice.Status.PARTIALLY_PAID]),
+    )
+
+    result = {}
+    day = start_day
+    while day <= end_day:
+        kpis = empty_kpis()
+        for grouped in (offers, quotes, installations, invoices):
+            kpis.update(grouped.get(day, {}))
+        result[day] = kpis
+        day += timedelta(days=1)
+
+    for row in sources:
+        kpis = result[row['day']]
+        kpis['requests_count'] += row['requests']
+        kpis['converted_requests_count'] += row['converted']
+        kpis['requests_by_source'][row['source_type']] = {
+            'count': row['requests'],
+            'converted': row['converted'],
+        }
+
+    return result
+
+
+def refresh_daily_kpis(start_day: date, end_day: date) -> int:
+    """
+    Recalcule et enregistre les snapshots de [start_day, end_day].
+
+    Le jour courant et les jours futurs sont ignorés : ils restent calculés en direct.
+    Retourne le nombre de snapshots écrits.
+    """
+    end_day = min(end_day, timezone.localdate() - timedelta(days=1))
+    if start_day > end_day:
+        return 0
+
+    snapshots = [
+        DailyKPI(date=day, **kpis)
+        for day, kpis in compute_daily_kpis(start_day, end_day).items()
+    ]
+    with transaction.atomic():
+        DailyKPI.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=list(KPI_FIELDS) + ['requests_by_source', 'computed_at'],
+        )
+    return len(snapshots)
+
+
+def _first_activity_day():
+    """
+    Premier jour où une donnée suivie par les KPIs a été créée (None si base vide).
+
+    Mis en cache : cette date ne peut que rester stable une fois des données présentes.
+    """
+    first_day = cache.get(FIRST_ACTIVITY_CACHE_KEY)
+    if first_day is not None:
+        return first_day
+
+    firsts = [
+        model.objects.aggregate(first=Min('created_at'))['first']
+        for model in (ProspectRequest, Offer, Quote, Form, Invoice)
+    ]
+    firsts = [timezone.localdate(value) for value in firsts if value is not None]
+    if not firsts:
+        return None
+    first_day = min(firsts)
+    cache.set(FIRST_ACTIVITY_CACHE_KEY, first_day, 24 * 3600)
+    return first_day
+
+
+def ensure_daily_kpis(start_day: date, end_day: date) -> None:
+    """
+    Construit les snapshots manquants des jours passés de la période.
+
+    Les jours antérieurs à la première activité ne sont pas matérialisés.
+    """
+    end_day = min(end_day, timezone.localdate() - timedelta(days=1))
+    first_day = _first_activity_day()
+    if first_day is None or start_day > end_day or first_day > end_day:
+        return
+    start_day = max(start_day, first_day)
+
+    stored = set(
+        DailyKPI.objects.filter(date__range=(start_day, end_day)).values_list('date', flat=True)
+    )
+    if len(stored) >= (end_day - start_day).days + 1:
+        return
+
+    missing = []
+    day = start_day
+    while day <= end_day:
+        if day not in stored:
+            missing.append(day)
+        day += timedelta(days=1)
+    refresh_daily_kpis(missing[0], missing[-1])
+
+
+def get_daily_kpis(start_day: date, end_day: date) -> list:
+    """
+    Retourne les KPIs jour par jour de [start_day, end_day], triés par date.
+
+    Historique lu depuis DailyKPI, jour courant calculé en direct.
+    Chaque élément est un dict contenant `date`, les champs de KPI_FIELDS
+    et `requests_by_source`.
+    """
+    today = timezone.localdate()
+    days = []
+
+    history_end = min(end_day, today - timedelta(days=1))
+    if start_day <= history_end:
+        ensure_daily_kpis(start_day, history_end)
+        days.extend(
+            DailyKPI.objects
+            .filter(date__range=(start_day, history_end))
+            .order_by('date')
+            .values('date', 'requests_by_source', *KPI_FIELDS)
+        )
+
+    if start_day <= today <= end_day:
+        live = compute_daily_kpis(today, today)[today]
+        live['date'] = today
+        days.append(live)
+
+    return days
+
+
+def sum_daily_kpis(days) -> dict:
+    """Additionne une liste de KPIs journaliers (voir get_daily_kpis)."""
+    totals = empty_kpis()
+    for day in days:
+        for field in KPI_FIELDS:
+            totals[field] += day[field]
+        for source_type, stats in (day['requests_by_source'] or {}).items():
+            source_totals = totals['requests_by_source'].setdefault(source_type, {'count': 0, 'converted': 0})
+            source_totals['count'] += stats.get('count', 0)
+            source_totals['converted'] += stats.get('converted', 0)
+    return totals
+
+
+def invalidate_daily_kpi(created_at) -> None:
+    """
+    Supprime le snapshot du jour de création d'un objet modifié.
+
+    Il sera reconstruit au prochain affichage du dashboard (ou par la tâche nocturne).
+    Supprimé à nouveau au commit : un affichage concurrent a pu le reconstruire
+    depuis l'état d'avant le commit, et un jour hors de la fenêtre de la tâche
+    nocturne ne serait plus jamais recalculé.
+    """
+    if created_at is None:
+        return
+    day = timezone.localdate(created_at)
+    if day < timezone.localdate():
+        DailyKPI.objects.filter(date=day).delete()
+        transaction.on_commit(lambda: DailyKPI.objects.filter(date=day).delete())
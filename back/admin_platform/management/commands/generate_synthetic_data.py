@@ -0,0 +1,65 @@
+"""
+Génère un jeu de données synthétique réaliste pour les benchmarks.
+
+Usage:
+    # 10 000 demandes et leur parcours complet, réparties sur 24 mois
+    python manage.py generate_synthetic_data --requests 10000
+
+    # Volume de charge (100k demandes), génération reproductible
+    python manage.py generate_synthetic_data --requests 100000 --seed 1 --batch-size 2000
+
+    # Supprimer toutes les données synthétiques
+    python manage.py generate_synthetic_data --purge
+
+Voir admin_platform/synthetic.py pour la structure générée et
+scripts/benchmark_endpoints.py pour mesurer les endpoints sur ces données.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_platform.synthetic import SyntheticDataGenerator, purge_synthetic_data
+
+
+class Command(BaseCommand):
+    help = 'Génère un graphe de données synthétique (demandes → offres → devis → installations → factures → tâches)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Nombre de demandes (défaut: 1000)')
+        parser.add_argument('--months', type=int, default=24, help='Période couverte en mois (défaut: 24)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Taille des lots d\'insertion (défaut: 1000)')
+        parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire (défaut: 42)')
+        parser.add_argument('--staff', type=int, help='Nombre de commerciaux (défaut: 1 pour 2000 demandes, minimum 5)')
+        parser.add_argument('--purge', action='store_true', help='Supprimer les données synthétiques existantes')
+        parser.add_argument('--force', action='store_true', help='Autoriser l\'exécution hors DEBUG')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError('Refusé hors DEBUG : ajouter --force pour générer sur cette base')
+
+        if options['purge']:
+            deleted = purge_synthetic_data()
+            self.stdout.write(self.style.SUCCESS(f'✓ {deleted} objets synthétiques supprimés'))
+            return
+
+        if options['requests'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--requests et --batch-size doivent être positifs')
+
+        started = time.perf_counter()
+        generator = SyntheticDataGenerator(
+            requests=options['requests'],
+            months=options['months'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            staff=options['staff'],
+            log=self.stdout.write,
+        )
+        counts = generator.run()
+
+        for label, count in counts.items():
+            self.stdout.write(f'  {label:<40} {count:>10}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {sum(counts.values())} objets générés en {time.perf_counter() - started:.1f} s'
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from admin_platform.audit_subjects import rebuild_audit_subjects
+
+
+class Command(BaseCommand):
+    help = "Indexe les entrées d'audit par utilisateur concerné (AuditSubject, timeline des utilisateurs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help="Vider l'index avant reconstruction (propriétaires actuels des objets)",
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Entrées par lot (défaut: 2000)')
+
+    def handle(self, *args, **options):
+        written = rebuild_audit_subjects(reset=options['reset'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{written} rattachements d'audit indexés"))
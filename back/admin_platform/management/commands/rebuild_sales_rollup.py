@@ -0,0 +1,26 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_platform.rollups import rebuild_sales_rollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les agrégats mensuels des ventes par commercial (MonthlySalesRollup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Mois de départ (YYYY-MM). Par défaut : depuis le premier devis ou paiement',
+        )
+
+    def handle(self, *args, **options):
+        start_day = None
+        if options['since']:
+            try:
+                start_day = datetime.strptime(options['since'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('Format attendu pour --since : YYYY-MM')
+
+        written = rebuild_sales_rollup(start_day)
+        self.stdout.write(self.style.SUCCESS(f'{written} agrégats mensuels des ventes reconstruits'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyKPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Jour concerné (fuseau horaire local)', unique=True)),
+                ('requests_count', models.PositiveIntegerField(default=0, help_text='Demandes créées ce jour')),
+                ('converted_requests_count', models.PositiveIntegerField(default=0, help_text='Demandes créées ce jour et validées (converted_decision=True)')),
+                ('offers_count', models.PositiveIntegerField(default=0, help_text='Offres créées ce jour')),
+                ('signed_quotes_count', models.PositiveIntegerField(default=0, help_text='Devis créés ce jour et acceptés')),
+                ('completed_installations_count', models.PositiveIntegerField(default=0, help_text="Fiches d'installation créées ce jour et mises en service")),
+                ('revenue_paid', models.DecimalField(decimal_places=2, default=0, help_text='Total des factures payées créées ce jour', max_digits=14)),
+                ('revenue_pending', models.DecimalField(decimal_places=2, default=0, help_text='Total des factures émises non soldées créées ce jour', max_digits=14)),
+                ('revenue_potential', models.DecimalField(decimal_places=2, default=0, help_text='Total des devis envoyés/en attente créés ce jour', max_digits=14)),
+                ('requests_by_source', models.JSONField(blank=True, default=dict, help_text='Nombre de demandes et de conversions par source')),
+                ('computed_at', models.DateTimeField(auto_now=True, help_text='Date du dernier calcul du snapshot')),
+            ],
+            options={
+                'verbose_name': 'KPI journalier',
+                'verbose_name_plural': 'KPIs journaliers',
+                'db_table': 'admin_platform_daily_kpi',
+                'ordering': ['-date'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:55
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0002_dailykpi'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('report_type', models.CharField(choices=[('accounting', 'Export comptable'), ('sales', 'Rapport des ventes'), ('commissions', 'Rapport des commissions'), ('prospects', 'Rapport des prospects')], help_text='Type de rapport', max_length=20)),
+                ('params', models.JSONField(blank=True, default=dict, help_text='Paramètres du rapport (dates, filtres, format)')),
+                ('params_hash', models.CharField(help_text='Empreinte du type et des paramètres (réutilisation des artefacts)', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('completed', 'Terminé'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('file', models.FileField(blank=True, null=True, upload_to='reports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='report_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job de rapport',
+                'verbose_name_plural': 'Jobs de rapports',
+                'db_table': 'admin_platform_report_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', '-created_at'], name='admin_platf_params__b540fd_idx')],
+            },
+        ),
+    ]
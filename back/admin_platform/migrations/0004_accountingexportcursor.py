@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-19 15:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0003_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountingExportCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumer', models.CharField(help_text='Identifiant du consommateur (ex : cabinet comptable)', max_length=100, unique=True)),
+                ('watermark', models.DateTimeField(blank=True, help_text='Borne haute du dernier export (vide = tout réexporter)', null=True)),
+                ('last_export_at', models.DateTimeField(blank=True, null=True)),
+                ('last_export_invoices', models.PositiveIntegerField(default=0)),
+                ('last_export_payments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': "Curseur d'export comptable",
+                'verbose_name_plural': "Curseurs d'export comptable",
+                'db_table': 'admin_platform_accounting_export_cursor',
+                'ordering': ['consumer'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0004_accountingexportcursor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Premier jour du mois')),
+                ('signed_quotes_count', models.PositiveIntegerField(default=0)),
+                ('signed_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('salesperson', models.ForeignKey(blank=True, help_text='Commercial assigné à la demande (vide = sans commercial)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Agrégat mensuel des ventes',
+                'verbose_name_plural': 'Agrégats mensuels des ventes',
+                'db_table': 'admin_platform_monthly_sales_rollup',
+                'ordering': ['-month'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'salesperson'), name='uq_sales_rollup_month_salesperson'), models.UniqueConstraint(condition=models.Q(('salesperson__isnull', True)), fields=('month',), name='uq_sales_rollup_month_no_salesperson')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0005_monthlysalesrollup'),
+        ('auditlog', '0015_alter_logentry_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditSubject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject_id', models.UUIDField(help_text="Utilisateur concerné (conservé si l'utilisateur est supprimé)")),
+                ('relation', models.CharField(choices=[('actor', 'Acteur'), ('owner', 'Propriétaire')], max_length=10)),
+                ('timestamp', models.DateTimeField(help_text='Copie de LogEntry.timestamp (tri de la timeline)')),
+                ('log_entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subjects', to='auditlog.logentry')),
+            ],
+            options={
+                'verbose_name': "Sujet d'audit",
+                'verbose_name_plural': "Sujets d'audit",
+                'db_table': 'admin_platform_audit_subject',
+                'indexes': [models.Index(fields=['subject_id', '-timestamp', '-log_entry'], name='audit_subject_timeline_idx')],
+                'constraints': [models.UniqueConstraint(fields=('log_entry', 'subject_id'), name='uq_audit_subject_entry_subject')],
+            },
+        ),
+    ]
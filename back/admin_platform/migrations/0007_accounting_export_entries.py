@@ -0,0 +1,50 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0006_auditsubject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountingTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('invoice', 'Facture'), ('payment', 'Paiement')], max_length=10)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Suppression comptable',
+                'verbose_name_plural': 'Suppressions comptables',
+                'db_table': 'admin_platform_accounting_tombstone',
+                'ordering': ['deleted_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AccountingExportEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('invoice', 'Facture'), ('payment', 'Paiement')], max_length=10)),
+                ('object_id', models.UUIDField(help_text='Facture ou paiement exporté')),
+                ('entry_number', models.CharField(help_text='EcritureNum de la première écriture', max_length=64)),
+                ('revision', models.PositiveIntegerField(default=0, help_text='Nombre de corrections exportées')),
+                ('fingerprint', models.CharField(blank=True, help_text='Empreinte des colonnes comptables (vide = écriture contrepassée)', max_length=64)),
+                ('lines', models.JSONField(default=list, help_text='Lignes FEC transmises (base de la contrepassation)')),
+                ('exported_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cursor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='admin_platform.accountingexportcursor')),
+            ],
+            options={
+                'verbose_name': 'Écriture exportée',
+                'verbose_name_plural': 'Écritures exportées',
+                'db_table': 'admin_platform_accounting_export_entry',
+                'constraints': [models.UniqueConstraint(fields=('cursor', 'source', 'object_id'), name='uq_accounting_export_entry')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+
+
+def backfill_monthly_sales_rollup(apps, schema_editor):
+    """
+    Calcule les agrégats des mois déjà écoulés (même règles que
+    `rollups.compute_sales_rollup`), sans quoi le rapport des ventes afficherait
+    0 pour l'historique jusqu'au premier `rebuild_sales_rollup`.
+    """
+    Quote = apps.get_model('billing', 'Quote')
+    Payment = apps.get_model('invoices', 'Payment')
+    MonthlySalesRollup = apps.get_model('admin_platform', 'MonthlySalesRollup')
+
+    quote_rows = (
+        Quote.objects
+        .filter(status='accepted')
+        .annotate(
+            month=TruncMonth('created_at', output_field=DateField()),
+            salesperson=F('offer__request__assigned_to'),
+        )
+        .values('month', 'salesperson')
+        .annotate(signed_quotes_count=Count('id'), signed_revenue=Coalesce(Sum('total'), Decimal('0')))
+        .order_by()
+    )
+    payment_rows = (
+        Payment.objects
+        .annotate(
+            month=TruncMonth('date'),
+            salesperson=Coalesce(
+                'invoice__quote__offer__request__assigned_to',
+                'invoice__installation__offer__request__assigned_to',
+            ),
+        )
+        .values('month', 'salesperson')
+        .annotate(payments_count=Count('id'), paid_revenue=Coalesce(Sum('amount'), Decimal('0')))
+        .order_by()
+    )
+
+    rollups = {}
+    for rows in (quote_rows, payment_rows):
+        for row in rows:
+            key = (row.pop('month'), row.pop('salesperson'))
+            rollups.setdefault(key, {}).update(row)
+
+    MonthlySalesRollup.objects.all().delete()
+    MonthlySalesRollup.objects.bulk_create(
+        [
+            MonthlySalesRollup(month=month, salesperson_id=salesperson_id, **values)
+            for (month, salesperson_id), values in rollups.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_platform', '0007_accounting_export_entries'),
+        ('billing', '0004_quote_is_latest'),
+        ('invoices', '0008_payment_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_monthly_sales_rollup, migrations.RunPython.noop),
+    ]
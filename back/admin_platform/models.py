@@ -2,6 +2,9 @@
 Modèles pour la plateforme d'administration.
 """
 
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
@@ -93,3 +96,333 @@ class EmailLog(models.Model):
         """Indique si l'email contient des pièces jointes."""
         return bool(self.attachments_info)
 
+
+
+class DailyKPI(models.Model):
+    """
+    Snapshot journalier des indicateurs du tableau de bord.
+    
+    Une ligne par jour (date locale de création des objets). Les jours passés
+    sont figés par la tâche nocturne `admin_platform.tasks.refresh_daily_kpis`,
+    le jour courant est toujours calculé à la volée par le dashboard.
+    """
+    
+    date = models.DateField(
+        unique=True,
+        help_text="Jour concerné (fuseau horaire local)"
+    )
+    
+    # Funnel de conversion
+    requests_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Demandes créées ce jour"
+    )
+    converted_requests_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Demandes créées ce jour et validées (converted_decision=True)"
+    )
+    offers_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Offres créées ce jour"
+    )
+    signed_quotes_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Devis créés ce jour et acceptés"
+    )
+    completed_installations_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Fiches d'installation créées ce jour et mises en service"
+    )
+    
+    # Chiffre d'affaires
+    revenue_paid = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Total des factures payées créées ce jour"
+    )
+    revenue_pending = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Total des factures émises non soldées créées ce jour"
+    )
+    revenue_potential = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text="Total des devis envoyés/en attente créés ce jour"
+    )
+    
+    # Répartition par source : {"web_form": {"count": 3, "converted": 1}, ...}
+    requests_by_source = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Nombre de demandes et de conversions par source"
+    )
+    
+    computed_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Date du dernier calcul du snapshot"
+    )
+    
+    class Meta:
+        db_table = 'admin_platform_daily_kpi'
+        ordering = ['-date']
+        verbose_name = "KPI journalier"
+        verbose_name_plural = "KPIs journaliers"
+    
+    def __str__(self):
+        return f"KPIs du {self.date.strftime('%d/%m/%Y')}"
+
+
+class ReportJob(models.Model):
+    """
+    Génération asynchrone d'un rapport (export comptable, ventes, commissions, prospects).
+    
+    Le rapport est construit par la tâche Celery `admin_platform.tasks.generate_report_job`
+    et le fichier (CSV ou XLSX) est conservé dans le stockage média. Un job terminé
+    est réutilisé pour les mêmes paramètres pendant REPORT_JOB_TTL secondes ; un
+    job abandonné (voir `reports.fail_stale_report_jobs`) passe en échec.
+    """
+    
+    class ReportType(models.TextChoices):
+        ACCOUNTING = 'accounting', 'Export comptable'
+        SALES = 'sales', 'Rapport des ventes'
+        COMMISSIONS = 'commissions', 'Rapport des commissions'
+        PROSPECTS = 'prospects', 'Rapport des prospects'
+    
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'En attente'
+        RUNNING = 'running', 'En cours'
+        COMPLETED = 'completed', 'Terminé'
+        FAILED = 'failed', 'Échec'
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    report_type = models.CharField(
+        max_length=20,
+        choices=ReportType.choices,
+        help_text="Type de rapport"
+    )
+    params = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Paramètres du rapport (dates, filtres, format)"
+    )
+    params_hash = models.CharField(
+        max_length=64,
+        help_text="Empreinte du type et des paramètres (réutilisation des artefacts)"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    file = models.FileField(upload_to="reports/", null=True, blank=True)
+    error = models.TextField(blank=True)
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='report_jobs'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'admin_platform_report_job'
+        ordering = ['-created_at']
+        verbose_name = "Job de rapport"
+        verbose_name_plural = "Jobs de rapports"
+        indexes = [
+            models.Index(fields=['params_hash', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_report_type_display()} ({self.get_status_display()})"
+
+
+class AccountingExportCursor(models.Model):
+    """
+    Position (watermark) d'un consommateur de l'export comptable incrémental.
+    
+    Chaque export FEC incrémental relit les factures et paiements modifiés
+    (`updated_at`) et les suppressions (`AccountingTombstone`) depuis le
+    watermark, puis l'avance à l'horodatage de début de l'export. Ce qui a déjà
+    été transmis au consommateur est suivi par `AccountingExportEntry`.
+    """
+    
+    consumer = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Identifiant du consommateur (ex : cabinet comptable)"
+    )
+    watermark = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Borne haute du dernier export (vide = tout réexporter)"
+    )
+    last_export_at = models.DateTimeField(null=True, blank=True)
+    last_export_invoices = models.PositiveIntegerField(default=0)
+    last_export_payments = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'admin_platform_accounting_export_cursor'
+        ordering = ['consumer']
+        verbose_name = "Curseur d'export comptable"
+        verbose_name_plural = "Curseurs d'export comptable"
+    
+    def __str__(self):
+        return f"{self.consumer} ({self.watermark or 'jamais exporté'})"
+
+
+class MonthlySalesRollup(models.Model):
+    """
+    Agrégat mensuel des ventes par commercial.
+    
+    - Devis signés : devis acceptés, par mois de création du devis (comme le rapport des ventes)
+    - Encaissements : paiements des factures, par mois de paiement
+    
+    Un mois est recalculé entièrement à chaque signature de devis ou paiement
+    (`admin_platform.signals`) ; la commande `rebuild_sales_rollup` reconstruit
+    tout ou partie de la table.
+    """
+    
+    month = models.DateField(help_text="Premier jour du mois")
+    salesperson = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='sales_rollups',
+        help_text="Commercial assigné à la demande (vide = sans commercial)"
+    )
+    
+    signed_quotes_count = models.PositiveIntegerField(default=0)
+    signed_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments_count = models.PositiveIntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'admin_platform_monthly_sales_rollup'
+        ordering = ['-month']
+        verbose_name = "Agrégat mensuel des ventes"
+        verbose_name_plural = "Agrégats mensuels des ventes"
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'salesperson'], name='uq_sales_rollup_month_salesperson'),
+            models.UniqueConstraint(
+                fields=['month'],
+                condition=models.Q(salesperson__isnull=True),
+                name='uq_sales_rollup_month_no_salesperson'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Ventes {self.month.strftime('%m/%Y')} - {self.salesperson or 'Sans commercial'}"
+
+
+class AuditSubject(models.Model):
+    """
+    Rattachement d'une entrée d'audit aux utilisateurs dont elle fait partie de la timeline.
+    
+    - ACTOR : l'utilisateur a effectué l'action
+    - OWNER : l'objet appartient à l'utilisateur (lui-même, ses demandes en tant
+      que source, et les offres, devis, fiches et factures qui en découlent)
+    
+    Rempli à l'écriture de chaque entrée (`admin_platform.signals`), la timeline
+    d'un utilisateur est un parcours de l'index (subject_id, timestamp) au lieu
+    d'un OU sur toutes les clés de ses objets. `rebuild_audit_subjects`
+    reconstruit la table (mise en place, changement de source d'une demande).
+    """
+    
+    class Relation(models.TextChoices):
+        ACTOR = 'actor', 'Acteur'
+        OWNER = 'owner', 'Propriétaire'
+    
+    log_entry = models.ForeignKey(
+        'auditlog.LogEntry',
+        on_delete=models.CASCADE,
+        related_name='subjects'
+    )
+    subject_id = models.UUIDField(help_text="Utilisateur concerné (conservé si l'utilisateur est supprimé)")
+    relation = models.CharField(max_length=10, choices=Relation.choices)
+    timestamp = models.DateTimeField(help_text="Copie de LogEntry.timestamp (tri de la timeline)")
+    
+    class Meta:
+        db_table = 'admin_platform_audit_subject'
+        verbose_name = "Sujet d'audit"
+        verbose_name_plural = "Sujets d'audit"
+        constraints = [
+            models.UniqueConstraint(fields=['log_entry', 'subject_id'], name='uq_audit_subject_entry_subject'),
+        ]
+        indexes = [
+            models.Index(fields=['subject_id', '-timestamp', '-log_entry'], name='audit_subject_timeline_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject_id} ({self.get_relation_display()}) - {self.log_entry_id}"
+
+
+class AccountingExportEntry(models.Model):
+    """
+    Dernière écriture transmise à un consommateur pour une facture ou un paiement.
+
+    Une facture n'est exportée qu'une fois ; si un champ comptable change
+    ensuite (montants, date, client, annulation), l'export suivant contient la
+    contrepassation des lignes mémorisées puis la nouvelle écriture. Un
+    changement sans effet comptable (paid_total, statut de paiement) ne
+    réexporte rien.
+    """
+
+    class Source(models.TextChoices):
+        INVOICE = 'invoice', 'Facture'
+        PAYMENT = 'payment', 'Paiement'
+
+    cursor = models.ForeignKey(AccountingExportCursor, on_delete=models.CASCADE, related_name='entries')
+    source = models.CharField(max_length=10, choices=Source.choices)
+    object_id = models.UUIDField(help_text="Facture ou paiement exporté")
+    entry_number = models.CharField(max_length=64, help_text="EcritureNum de la première écriture")
+    revision = models.PositiveIntegerField(default=0, help_text="Nombre de corrections exportées")
+    fingerprint = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Empreinte des colonnes comptables (vide = écriture contrepassée)"
+    )
+    lines = models.JSONField(default=list, help_text="Lignes FEC transmises (base de la contrepassation)")
+    exported_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'admin_platform_accounting_export_entry'
+        verbose_name = "Écriture exportée"
+        verbose_name_plural = "Écritures exportées"
+        constraints = [
+            models.UniqueConstraint(fields=['cursor', 'source', 'object_id'], name='uq_accounting_export_entry'),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_number} (révision {self.revision})"
+
+
+class AccountingTombstone(models.Model):
+    """
+    Suppression d'une facture ou d'un paiement, pour contrepasser son écriture
+    lors du prochain export comptable incrémental.
+    """
+
+    source = models.CharField(max_length=10, choices=AccountingExportEntry.Source.choices)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'admin_platform_accounting_tombstone'
+        ordering = ['deleted_at']
+        verbose_name = "Suppression comptable"
+        verbose_name_plural = "Suppressions comptables"
+
+    def __str__(self):
+        return f"{self.get_source_display()} {self.object_id} supprimé(e) le {self.deleted_at:%d/%m/%Y}"
@@ -0,0 +1,199 @@
+"""
+Cache des actions du dashboard et des rapports.
+
+Les réponses sont mises en cache par action et par paramètres de requête
+(période, dates, filtres). Toutes les entrées partagent un numéro de
+génération : les signaux de `admin_platform.signals` l'incrémentent à chaque
+modification d'une facture, d'un devis, d'une fiche d'installation, d'une
+demande, d'une offre ou d'un paiement, puis à nouveau au commit de la
+transaction (une réponse recalculée entre-temps depuis l'état d'avant le
+commit n'est pas servie), ce qui invalide l'ensemble du cache d'un coup.
+
+Des compteurs hits/misses par action permettent de suivre le taux de succès.
+
+Les exports de fichiers (CSV, XLSX) sont renvoyés en streaming et ne sont donc
+pas mis en cache : seules les réponses JSON et HttpResponse classiques le sont.
+"""
+
+import hashlib
+import logging
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'reports_cache'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+
+# Actions décorées, par préfixe (ex : {'dashboard': ['overview', ...]})
+CACHED_ACTIONS = {}
+
+
+def _get_generation():
+    """Numéro de génération courant (initialisé à l'horodatage si absent)."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Valeur unique pour ne jamais réutiliser une ancienne génération après éviction
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def invalidate_reports_cache():
+    """Invalide toutes les entrées du cache dashboard/rapports."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Clé absente : une nouvelle génération sera créée au prochain accès
+        pass
+    except Exception as e:
+        logger.warning("Invalidation du cache des rapports impossible: %s", e)
+
+
+def _stat_key(prefix, action_name, kind):
+    return f'{CACHE_PREFIX}:stats:{prefix}:{action_name}:{kind}'
+
+
+def _record(prefix, action_name, kind):
+    """Incrémente le compteur hits/misses d'une action."""
+    key = _stat_key(prefix, action_name, kind)
+    try:
+        cache.add(key, 0, None)
+        cache.incr(key)
+    except Exception:
+        pass
+
+
+def _build_key(prefix, action_name, request):
+    params = urlencode(sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+    ))
+    digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+    return f'{CACHE_PREFIX}:v{_get_generation()}:{prefix}:{action_name}:{digest}'
+
+
+def _serialize(response):
+    """Convertit une réponse en données cachables (None si non cachable)."""
+    if response.status_code != 200 or isinstance(response, StreamingHttpResponse):
+        return None
+    if isinstance(response, Response):
+        return {'kind': 'drf', 'data': response.data}
+    if isinstance(response, HttpResponse):
+        return {
+            'kind': 'http',
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {
+                key: value for key, value in response.headers.items()
+                if key.lower() != 'content-type'
+            },
+        }
+    return None
+
+
+def _deserialize(payload):
+    if payload['kind'] == 'drf':
+        return Response(payload['data'])
+    response = HttpResponse(payload['content'], content_type=payload['content_type'])
+    for key, value in payload['headers'].items():
+        response[key] = value
+    return response
+
+
+def cached_action(prefix, timeout=None):
+    """
+    Décorateur d'action de ViewSet : met la réponse en cache par action et paramètres.
+
+    À placer sous `@action`. Les réponses en streaming et les erreurs ne sont pas
+    mises en cache. Si le cache est indisponible, la vue est exécutée normalement.
+    """
+    def decorator(view_func):
+        action_name = view_func.__name__
+        CACHED_ACTIONS.setdefault(prefix, []).append(action_name)
+
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            try:
+                key = _build_key(prefix, action_name, request)
+                payload = cache.get(key)
+            except Exception as e:
+                logger.warning("Cache des rapports indisponible: %s", e)
+                return view_func(self, request, *args, **kwargs)
+
+            if payload is not None:
+                _record(prefix, action_name, 'hits')
+                return _deserialize(payload)
+
+            _record(prefix, action_name, 'misses')
+            response = view_func(self, request, *args, **kwargs)
+
+            payload = _serialize(response)
+            if payload is not None:
+                try:
+                    cache.set(
+                        key,
+                        payload,
+                        timeout if timeout is not None else getattr(settings, 'REPORTS_CACHE_TIMEOUT', 300),
+                    )
+                except Exception as e:
+                    logger.warning("Écriture dans le cache des rapports impossible: %s", e)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats():
+    """
+    Statistiques hits/misses par action décorée.
+
+    Retourne {"actions": [{"prefix", "action", "hits", "misses", "hit_rate"}], "total": {...}}
+    """
+    keys = {
+        (prefix, action_name, kind): _stat_key(prefix, action_name, kind)
+        for prefix, actions in CACHED_ACTIONS.items()
+        for action_name in actions
+        for kind in ('hits', 'misses')
+    }
+    try:
+        values = cache.get_many(list(keys.values()))
+    except Exception:
+        values = {}
+
+    def _rate(hits, misses):
+        total = hits + misses
+        return round(hits / total * 100, 2) if total > 0 else 0
+
+    actions = []
+    total_hits = total_misses = 0
+    for prefix, action_names in CACHED_ACTIONS.items():
+        for action_name in action_names:
+            hits = values.get(keys[(prefix, action_name, 'hits')], 0)
+            misses = values.get(keys[(prefix, action_name, 'misses')], 0)
+            total_hits += hits
+            total_misses += misses
+            actions.append({
+                'prefix': prefix,
+                'action': action_name,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': _rate(hits, misses),
+            })
+
+    return {
+        'actions': actions,
+        'total': {
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_rate': _rate(total_hits, total_misses),
+        },
+    }
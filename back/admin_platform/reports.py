@@ -0,0 +1,772 @@
+"""
+Construction des rapports et exports (comptable, ventes, commissions, prospects).
+
+Les fonctions `build_*` prennent les paramètres de requête (QueryDict ou dict)
+et renvoient un rapport prêt à être écrit : `CsvReport` ou `ReportWriter`.
+Les deux exposent `filename`, `response()` (réponse HTTP en streaming) et
+`save(fileobj)` (écriture dans un fichier, utilisée par les jobs asynchrones).
+
+Elles sont partagées par `ReportsViewSet` (génération synchrone) et par la
+tâche Celery `generate_report_job` (génération en arrière-plan, voir
+`get_or_create_report_job` et `run_report_job`).
+"""
+
+import csv
+import hashlib
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Q, Count, Sum, F, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+from invoices.models import Invoice
+from billing.models import Quote
+from request.models import ProspectRequest
+from users.models import User
+from installations.commissions import commission_totals
+from installations.models import CommissionLedger
+
+from .excel import EXCEL_AVAILABLE, ReportWriter
+from .models import ReportJob
+from .rollups import sales_rollup_rows
+
+
+# Nombre de factures lues par paquet lors des exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Limite dure de la tâche generate_report_job (secondes) : un job encore "en cours"
+# au-delà a forcément perdu son worker
+REPORT_JOB_TIME_LIMIT = 1800
+
+# Statuts de facture en français
+INVOICE_STATUS_LABELS = dict(Invoice.Status.choices)
+
+# Types de commission en français
+COMMISSION_TYPE_LABELS = dict(CommissionLedger.Type.choices)
+
+
+class _EchoBuffer:
+    """Pseudo-buffer pour csv.writer : renvoie la ligne écrite au lieu de la stocker."""
+
+    def write(self, value):
+        return value
+
+
+class CsvReport:
+    """
+    Rapport CSV produit à la demande.
+
+    `chunks` est un itérable de chaînes : il n'est consommé qu'une seule fois,
+    soit par `response()`, soit par `save()`.
+    """
+
+    content_type = 'text/csv; charset=utf-8-sig'
+
+    def __init__(self, filename, chunks, content_type=None):
+        self.filename = filename
+        self.chunks = chunks
+        if content_type:
+            self.content_type = content_type
+
+    def _encoded(self):
+        return (chunk.encode('utf-8') for chunk in self.chunks)
+
+    def save(self, fileobj):
+        """Écrit le CSV dans un fichier binaire ouvert."""
+        for chunk in self._encoded():
+            fileobj.write(chunk)
+
+    def response(self):
+        """Réponse HTTP en streaming (mémoire constante)."""
+        response = StreamingHttpResponse(self._encoded(), content_type=self.content_type)
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}"'
+        return response
+
+
+def validate_date_string(date_str):
+    """
+    Valide et nettoie une chaîne de date.
+    Empêche les dates invalides comme '12121-01-01'.
+    """
+    if not date_str:
+        return None
+
+    try:
+        # Parser la date
+        parsed_date = datetime.strptime(date_str, '%Y-%m-%d')
+
+        # Vérifier que l'année est raisonnable (entre 1900 et 2100)
+        if parsed_date.year < 1900 or parsed_date.year > 2100:
+            return None
+
+        # Vérifier que la date n'est pas dans le futur
+        if parsed_date > datetime.now():
+            return None
+
+        return parsed_date
+    except (ValueError, OverflowError):
+        return None
+
+
+def get_date_range(params):
+    """Extrait la période depuis les paramètres (start_date / end_date)."""
+    start_str = params.get('start_date')
+    end_str = params.get('end_date')
+
+    if start_str and end_str:
+        start_date_parsed = validate_date_string(start_str)
+        end_date_parsed = validate_date_string(end_str)
+
+        # Si les dates sont valides, les utiliser
+        if start_date_parsed and end_date_parsed:
+            start_date = timezone.make_aware(start_date_parsed)
+            end_date = timezone.make_aware(end_date_parsed.replace(hour=23, minute=59, second=59))
+        else:
+            # Dates invalides, utiliser la période par défaut
+            end_date = timezone.now()
+            start_date = end_date.replace(year=end_date.year - 1)
+    else:
+        # Par défaut : 1 an
+        end_date = timezone.now()
+        start_date = end_date.replace(year=end_date.year - 1)
+
+    return start_date, end_date
+
+
+def _period_suffix(start_date, end_date):
+    return f"{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+
+
+# ---------------------------------------------------------------------------
+# Export comptable
+# ---------------------------------------------------------------------------
+
+def build_accounting_export(params):
+    """
+    Export comptable des factures (CSV par défaut, Excel si export_format=excel,
+    FEC si export_format=fec, incrémental si un `consumer` est fourni).
+
+    Colonnes exportées :
+    - Numéro facture
+    - Date émission
+    - Date échéance
+    - Client (nom complet)
+    - Montant HT
+    - Taux TVA (%)
+    - Montant TVA (€)
+    - Montant TTC
+    - Statut
+    - Notes
+    """
+    start_date, end_date = get_date_range(params)
+    status_filter = params.get('status', 'all')
+    export_format = params.get('export_format', 'csv')
+
+    # Fichier des écritures comptables (complet sur la période ou incrémental)
+    if export_format == 'fec':
+        from . import fec
+
+        consumer = params.get('consumer')
+        if consumer:
+            return fec.build_incremental_fec_export(consumer, reset=params.get('reset') == 'true')
+        return fec.build_fec_export(start_date, end_date)
+
+    # Récupérer les factures
+    invoices = Invoice.objects.filter(
+        created_at__range=[start_date, end_date]
+    )
+
+    # Filtrer par statut si demandé
+    if status_filter in ('paid', 'issued', 'partially_paid'):
+        invoices = invoices.filter(status=status_filter)
+
+    invoices = invoices.order_by('issue_date')
+
+    # Générer l'export selon le format
+    if export_format == 'excel' and EXCEL_AVAILABLE:
+        return _accounting_excel(iter_accounting_rows(invoices), start_date, end_date)
+    return _accounting_csv(invoices, start_date, end_date)
+
+
+def iter_accounting_rows(invoices):
+    """
+    Itère sur les lignes de l'export comptable sans charger les factures en mémoire.
+
+    Lecture par paquets via values().iterator() : seules les colonnes exportées
+    sont récupérées, sans instancier de modèles.
+    """
+    rows = invoices.values(
+        'id', 'number', 'issue_date', 'due_date', 'subtotal', 'tax_rate', 'total', 'status', 'notes',
+        'installation__client_id',
+        client_last_name=F('installation__client__last_name'),
+        client_first_name=F('installation__client__first_name'),
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    for inv in rows:
+        client_name = (
+            f"{inv['client_last_name']} {inv['client_first_name']}"
+            if inv['installation__client_id'] else "Client inconnu"
+        )
+
+        # Calculer TVA
+        subtotal = float(inv['subtotal'])
+        tax_rate = float(inv['tax_rate'])
+        tax_amount = subtotal * (tax_rate / 100)
+        total = float(inv['total'])
+
+        yield {
+            'number': inv['number'] or f"INV-{inv['id']}",
+            'issue_date': inv['issue_date'].strftime('%d/%m/%Y') if inv['issue_date'] else '',
+            'due_date': inv['due_date'].strftime('%d/%m/%Y') if inv['due_date'] else '',
+            'client': client_name,
+            'subtotal': subtotal,
+            'tax_rate': tax_rate,
+            'tax_amount': tax_amount,
+            'total': total,
+            'status': INVOICE_STATUS_LABELS.get(inv['status'], inv['status']),
+            'notes': inv['notes'] or ''
+        }
+
+
+def _accounting_csv(invoices, start_date, end_date):
+    """
+    Export CSV écrit au fil de l'itération sur les factures.
+
+    Les totaux sont cumulés à la volée : la mémoire reste constante et le
+    premier octet part immédiatement.
+    """
+    writer = csv.writer(_EchoBuffer(), delimiter=';')
+
+    def _format_amount(value):
+        return f"{value:.2f}".replace('.', ',')
+
+    def _stream():
+        # BOM UTF-8 pour l'ouverture correcte dans Excel
+        yield '\ufeff'
+
+        # En-têtes
+        yield writer.writerow([
+            'Numéro Facture',
+            'Date Émission',
+            'Date Échéance',
+            'Client',
+            'Montant HT (€)',
+            'TVA (%)',
+            'TVA (€)',
+            'Montant TTC (€)',
+            'Statut',
+            'Notes'
+        ])
+
+        # Données
+        total_ht = total_tva = total_ttc = 0
+        has_rows = False
+        for row in iter_accounting_rows(invoices):
+            has_rows = True
+            total_ht += row['subtotal']
+            total_tva += row['tax_amount']
+            total_ttc += row['total']
+            yield writer.writerow([
+                row['number'],
+                row['issue_date'],
+                row['due_date'],
+                row['client'],
+                _format_amount(row['subtotal']),
+                _format_amount(row['tax_rate']),
+                _format_amount(row['tax_amount']),
+                _format_amount(row['total']),
+                row['status'],
+                row['notes']
+            ])
+
+        # Ligne de total
+        if has_rows:
+            yield writer.writerow([])
+            yield writer.writerow([
+                'TOTAL',
+                '',
+                '',
+                '',
+                _format_amount(total_ht),
+                '',
+                _format_amount(total_tva),
+                _format_amount(total_ttc),
+                '',
+                ''
+            ])
+
+    return CsvReport(f"export_comptable_{_period_suffix(start_date, end_date)}.csv", _stream())
+
+
+def _accounting_excel(rows, start_date, end_date):
+    """Export Excel avec mise en forme (écriture en flux, mémoire bornée)."""
+    writer = ReportWriter(
+        "Export Comptable",
+        column_widths=[18, 15, 15, 25, 15, 10, 12, 16, 18, 30],
+        filename=f"export_comptable_{_period_suffix(start_date, end_date)}.xlsx",
+    )
+
+    # En-têtes
+    writer.header([
+        'Numéro Facture',
+        'Date Émission',
+        'Date Échéance',
+        'Client',
+        'Montant HT (€)',
+        'TVA (%)',
+        'TVA (€)',
+        'Montant TTC (€)',
+        'Statut',
+        'Notes'
+    ], style='report_header_bordered')
+
+    # Données (totaux cumulés à la volée)
+    text, amount = 'report_cell_bordered', 'report_amount_bordered'
+    total_ht = total_tva = total_ttc = 0
+    has_rows = False
+    for row_data in rows:
+        has_rows = True
+        total_ht += row_data['subtotal']
+        total_tva += row_data['tax_amount']
+        total_ttc += row_data['total']
+        writer.row([
+            (row_data['number'], text),
+            (row_data['issue_date'], text),
+            (row_data['due_date'], text),
+            (row_data['client'], text),
+            (row_data['subtotal'], amount),
+            (row_data['tax_rate'], amount),
+            (row_data['tax_amount'], amount),
+            (row_data['total'], amount),
+            (row_data['status'], text),
+            (row_data['notes'], text),
+        ])
+
+    # Ligne de total
+    if has_rows:
+        writer.blank()
+        writer.row([
+            ('TOTAL', 'report_total'), None, None, None,
+            (total_ht, 'report_total_amount'), None,
+            (total_tva, 'report_total_amount'),
+            (total_ttc, 'report_total_amount'),
+        ])
+
+    return writer
+
+
+# ---------------------------------------------------------------------------
+# Rapport des ventes
+# ---------------------------------------------------------------------------
+
+def build_sales_report(params):
+    """
+    Rapport des ventes (XLSX) avec :
+    - CA total
+    - Nombre de devis signés
+    - Ticket moyen
+    - CA et encaissements par commercial
+    - Évolution mensuelle du CA
+
+    Lu depuis les agrégats mensuels (`admin_platform.rollups`) : seuls les mois
+    partiels en bord de période sont recalculés depuis les devis et paiements.
+    """
+    start_date, end_date = get_date_range(params)
+    salesperson_id = params.get('salesperson_id')
+
+    rollup = sales_rollup_rows(
+        timezone.localdate(start_date), timezone.localdate(end_date), salesperson_id or None
+    )
+
+    # Regroupements par commercial et par mois
+    by_salesperson = {}
+    by_month = {}
+    for (month, person_id), values in rollup.items():
+        for grouped, key in ((by_salesperson, person_id), (by_month, month)):
+            totals = grouped.setdefault(key, {'revenue': 0.0, 'quote_count': 0, 'paid': 0.0})
+            totals['revenue'] += float(values['signed_revenue'])
+            totals['quote_count'] += values['signed_quotes_count']
+            totals['paid'] += float(values['paid_revenue'])
+
+    total_revenue = sum(totals['revenue'] for totals in by_month.values())
+    total_quotes = sum(totals['quote_count'] for totals in by_month.values())
+    total_paid = sum(totals['paid'] for totals in by_month.values())
+    average_ticket = total_revenue / total_quotes if total_quotes > 0 else 0
+
+    names = {
+        user['id']: f"{user['last_name']} {user['first_name']}"
+        for user in User.objects.filter(id__in=[key for key in by_salesperson if key]).values('id', 'last_name', 'first_name')
+    }
+
+    writer = ReportWriter(
+        "Rapport des Ventes",
+        column_widths=[25, 18, 15, 18, 18],
+        filename=f"rapport_ventes_{_period_suffix(start_date, end_date)}.xlsx",
+    )
+
+    # Titre
+    writer.title('RAPPORT DES VENTES')
+    writer.row([f"Période : {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"])
+
+    # KPIs
+    writer.blank()
+    writer.row(['Chiffre d\'affaires total', (total_revenue, 'report_kpi_euro')])
+    writer.row(['Nombre de devis signés', (total_quotes, 'report_kpi')])
+    writer.row(['Ticket moyen', (float(average_ticket), 'report_kpi_euro')])
+    writer.row(['Total encaissé', (total_paid, 'report_kpi_euro')])
+
+    # CA par commercial
+    writer.blank(2)
+    writer.section('CHIFFRE D\'AFFAIRES PAR COMMERCIAL')
+    writer.header(['Commercial', 'CA (€)', 'Nb Devis', 'Ticket Moyen (€)', 'Encaissé (€)'])
+
+    for person_id, totals in sorted(by_salesperson.items(), key=lambda item: -item[1]['revenue']):
+        name = names.get(person_id) or "Sans commercial"
+        count = totals['quote_count']
+        avg = totals['revenue'] / count if count > 0 else 0
+        writer.row([name, (totals['revenue'], 'report_euro'), count, (avg, 'report_euro'), (totals['paid'], 'report_euro')])
+
+    # Évolution mensuelle
+    writer.blank(2)
+    writer.section('ÉVOLUTION MENSUELLE')
+    writer.header(['Mois', 'CA (€)', 'Nb Devis', 'Ticket Moyen (€)', 'Encaissé (€)'])
+
+    months_fr = ['Jan', 'Fév', 'Mar', 'Avr', 'Mai', 'Juin',
+                 'Juil', 'Août', 'Sep', 'Oct', 'Nov', 'Déc']
+
+    for month, totals in sorted(by_month.items()):
+        month_label = f"{months_fr[month.month-1]} {month.year}"
+        count = totals['quote_count']
+        avg = totals['revenue'] / count if count > 0 else 0
+        writer.row([month_label, (totals['revenue'], 'report_euro'), count, (avg, 'report_euro'), (totals['paid'], 'report_euro')])
+
+    return writer
+
+
+# ---------------------------------------------------------------------------
+# Rapport des commissions
+# ---------------------------------------------------------------------------
+
+def build_commissions_report(params):
+    """
+    Rapport des commissions (XLSX) avec :
+    - Liste des commissions dues/payées par personne
+    - Totaux par type (apporteur d'affaires / commercial)
+    - Détails par installation
+
+    Lu depuis le registre des commissions : totaux et tri calculés en base.
+    """
+    start_date, end_date = get_date_range(params)
+    paid_status = params.get('paid_status', 'all')
+
+    # Registre des commissions des installations de la période
+    entries = CommissionLedger.objects.filter(
+        installation_created_at__range=[start_date, end_date]
+    )
+
+    # Filtrer par statut de paiement
+    if paid_status == 'paid':
+        entries = entries.filter(paid=True)
+    elif paid_status == 'unpaid':
+        entries = entries.filter(paid=False)
+
+    # Totaux calculés en base
+    totals = commission_totals(entries)
+
+    # Détail trié par bénéficiaire puis par type, lu par paquets
+    commissions_data = entries.order_by(
+        'beneficiary__last_name', 'beneficiary__first_name', 'type', 'installation_created_at'
+    ).values(
+        'type', 'amount', 'paid', 'installation_created_at',
+        'beneficiary_id', 'beneficiary__first_name', 'beneficiary__last_name',
+        'client_id', 'client__first_name', 'client__last_name',
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    writer = ReportWriter(
+        "Rapport des Commissions",
+        column_widths=[22, 25, 25, 15, 12, 18],
+        filename=f"rapport_commissions_{_period_suffix(start_date, end_date)}.xlsx",
+    )
+
+    # Titre
+    writer.title('RAPPORT DES COMMISSIONS')
+    writer.row([f"Période : {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"])
+
+    # Statistiques globales
+    writer.blank()
+    writer.row(['Total commissions', (totals['total'], 'report_total_euro')])
+    writer.row(['Payées', (totals['paid'], 'report_paid_euro')])
+    writer.row(['À payer', (totals['unpaid'], 'report_unpaid_euro')])
+
+    # Liste détaillée
+    writer.blank(2)
+    writer.section('DÉTAIL DES COMMISSIONS')
+    writer.header(['Type', 'Bénéficiaire', 'Client', 'Montant (€)', 'Statut', 'Date Installation'])
+
+    unknown_beneficiary = {
+        CommissionLedger.Type.SOURCE: "Source inconnue",
+        CommissionLedger.Type.SALES: "Commercial inconnu",
+    }
+
+    for commission in commissions_data:
+        beneficiary = (
+            f"{commission['beneficiary__first_name']} {commission['beneficiary__last_name']}".strip()
+            if commission['beneficiary_id'] else unknown_beneficiary[commission['type']]
+        )
+        client = (
+            f"{commission['client__first_name']} {commission['client__last_name']}".strip()
+            if commission['client_id'] else "Client inconnu"
+        )
+        # Colorier selon le statut
+        paid_cell = ('Payée', 'report_paid') if commission['paid'] else ('À payer', 'report_unpaid')
+        writer.row([
+            COMMISSION_TYPE_LABELS[commission['type']],
+            beneficiary,
+            client,
+            (float(commission['amount']), 'report_euro'),
+            paid_cell,
+            timezone.localtime(commission['installation_created_at']).strftime('%d/%m/%Y'),
+        ])
+
+    return writer
+
+
+# ---------------------------------------------------------------------------
+# Rapport des prospects
+# ---------------------------------------------------------------------------
+
+def build_prospects_report(params):
+    """
+    Rapport des prospects (XLSX) avec :
+    - Nombre de demandes par source
+    - Taux de conversion par source
+    - Temps moyen de traitement
+    - Pipeline par statut
+    """
+    start_date, end_date = get_date_range(params)
+
+    # Récupérer les demandes de la période
+    prospects = ProspectRequest.objects.filter(
+        created_at__range=[start_date, end_date]
+    ).select_related('source', 'assigned_to')
+
+    total_prospects = prospects.count()
+
+    # Stats par source
+    by_source = prospects.values('source_type').annotate(
+        count=Count('id')
+    ).order_by('-count')
+
+    # Stats par statut
+    by_status = prospects.values('status').annotate(
+        count=Count('id')
+    ).order_by('-count')
+
+    # Taux de conversion (prospects -> devis signés)
+    # Quote -> Offer -> ProspectRequest (relation 'request')
+    signed_quotes = Quote.objects.filter(
+        offer__request__in=prospects,
+        status='signed'
+    ).count()
+
+    conversion_rate = (signed_quotes / total_prospects * 100) if total_prospects > 0 else 0
+
+    writer = ReportWriter(
+        "Rapport des Prospects",
+        column_widths=[30, 15, 15],
+        filename=f"rapport_prospects_{_period_suffix(start_date, end_date)}.xlsx",
+    )
+
+    # Titre
+    writer.title('RAPPORT DES PROSPECTS')
+    writer.row([f"Période : {start_date.strftime('%d/%m/%Y')} - {end_date.strftime('%d/%m/%Y')}"])
+
+    # KPIs
+    writer.blank()
+    writer.row(['Nombre total de prospects', (total_prospects, 'report_kpi')])
+    writer.row(['Taux de conversion', (f"{conversion_rate:.1f}%", 'report_kpi')])
+
+    # Répartition par source
+    writer.blank(2)
+    writer.section('RÉPARTITION PAR SOURCE')
+    writer.header(['Source', 'Nombre', 'Pourcentage'])
+
+    source_labels = {
+        'website': 'Site Web',
+        'referral': 'Recommandation',
+        'social': 'Réseaux Sociaux',
+        'direct': 'Contact Direct',
+        'other': 'Autre'
+    }
+
+    for source in by_source:
+        source_type = source['source_type'] or 'other'
+        count = source['count']
+        percentage = (count / total_prospects * 100) if total_prospects > 0 else 0
+        writer.row([source_labels.get(source_type, source_type), count, f"{percentage:.1f}%"])
+
+    # Répartition par statut
+    writer.blank(2)
+    writer.section('PIPELINE PAR STATUT')
+    writer.header(['Statut', 'Nombre', 'Pourcentage'])
+
+    status_labels = {
+        'new': 'Nouveau',
+        'contacted': 'Contacté',
+        'qualified': 'Qualifié',
+        'quote_sent': 'Devis envoyé',
+        'won': 'Gagné',
+        'lost': 'Perdu'
+    }
+
+    for status_data in by_status:
+        status_type = status_data['status']
+        count = status_data['count']
+        percentage = (count / total_prospects * 100) if total_prospects > 0 else 0
+        writer.row([status_labels.get(status_type, status_type), count, f"{percentage:.1f}%"])
+
+    return writer
+
+
+# ---------------------------------------------------------------------------
+# Registre des rapports
+# ---------------------------------------------------------------------------
+
+# Type de rapport -> (constructeur, paramètres acceptés)
+REPORT_BUILDERS = {
+    'accounting': (build_accounting_export, ('start_date', 'end_date', 'status', 'export_format')),
+    'sales': (build_sales_report, ('start_date', 'end_date', 'salesperson_id')),
+    'commissions': (build_commissions_report, ('start_date', 'end_date', 'paid_status')),
+    'prospects': (build_prospects_report, ('start_date', 'end_date')),
+}
+
+
+def clean_report_params(report_type, params):
+    """Ne conserve que les paramètres acceptés par le rapport (valeurs non vides, en chaîne)."""
+    _, accepted = REPORT_BUILDERS[report_type]
+    return {
+        key: str(params.get(key))
+        for key in accepted
+        if params.get(key) not in (None, '')
+    }
+
+
+def build_report(report_type, params):
+    """Construit le rapport `report_type` ('accounting', 'sales', 'commissions', 'prospects')."""
+    builder, _ = REPORT_BUILDERS[report_type]
+    return builder(params)
+
+
+# ---------------------------------------------------------------------------
+# Jobs asynchrones
+# ---------------------------------------------------------------------------
+
+def report_params_hash(report_type, params):
+    """Empreinte stable du type de rapport et de ses paramètres nettoyés."""
+    payload = json.dumps({'report_type': report_type, 'params': params}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def fail_stale_report_jobs():
+    """
+    Passe en échec les jobs abandonnés, pour ne plus les réutiliser.
+
+    - en cours depuis plus de REPORT_JOB_TIME_LIMIT secondes (worker arrêté ou
+      tâche tuée par la limite dure) ;
+    - en attente depuis plus de REPORT_JOB_PENDING_TIMEOUT secondes (message
+      perdu, file indisponible à la mise en file).
+
+    Retourne le nombre de jobs passés en échec.
+    """
+    now = timezone.now()
+    pending_timeout = getattr(settings, 'REPORT_JOB_PENDING_TIMEOUT', 900)
+    return ReportJob.objects.filter(
+        Q(status=ReportJob.Status.RUNNING, started_at__lt=now - timedelta(seconds=REPORT_JOB_TIME_LIMIT)) |
+        Q(status=ReportJob.Status.PENDING, created_at__lt=now - timedelta(seconds=pending_timeout))
+    ).update(
+        status=ReportJob.Status.FAILED,
+        error="Job abandonné (worker arrêté ou tâche jamais exécutée)",
+        completed_at=now,
+    )
+
+
+def get_or_create_report_job(report_type, params, user=None):
+    """
+    Retourne un job réutilisable pour ces paramètres, ou en crée un nouveau.
+
+    Un job en attente, en cours ou terminé (fichier présent) créé depuis moins de
+    REPORT_JOB_TTL secondes est réutilisé, une fois les jobs abandonnés passés en
+    échec (voir `fail_stale_report_jobs`). Retourne (job, created) ; l'appelant
+    est responsable de la mise en file de la tâche si `created` est vrai.
+    """
+    fail_stale_report_jobs()
+    params = clean_report_params(report_type, params)
+    params_hash = report_params_hash(report_type, params)
+    since = timezone.now() - timedelta(seconds=getattr(settings, 'REPORT_JOB_TTL', 3600))
+
+    reusable = ReportJob.objects.filter(
+        params_hash=params_hash,
+        created_at__gte=since,
+    ).filter(
+        Q(status__in=[ReportJob.Status.PENDING, ReportJob.Status.RUNNING]) |
+        Q(status=ReportJob.Status.COMPLETED, file__gt='')
+    ).order_by('-created_at').first()
+    if reusable:
+        return reusable, False
+
+    job = ReportJob.objects.create(
+        report_type=report_type,
+        params=params,
+        params_hash=params_hash,
+        created_by=user,
+    )
+    return job, True
+
+
+def run_report_job(job):
+    """
+    Construit le rapport d'un job et enregistre le fichier dans le stockage média.
+
+    Le rapport est d'abord écrit dans un fichier temporaire (mémoire bornée),
+    puis copié vers le stockage. En cas d'erreur, le job passe en échec avec le message.
+    """
+    job.status = ReportJob.Status.RUNNING
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+
+    try:
+        report = build_report(job.report_type, job.params)
+        with tempfile.TemporaryFile() as output:
+            report.save(output)
+            output.seek(0)
+            job.file.save(f"{job.id.hex[:8]}_{report.filename}", File(output), save=False)
+    except Exception as e:
+        job.status = ReportJob.Status.FAILED
+        job.error = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'completed_at'])
+        raise
+
+    job.status = ReportJob.Status.COMPLETED
+    job.completed_at = timezone.now()
+    job.save(update_fields=['status', 'file', 'completed_at'])
+    return job
+
+
+def purge_report_jobs(retention_days=None):
+    """Supprime les jobs (et leurs fichiers) plus anciens que REPORT_JOB_RETENTION_DAYS."""
+    retention_days = retention_days or getattr(settings, 'REPORT_JOB_RETENTION_DAYS', 7)
+    expired = ReportJob.objects.filter(created_at__lt=timezone.now() - timedelta(days=retention_days))
+
+    deleted = 0
+    for job in expired.iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
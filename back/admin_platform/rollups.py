@@ -0,0 +1,183 @@
+"""
+Agrégats mensuels des ventes par commercial (MonthlySalesRollup).
+
+Le rapport des ventes ne relit plus tous les devis de la période :
+- les mois entièrement couverts par la période sont lus depuis `MonthlySalesRollup` ;
+- les mois partiels (bornes de la période) sont calculés à la volée.
+
+Un mois est toujours recalculé en entier (requêtes groupées par commercial),
+ce qui absorbe les changements de statut, suppressions et corrections de
+montant sans avoir à suivre les anciennes valeurs. Les signaux recalculent le
+mois concerné après chaque signature de devis ou paiement ; la tâche nocturne
+et la commande `rebuild_sales_rollup` rattrapent le reste (réattribution d'une
+demande à un autre commercial, mises à jour en masse). Les mois antérieurs au
+déploiement sont remplis par la migration 0008_backfill_monthly_sales_rollup.
+"""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Min, Sum
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from billing.models import Quote
+from invoices.models import Payment
+
+from .models import MonthlySalesRollup
+
+
+ROLLUP_FIELDS = ('signed_quotes_count', 'signed_revenue', 'payments_count', 'paid_revenue')
+
+
+def month_start(value: date) -> date:
+    """Premier jour du mois de `value`."""
+    return value.replace(day=1)
+
+
+def month_end(month: date) -> date:
+    """Dernier jour du mois commençant le `month`."""
+    return (month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def _empty_rollup():
+    return {
+        'signed_quotes_count': 0,
+        'signed_revenue': Decimal('0'),
+        'payments_count': 0,
+        'paid_revenue': Decimal('0'),
+    }
+
+
+def compute_sales_rollup(start_day: date, end_day: date, salesperson_id=None) -> dict:
+    """
+    Calcule les ventes de [start_day, end_day] groupées par (mois, commercial).
+
+    - Devis signés : devis acceptés, par mois de création (fuseau local) ;
+      commercial = commercial assigné à la demande.
+    - Encaissements : paiements par mois de paiement ; commercial de la demande
+      liée via le devis de la facture, ou à défaut via sa fiche d'installation.
+
+    Deux requêtes, quelle que soit la longueur de la période.
+    Retourne {(mois, salesperson_id): {champ: valeur}} pour les seules combinaisons ayant des données.
+    """
+    quotes = (
+        Quote.objects
+        .filter(status=Quote.Status.ACCEPTED, created_at__date__range=(start_day, end_day))
+        .annotate(
+            month=TruncMonth('created_at', output_field=DateField()),
+            salesperson=F('offer__request__assigned_to'),
+        )
+    )
+    payments = (
+        Payment.objects
+        .filter(date__range=(start_day, end_day))
+        .annotate(
+            month=TruncMonth('date'),
+            salesperson=Coalesce(
+                'invoice__quote__offer__request__assigned_to',
+                'invoice__installation__offer__request__assigned_to',
+            ),
+        )
+    )
+    if salesperson_id:
+        quotes = quotes.filter(salesperson=salesperson_id)
+        payments = payments.filter(salesperson=salesperson_id)
+
+    result = {}
+    quote_rows = quotes.values('month', 'salesperson').annotate(
+        signed_quotes_count=Count('id'),
+        signed_revenue=Coalesce(Sum('total'), Decimal('0')),
+    ).order_by()
+    payment_rows = payments.values('month', 'salesperson').annotate(
+        payments_count=Count('id'),
+        paid_revenue=Coalesce(Sum('amount'), Decimal('0')),
+    ).order_by()
+
+    for rows in (quote_rows, payment_rows):
+        for row in rows:
+            key = (row.pop('month'), row.pop('salesperson'))
+            result.setdefault(key, _empty_rollup()).update(row)
+    return result
+
+
+def refresh_sales_rollup(months) -> int:
+    """
+    Recalcule et enregistre les agrégats des mois donnés (premiers jours de mois).
+
+    Les lignes d'un mois sont remplacées en bloc : un commercial sans plus
+    aucune vente ce mois-là disparaît de la table.
+    Retourne le nombre de lignes écrites.
+    """
+    written = 0
+    for month in sorted({month_start(value) for value in months}):
+        rows = [
+            MonthlySalesRollup(month=month, salesperson_id=salesperson_id, **values)
+            for (_, salesperson_id), values in compute_sales_rollup(month, month_end(month)).items()
+        ]
+        try:
+            with transaction.atomic():
+                MonthlySalesRollup.objects.filter(month=month).delete()
+                MonthlySalesRollup.objects.bulk_create(rows)
+        except IntegrityError:
+            # Recalcul concurrent du même mois : les deux partent des mêmes données
+            continue
+        written += len(rows)
+    return written
+
+
+def _months(first_month: date, last_month: date):
+    """Premiers jours des mois de [first_month, last_month]."""
+    month = first_month
+    while month <= last_month:
+        yield month
+        month = month_end(month) + timedelta(days=1)
+
+
+def rebuild_sales_rollup(start_day: date = None) -> int:
+    """
+    Reconstruit la table depuis `start_day` jusqu'au mois courant.
+
+    Sans `start_day`, repart du premier devis ou paiement et supprime les
+    lignes antérieures. Retourne le nombre de lignes écrites.
+    """
+    if start_day is None:
+        first_quote = Quote.objects.aggregate(first=Min('created_at'))['first']
+        first_payment = Payment.objects.aggregate(first=Min('date'))['first']
+        firsts = [timezone.localdate(first_quote) if first_quote else None, first_payment]
+        firsts = [value for value in firsts if value is not None]
+        if not firsts:
+            MonthlySalesRollup.objects.all().delete()
+            return 0
+        start_day = min(firsts)
+        MonthlySalesRollup.objects.filter(month__lt=month_start(start_day)).delete()
+
+    return refresh_sales_rollup(_months(month_start(start_day), month_start(timezone.localdate())))
+
+
+def sales_rollup_rows(start_day: date, end_day: date, salesperson_id=None) -> dict:
+    """
+    Ventes de [start_day, end_day] groupées par (mois, commercial).
+
+    Les mois entièrement couverts sont lus depuis `MonthlySalesRollup`, les
+    mois partiels en bord de période sont calculés en direct.
+    Même format de retour que `compute_sales_rollup`.
+    """
+    first_full = start_day if start_day.day == 1 else month_end(start_day) + timedelta(days=1)
+    last_full_end = end_day if end_day == month_end(end_day) else month_start(end_day) - timedelta(days=1)
+    if first_full > last_full_end:
+        return compute_sales_rollup(start_day, end_day, salesperson_id)
+
+    result = {}
+    if start_day < first_full:
+        result.update(compute_sales_rollup(start_day, first_full - timedelta(days=1), salesperson_id))
+    if last_full_end < end_day:
+        result.update(compute_sales_rollup(last_full_end + timedelta(days=1), end_day, salesperson_id))
+
+    stored = MonthlySalesRollup.objects.filter(month__range=(first_full, month_start(last_full_end)))
+    if salesperson_id:
+        stored = stored.filter(salesperson_id=salesperson_id)
+    for row in stored.values('month', 'salesperson_id', *ROLLUP_FIELDS):
+        result[(row.pop('month'), row.pop('salesperson_id'))] = row
+    return result
@@ -3,8 +3,9 @@ Serializers pour la plateforme d'administration.
 """
 
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 from auditlog.models import LogEntry
-from .models import EmailLog
+from .models import EmailLog, ReportJob
 
 
 class EmailLogSerializer(serializers.ModelSerializer):
@@ -81,3 +82,50 @@ class AuditLogSerializer(serializers.ModelSerializer):
     def get_actor_email(self, obj):
         """Retourne l'email de l'acteur."""
         return obj.actor.email if obj.actor else None
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour les jobs de rapports asynchrones.
+    
+    `download_url` n'est renseigné qu'une fois le fichier généré.
+    """
+    
+    report_type_display = serializers.CharField(source='get_report_type_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id',
+            'report_type',
+            'report_type_display',
+            'params',
+            'status',
+            'status_display',
+            'error',
+            'download_url',
+            'created_at',
+            'started_at',
+            'completed_at',
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        """URL de téléchargement du fichier (None tant que le job n'est pas terminé)."""
+        if obj.status != ReportJob.Status.COMPLETED or not obj.file:
+            return None
+        return reverse('report-job-download', args=[obj.id], request=self.context.get('request'))
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    """
+    Demande de génération d'un rapport.
+    
+    `params` reprend les paramètres de l'endpoint synchrone correspondant
+    (start_date, end_date, status, export_format, salesperson_id, paid_status).
+    """
+    
+    report_type = serializers.ChoiceField(choices=ReportJob.ReportType.choices)
+    params = serializers.DictField(required=False, default=dict)
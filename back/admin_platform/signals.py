@@ -0,0 +1,104 @@
+"""
+Signaux de la plateforme d'administration.
+
+- Invalide les snapshots DailyKPI lorsqu'un objet suivi par le dashboard est
+  modifié ou supprimé (ex : facture payée plusieurs jours après sa création).
+- Invalide le cache des actions du dashboard et des rapports (immédiatement
+  et au commit).
+- Recalcule l'agrégat mensuel des ventes (MonthlySalesRollup) du mois d'un
+  devis signé ou d'un paiement, après commit de la transaction.
+- Indexe chaque entrée d'audit par utilisateur concerné (AuditSubject), dans
+  la transaction de l'entrée.
+- Enregistre la suppression des factures et paiements (AccountingTombstone)
+  pour contrepasser leurs écritures au prochain export comptable incrémental.
+"""
+
+from auditlog.models import LogEntry
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+
+from request.models import ProspectRequest
+from offers.models import Offer
+from billing.models import Quote
+from installations.models import Form
+from invoices.models import Invoice, Payment
+
+from .audit_subjects import index_audit_entries
+from .kpi import invalidate_daily_kpi
+from .models import AccountingExportEntry, AccountingTombstone
+from .report_cache import invalidate_reports_cache
+from .rollups import refresh_sales_rollup
+
+
+KPI_TRACKED_MODELS = (ProspectRequest, Offer, Quote, Form, Invoice)
+# Modèles lus par les actions en cache (overview et cohortes lisent aussi les offres)
+REPORTS_CACHE_TRACKED_MODELS = (Invoice, Quote, Form, ProspectRequest, Offer, Payment)
+
+
+def _invalidate_kpi_snapshot(sender, instance, **kwargs):
+    """Supprime le snapshot du jour de création de l'objet."""
+    invalidate_daily_kpi(getattr(instance, 'created_at', None))
+
+
+def _invalidate_reports_cache(sender, instance, **kwargs):
+    """Invalide le cache dashboard/rapports, puis à nouveau au commit."""
+    invalidate_reports_cache()
+    # Une requête concurrente a pu recalculer depuis l'état d'avant le commit
+    transaction.on_commit(invalidate_reports_cache)
+
+
+def _schedule_sales_rollup_refresh(day):
+    transaction.on_commit(lambda: refresh_sales_rollup([day]))
+
+
+def _refresh_quote_sales_rollup(sender, instance, created=False, **kwargs):
+    """
+    Recalcule le mois de création d'un devis accepté.
+
+    Toute modification d'un devis existant déclenche le recalcul : un devis qui
+    quitte le statut accepté doit sortir de l'agrégat.
+    """
+    if kwargs.get('raw') or instance.created_at is None:
+        return
+    if created and instance.status != Quote.Status.ACCEPTED:
+        return
+    if kwargs.get('signal') is post_delete and instance.status != Quote.Status.ACCEPTED:
+        return
+    _schedule_sales_rollup_refresh(timezone.localdate(instance.created_at))
+
+
+def _refresh_payment_sales_rollup(sender, instance, **kwargs):
+    """Recalcule le mois d'un paiement enregistré, modifié ou supprimé."""
+    if kwargs.get('raw') or instance.date is None:
+        return
+    _schedule_sales_rollup_refresh(instance.date)
+
+
+def _record_accounting_deletion(sender, instance, **kwargs):
+    """Trace la suppression d'une facture ou d'un paiement (export FEC incrémental)."""
+    source = AccountingExportEntry.Source.INVOICE if sender is Invoice else AccountingExportEntry.Source.PAYMENT
+    AccountingTombstone.objects.create(source=source, object_id=instance.pk)
+
+
+def _index_audit_entry(sender, instance, created=False, **kwargs):
+    """Rattache une nouvelle entrée d'audit à son acteur et au propriétaire de l'objet."""
+    if created and not kwargs.get('raw'):
+        index_audit_entries([instance])
+
+
+for _model in KPI_TRACKED_MODELS:
+    post_save.connect(_invalidate_kpi_snapshot, sender=_model, dispatch_uid=f'kpi_snapshot_save_{_model._meta.label_lower}')
+    post_delete.connect(_invalidate_kpi_snapshot, sender=_model, dispatch_uid=f'kpi_snapshot_delete_{_model._meta.label_lower}')
+
+for _model in REPORTS_CACHE_TRACKED_MODELS:
+    post_save.connect(_invalidate_reports_cache, sender=_model, dispatch_uid=f'reports_cache_save_{_model._meta.label_lower}')
+    post_delete.connect(_invalidate_reports_cache, sender=_model, dispatch_uid=f'reports_cache_delete_{_model._meta.label_lower}')
+
+post_save.connect(_refresh_quote_sales_rollup, sender=Quote, dispatch_uid='sales_rollup_quote_save')
+post_delete.connect(_refresh_quote_sales_rollup, sender=Quote, dispatch_uid='sales_rollup_quote_delete')
+post_save.connect(_refresh_payment_sales_rollup, sender=Payment, dispatch_uid='sales_rollup_payment_save')
+post_delete.connect(_refresh_payment_sales_rollup, sender=Payment, dispatch_uid='sales_rollup_payment_delete')
+post_save.connect(_index_audit_entry, sender=LogEntry, dispatch_uid='audit_subject_index')
+post_delete.connect(_record_accounting_deletion, sender=Invoice, dispatch_uid='accounting_tombstone_invoice')
+post_delete.connect(_record_accounting_deletion, sender=Payment, dispatch_uid='accounting_tombstone_payment')
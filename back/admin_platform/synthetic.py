@@ -0,0 +1,465 @@
+"""
+Génération d'un jeu de données synthétique réaliste (benchmarks, tests de charge).
+
+Produit le graphe complet du parcours client, à l'échelle demandée :
+
+    ProspectRequest → Offer → Quote (+ versions) / QuoteLine
+        → Form (+ étapes) → Invoice / Installment / Payment → Task
+        + CommissionLedger et entrées d'audit (timeline)
+
+Les objets sont créés par lots (`bulk_create`) avec des dates réparties sur
+la période : les signaux ne sont pas déclenchés, les agrégats dérivés
+(registre des commissions, agrégats mensuels, snapshots KPI) sont donc
+alimentés ou invalidés explicitement en fin de génération.
+
+Toutes les données générées sont identifiables (emails `@SYNTHETIC_DOMAIN`,
+numéros préfixés `SYN`) et supprimables via `purge_synthetic_data`.
+"""
+
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from auditlog.models import LogEntry
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from billing.models import Product, Quote, QuoteLine
+from installations.models import (
+    AdministrativeValidation, CommissionLedger, Commissioning, ConsuelVisit, EnedisConnection,
+    Form, InstallationCompleted, RepresentationMandate, TechnicalVisit,
+)
+from invoices.models import Installment, Invoice, Payment
+from offers.models import Offer
+from planning.models import Task
+from request.models import ProspectRequest
+from users.models import User
+
+from .audit_subjects import index_audit_entries
+from .models import DailyKPI
+from .report_cache import invalidate_reports_cache
+from .rollups import rebuild_sales_rollup
+
+
+SYNTHETIC_DOMAIN = 'synthetic.europgreensolar.test'
+
+# Taux de passage d'une étape du parcours à la suivante
+OFFER_RATE = 0.6
+SIGNED_RATE = 0.5
+INVOICE_RATE = 0.8
+
+# Étapes de la fiche d'installation, dans l'ordre du statut
+FORM_STEPS = [
+    (Form.Status.TECHNICAL_VISIT, TechnicalVisit),
+    (Form.Status.REPRESENTATION_MANDATE, RepresentationMandate),
+    (Form.Status.ADMINISTRATIVE_VALIDATION, AdministrativeValidation),
+    (Form.Status.INSTALLATION_COMPLETED, InstallationCompleted),
+    (Form.Status.CONSUEL_VISIT, ConsuelVisit),
+    (Form.Status.ENEDIS_CONNECTION, EnedisConnection),
+    (Form.Status.COMMISSIONING, Commissioning),
+]
+
+# Modèles dont les dates sont fixées par le générateur (auto_now / auto_now_add désactivés)
+TIMESTAMPED_MODELS = [
+    ProspectRequest, Offer, Quote, QuoteLine, Form, Invoice, Installment, Payment,
+    Task, CommissionLedger, *(model for _, model in FORM_STEPS),
+]
+
+DEFAULT_PRODUCTS = [
+    (Product.Type.PANEL, "Panneaux solaires", Decimal('90'), 8, 24),
+    (Product.Type.INVERTER, "Onduleur centralisé", Decimal('1550'), 1, 1),
+    (Product.Type.STRUCTURE, "Matériel de pose", Decimal('800'), 1, 1),
+    (Product.Type.SERVICE, "Main d'oeuvre", Decimal('1500'), 1, 1),
+    (Product.Type.BATTERY, "Batterie", Decimal('4200'), 0, 1),
+]
+
+FIRST_NAMES = ['Camille', 'Lucas', 'Léa', 'Hugo', 'Chloé', 'Louis', 'Manon', 'Jules', 'Emma', 'Nathan',
+               'Inès', 'Gabriel', 'Sarah', 'Arthur', 'Julie', 'Paul', 'Alice', 'Théo', 'Zoé', 'Adam']
+LAST_NAMES = ['Martin', 'Bernard', 'Thomas', 'Petit', 'Robert', 'Richard', 'Durand', 'Dubois', 'Moreau',
+              'Laurent', 'Simon', 'Michel', 'Lefebvre', 'Leroy', 'Roux', 'David', 'Bertrand', 'Morel']
+CITIES = ['Lyon', 'Marseille', 'Toulouse', 'Nice', 'Nantes', 'Montpellier', 'Bordeaux', 'Lille', 'Rennes', 'Dijon']
+
+
+@contextmanager
+def manual_timestamps(models):
+    """Désactive temporairement auto_now / auto_now_add pour conserver les dates générées."""
+    patched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                patched.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in patched:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SyntheticDataGenerator:
+    """
+    Génère `requests` demandes et tout leur parcours aval, par lots de `batch_size`.
+
+    Les créations sont réparties uniformément sur les `months` derniers mois ;
+    `seed` rend la génération reproductible.
+    """
+
+    def __init__(self, requests=1000, months=24, batch_size=1000, seed=42, staff=None, log=None):
+        self.requests = requests
+        self.months = months
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.staff = staff or max(5, requests // 2000)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = {}
+        self._run_id = uuid.uuid4().hex[:8]
+
+    # ------------------------------------------------------------------
+    # Utilitaires
+    # ------------------------------------------------------------------
+
+    def _count(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        key = model._meta.label
+        self.counts[key] = self.counts.get(key, 0) + len(objects)
+        return objects
+
+    def _date_after(self, start, max_days):
+        """Date aléatoire entre `start` et `start + max_days`, sans dépasser maintenant."""
+        return min(start + timedelta(days=self.random.uniform(0, max_days)), self.now)
+
+    def _person(self):
+        return self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)
+
+    def _address(self):
+        return f"{self.random.randint(1, 200)} rue des Tournesols, {self.random.choice(CITIES)}"
+
+    def _user(self, role, first_name, last_name, index, **extra):
+        # Suffixe propre à l'exécution : plusieurs générations successives ne se télescopent pas
+        return User(
+            email=f"{role}-{index}-{self._run_id}@{SYNTHETIC_DOMAIN}",
+            first_name=first_name, last_name=last_name, role=role,
+            password=self._password, **extra,
+        )
+
+    # ------------------------------------------------------------------
+    # Génération
+    # ------------------------------------------------------------------
+
+    def run(self):
+        """Génère le jeu complet et retourne le nombre d'objets créés par modèle."""
+        self._password = make_password(None)
+        # Les numéros continuent ceux d'une génération précédente (unicité)
+        self._quote_seq = Quote.objects.filter(number__startswith='D-SYN-').count()
+        self._invoice_seq = Invoice.objects.filter(number__startswith='F-SYN-').count()
+        with manual_timestamps(TIMESTAMPED_MODELS):
+            with transaction.atomic():
+                self._create_staff()
+                self._products = self._ensure_products()
+            for offset in range(0, self.requests, self.batch_size):
+                size = min(self.batch_size, self.requests - offset)
+                with transaction.atomic():
+                    self._create_batch(offset, size)
+                self.log(f"{offset + size}/{self.requests} demandes générées")
+
+        # Données dérivées : les bulk_create ne déclenchent pas les signaux
+        DailyKPI.objects.all().delete()
+        rebuild_sales_rollup()
+        invalidate_reports_cache()
+        return self.counts
+
+    def _create_staff(self):
+        staff = []
+        for role, count in (
+            (User.UserRoles.SALES, self.staff),
+            (User.UserRoles.COLLABORATOR, self.staff * 2),
+            (User.UserRoles.INSTALLER, max(2, self.staff // 2)),
+            (User.UserRoles.ADMIN, 1),
+        ):
+            for index in range(count):
+                staff.append(self._user(role, *self._person(), index, is_staff=role == User.UserRoles.ADMIN))
+        self._count(User, staff)
+        self.sales = [user for user in staff if user.role == User.UserRoles.SALES]
+        self.collaborators = [user for user in staff if user.role == User.UserRoles.COLLABORATOR]
+        self.installers = [user for user in staff if user.role == User.UserRoles.INSTALLER]
+        self.admin = next(user for user in staff if user.role == User.UserRoles.ADMIN)
+
+    def _ensure_products(self):
+        """Produits actifs du catalogue (ceux de `create_base_products` si présents)."""
+        products = {}
+        for product in Product.objects.filter(is_active=True).order_by('created_at'):
+            products.setdefault(product.type, product)
+        missing = [
+            Product(type=product_type, name=name, unit_price=price, cost_price=price * Decimal('0.6'),
+                    created_at=self.now, updated_at=self.now)
+            for product_type, name, price, _, _ in DEFAULT_PRODUCTS if product_type not in products
+        ]
+        if missing:
+            with manual_timestamps([Product]):
+                self._count(Product, missing)
+            products.update({product.type: product for product in missing})
+        return products
+
+    def _create_batch(self, offset, size):
+        period = timedelta(days=30 * self.months)
+        requests, offers, quotes, lines, forms, steps = [], [], [], [], {}, []
+        invoices, installments, payments, tasks, ledger, clients = [], [], [], [], [], []
+
+        for index in range(offset, offset + size):
+            created_at = self.now - period * self.random.random()
+            first_name, last_name = self._person()
+            source_type = self.random.choice(ProspectRequest.Source.values)
+            sales = self.random.choice(self.sales)
+            request = ProspectRequest(
+                first_name=first_name, last_name=last_name,
+                email=f"prospect-{index}@{SYNTHETIC_DOMAIN}", phone=f"06{self.random.randint(0, 99999999):08d}",
+                address=self._address(), source_type=source_type,
+                source=self.random.choice(self.collaborators) if source_type in ('collaborator', 'client') else None,
+                created_by=sales, assigned_to=sales if self.random.random() < 0.9 else None,
+                commission_value=Decimal(self.random.choice([0, 300, 500])),
+                sales_commission_value=Decimal(self.random.choice([0, 400, 800])),
+                created_at=created_at, updated_at=created_at,
+            )
+            requests.append(request)
+
+            if self.random.random() >= OFFER_RATE:
+                request.status = self.random.choice(
+                    [ProspectRequest.Status.NEW, ProspectRequest.Status.FOLLOWUP, ProspectRequest.Status.CLOSED]
+                )
+                if request.status == ProspectRequest.Status.CLOSED:
+                    request.converted_decision = False
+                continue
+
+            offer_at = self._date_after(created_at, 10)
+            request.status = ProspectRequest.Status.CLOSED
+            request.converted_decision = True
+            request.converted_to_offer_at = offer_at
+            signed = self.random.random() < SIGNED_RATE
+            offer = Offer(
+                request=request, first_name=first_name, last_name=last_name, email=request.email,
+                phone=request.phone, address=request.address,
+                status=Offer.Status.QUOTE_SIGNED if signed else self.random.choice(Offer.Status.values[:-1]),
+                created_at=offer_at, updated_at=offer_at,
+            )
+            offers.append(offer)
+
+            # Versions successives du devis : seule la dernière est acceptée si l'offre est signée
+            predecessor = None
+            quote_at = offer_at
+            for version in range(1, self.random.randint(1, 3) + 1):
+                if predecessor:
+                    predecessor.status = Quote.Status.DECLINED
+                    predecessor.is_latest = False
+                quote_at = self._date_after(quote_at, 7)
+                quote = self._quote(offer, version, predecessor, quote_at, lines)
+                quotes.append(quote)
+                predecessor = quote
+            quote.status = Quote.Status.ACCEPTED if signed else self.random.choice(
+                [Quote.Status.DRAFT, Quote.Status.SENT, Quote.Status.PENDING, Quote.Status.DECLINED]
+            )
+            if not signed:
+                continue
+
+            form_at = self._date_after(quote_at, 5)
+            offer.installation_moved_at = form_at
+            client = self._user(User.UserRoles.CUSTOMER, first_name, last_name, index)
+            clients.append(client)
+            stage = self.random.randrange(len(FORM_STEPS))
+            form = Form(
+                offer=offer, client=client, client_address=request.address,
+                installation_power=Decimal(self.random.choice(['3.00', '6.00', '9.00'])),
+                installation_type=self.random.choice(['Surimposition', 'Intégration', 'Au sol']),
+                status=FORM_STEPS[stage][0], created_by=sales,
+                affected_user=self.random.choice(self.installers),
+                commission_amount=request.commission_value,
+                commission_paid=self.random.random() < 0.5,
+                sales_commission_amount=request.sales_commission_value,
+                sales_commission_paid=self.random.random() < 0.5,
+                created_at=form_at, updated_at=form_at,
+            )
+            forms[form] = stage
+            ledger.extend(self._ledger_entries(form, request))
+            tasks.append(Task(
+                title=f"Suivi installation {last_name}", assigned_to=form.affected_user, assigned_by=sales,
+                due_date=(form_at + timedelta(days=self.random.randint(1, 60))).date(),
+                status=self.random.choice(Task.TaskStatus.values), related_installation=form,
+                created_at=form_at, updated_at=form_at,
+            ))
+
+            if self.random.random() < INVOICE_RATE:
+                invoices.append(self._invoice(form, quote, stage, installments, payments))
+
+        self._count(ProspectRequest, requests)
+        self._count(Offer, offers)
+        self._count(Quote, quotes)
+        self._count(QuoteLine, lines)
+        self._count(User, clients)
+        self._count(Form, list(forms))
+        for form, stage in forms.items():
+            steps.extend(self._form_steps(form, stage))
+        for _, model in FORM_STEPS:
+            self._count(model, [step for step in steps if type(step) is model])
+        self._count(CommissionLedger, ledger)
+        self._count(Invoice, invoices)
+        self._count(Installment, installments)
+        self._count(Payment, payments)
+        self._count(Task, tasks)
+        self._audit(requests, offers, quotes, list(forms), invoices)
+
+    def _quote(self, offer, version, predecessor, created_at, lines):
+        self._quote_seq += 1
+        quote = Quote(
+            number=f"D-SYN-{self._quote_seq:07d}", offer=offer, version=version, predecessor=predecessor,
+            title="Installation photovoltaïque", valid_until=(created_at + timedelta(days=30)).date(),
+            created_at=created_at, updated_at=created_at,
+        )
+        subtotal = Decimal('0')
+        for position, (product_type, _, _, min_qty, max_qty) in enumerate(DEFAULT_PRODUCTS):
+            quantity = Decimal(self.random.randint(min_qty, max_qty))
+            if not quantity:
+                continue
+            product = self._products[product_type]
+            line = QuoteLine(
+                quote=quote, source_product=product, product_type=product.type, name=product.name,
+                unit_price=product.unit_price, cost_price=product.cost_price, quantity=quantity,
+                line_total=product.unit_price * quantity, position=position,
+                created_at=created_at, updated_at=created_at,
+            )
+            lines.append(line)
+            subtotal += line.line_total
+        quote.subtotal = subtotal
+        quote.total = (subtotal * (1 + Decimal(quote.tax_rate) / 100)).quantize(Decimal('0.01'))
+        quote.commission_amount = offer.request.commission_value
+        quote.sales_commission_amount = offer.request.sales_commission_value
+        return quote
+
+    def _ledger_entries(self, form, request):
+        entries = []
+        for entry_type, amount, paid, beneficiary in (
+            (CommissionLedger.Type.SOURCE, form.commission_amount, form.commission_paid, request.source),
+            (CommissionLedger.Type.SALES, form.sales_commission_amount, form.sales_commission_paid, request.assigned_to),
+        ):
+            if amount > 0:
+                entries.append(CommissionLedger(
+                    installation=form, type=entry_type, beneficiary=beneficiary, client=form.client,
+                    amount=amount, paid=paid, paid_at=self._date_after(form.created_at, 60) if paid else None,
+                    installation_created_at=form.created_at,
+                    created_at=form.created_at, updated_at=form.created_at,
+                ))
+        return entries
+
+    def _form_steps(self, form, stage):
+        """Une ligne par étape franchie (et l'étape en cours), validée sauf la dernière."""
+        steps = []
+        step_at = form.created_at
+        for position, (_, model) in enumerate(FORM_STEPS[:stage + 1]):
+            step_at = self._date_after(step_at, 15)
+            done = position < stage
+            values = {'form': form, 'created_by': form.created_by, 'created_at': step_at, 'updated_at': step_at}
+            if model is TechnicalVisit:
+                values.update(visit_date=step_at.date(), expected_installation_date=(step_at + timedelta(days=30)).date(),
+                              is_validated=done, validated_at=step_at if done else None)
+            elif model in (AdministrativeValidation, EnedisConnection):
+                values.update(is_validated=done, validated_at=step_at if done else None)
+            elif model is InstallationCompleted:
+                values.update(modules_installed=done, inverters_installed=done, dc_ac_box_installed=done)
+            elif model is ConsuelVisit:
+                values.update(passed=True if done else None)
+            elif model is Commissioning:
+                values.update(handover_receipt_given=True)
+            steps.append(model(**values))
+        return steps
+
+    def _invoice(self, form, quote, stage, installments, payments):
+        self._invoice_seq += 1
+        issued_at = self._date_after(form.created_at, 20)
+        invoice = Invoice(
+            number=f"F-SYN-{self._invoice_seq:07d}", installation=form, quote=quote,
+            title=quote.title, issue_date=issued_at.date(), due_date=(issued_at + timedelta(days=30)).date(),
+            subtotal=quote.subtotal, tax_rate=quote.tax_rate, total=quote.total,
+            created_by=form.created_by, created_at=issued_at, updated_at=issued_at,
+        )
+        deposit = Installment(
+            invoice=invoice, type=Installment.Type.DEPOSIT,
+            label="Acompte", due_date=invoice.issue_date, percentage=Decimal('30'),
+            amount=(invoice.total * Decimal('0.3')).quantize(Decimal('0.01')),
+            created_at=issued_at, updated_at=issued_at,
+        )
+        balance = Installment(
+            invoice=invoice, type=Installment.Type.BALANCE, label="Solde", due_date=invoice.due_date,
+            percentage=Decimal('70'), amount=invoice.total - deposit.amount,
+            created_at=issued_at, updated_at=issued_at,
+        )
+        installments.extend([deposit, balance])
+
+        # Acompte réglé pour la plupart des factures, solde pour les installations avancées
+        paid = []
+        if self.random.random() < 0.85:
+            paid.append(deposit)
+            if stage >= 3 and self.random.random() < 0.8:
+                paid.append(balance)
+        paid_at = issued_at
+        for installment in paid:
+            paid_at = self._date_after(paid_at, 20)
+            installment.is_paid = True
+            installment.paid_total = installment.amount
+            invoice.paid_total += installment.amount
+            payments.append(Payment(
+                invoice=invoice, installment=installment, date=paid_at.date(),
+                method=self.random.choice(['virement', 'CB', 'chèque']), amount=installment.amount,
+                created_by=form.created_by, created_at=paid_at, updated_at=paid_at,
+            ))
+        invoice.status = (
+            Invoice.Status.PAID if len(paid) == 2
+            else Invoice.Status.PARTIALLY_PAID if paid
+            else Invoice.Status.ISSUED
+        )
+        return invoice
+
+    def _audit(self, requests, offers, quotes, forms, invoices):
+        """Entrées d'audit de création (alimentent la timeline des utilisateurs)."""
+        entries = []
+        for objects, actor in (
+            (requests, lambda obj: obj.created_by),
+            (offers, lambda obj: obj.request.assigned_to),
+            (quotes, lambda obj: obj.offer.request.assigned_to),
+            (forms, lambda obj: obj.created_by),
+            (invoices, lambda obj: obj.created_by),
+        ):
+            if not objects:
+                continue
+            content_type = ContentType.objects.get_for_model(type(objects[0]))
+            entries.extend(
+                LogEntry(
+                    content_type=content_type, object_pk=str(obj.pk), object_repr=str(obj.pk),
+                    action=LogEntry.Action.CREATE, changes={}, changes_text='',
+                    actor=actor(obj), timestamp=obj.created_at, additional_data={'synthetic': True},
+                )
+                for obj in objects
+            )
+        self._count(LogEntry, entries)
+        # bulk_create ne déclenche pas l'indexation de la timeline (signal post_save)
+        index_audit_entries(entries, batch_size=self.batch_size)
+
+
+def purge_synthetic_data():
+    """
+    Supprime toutes les données générées (demandes et utilisateurs synthétiques, en cascade).
+
+    Retourne le nombre total d'objets supprimés.
+    """
+    with transaction.atomic():
+        deleted, _ = LogEntry.objects.filter(additional_data__synthetic=True).delete()
+        deleted += ProspectRequest.objects.filter(email__endswith=f"@{SYNTHETIC_DOMAIN}").delete()[0]
+        deleted += Invoice.objects.filter(number__startswith='F-SYN-').delete()[0]
+        deleted += User.objects.filter(email__endswith=f"@{SYNTHETIC_DOMAIN}").delete()[0]
+
+    DailyKPI.objects.all().delete()
+    rebuild_sales_rollup()
+    invalidate_reports_cache()
+    return deleted
@@ -0,0 +1,115 @@
+"""
+Tâches Celery de la plateforme d'administration.
+
+Exécutées périodiquement par Celery Beat selon le planning défini
+dans EuropGreenSolar/celery.py, ou à la demande (génération des rapports).
+"""
+
+import json
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from admin_platform.kpi import refresh_daily_kpis as refresh_kpi_snapshots
+from admin_platform.models import ReportJob
+from admin_platform.rollups import refresh_sales_rollup as refresh_sales_rollup_months, month_start
+from admin_platform import reports
+
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='admin_platform.tasks.refresh_daily_kpis')
+def refresh_daily_kpis(days=None):
+    """
+    Recalcule les snapshots DailyKPI des derniers jours écoulés.
+    
+    Le nombre de jours est configurable via KPI_SNAPSHOT_REFRESH_DAYS : la fenêtre
+    glissante rattrape les changements de statut non capturés par les signaux
+    (ex : mises à jour en masse via queryset.update()).
+    Exécuté toutes les nuits, juste après minuit.
+    """
+    days = days or getattr(settings, 'KPI_SNAPSHOT_REFRESH_DAYS', 7)
+    yesterday = timezone.localdate() - timedelta(days=1)
+    written = refresh_kpi_snapshots(yesterday - timedelta(days=days - 1), yesterday)
+    print(f"[KPI] {written} snapshots journaliers recalculés")
+    return {'written': written}
+
+
+@shared_task(name='admin_platform.tasks.refresh_sales_rollup')
+def refresh_sales_rollup(months=None):
+    """
+    Recalcule les agrégats mensuels des ventes des derniers mois.
+    
+    Le nombre de mois (mois courant inclus) est configurable via
+    SALES_ROLLUP_REFRESH_MONTHS : la fenêtre rattrape ce que les signaux ne
+    voient pas (réattribution d'une demande, mises à jour en masse).
+    Exécuté toutes les nuits, après les snapshots KPI.
+    """
+    months = months or getattr(settings, 'SALES_ROLLUP_REFRESH_MONTHS', 3)
+    month = month_start(timezone.localdate())
+    targets = []
+    for _ in range(months):
+        targets.append(month)
+        month = month_start(month - timedelta(days=1))
+    written = refresh_sales_rollup_months(targets)
+    print(f"[Ventes] {written} agrégats mensuels recalculés sur {months} mois")
+    return {'written': written}
+
+
+# Les gros rapports peuvent dépasser la limite globale CELERY_TASK_TIME_LIMIT (5 min)
+@shared_task(
+    name='admin_platform.tasks.generate_report_job',
+    time_limit=reports.REPORT_JOB_TIME_LIMIT,
+    soft_time_limit=reports.REPORT_JOB_TIME_LIMIT - 60,
+)
+def generate_report_job(job_id):
+    """
+    Génère le fichier d'un ReportJob (CSV ou XLSX) et l'enregistre dans le stockage média.
+    
+    Mis en file par l'endpoint POST /admin-platform/report-jobs/.
+    """
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if job is None or job.status != ReportJob.Status.PENDING:
+        return {'job_id': job_id, 'status': job.status if job else 'missing'}
+    
+    reports.run_report_job(job)
+    print(f"[Rapports] Job {job.id} ({job.report_type}) terminé : {job.file.name}")
+    return {'job_id': job_id, 'status': job.status}
+
+
+@shared_task(name='admin_platform.tasks.purge_report_jobs')
+def purge_report_jobs():
+    """
+    Supprime les jobs de rapport expirés et leurs fichiers.
+    
+    Durée de conservation configurable via REPORT_JOB_RETENTION_DAYS.
+    Exécuté toutes les nuits.
+    """
+    deleted = reports.purge_report_jobs()
+    print(f"[Rapports] {deleted} jobs de rapport supprimés")
+    return {'deleted': deleted}
+
+
+@shared_task(name='admin_platform.tasks.write_audit_entries', bind=True, max_retries=5)
+def write_audit_entries(self, rows):
+    """
+    Écrit un lot d'entrées d'audit (AUDIT_LOG_SINK = "celery").
+    
+    Mis en file au commit de la transaction qui les a produites
+    (voir admin_platform.audit_sink). Réessayée en cas d'échec ; le lot
+    abandonné est journalisé en entier pour pouvoir être rejoué.
+    """
+    from admin_platform.audit_sink import deserialize_entries, write_entries
+
+    try:
+        written = write_entries(deserialize_entries(rows))
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            logger.error("Lot d'audit abandonné (%d entrées) : %s", len(rows), json.dumps(rows))
+            raise
+        raise self.retry(exc=exc, countdown=30 * 2 ** self.request.retries)
+    return {'written': written}
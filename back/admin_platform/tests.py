@@ -1,3 +1,1584 @@
-from django.test import TestCase
+import tempfile
+from importlib import import_module
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
 
-# Create your tests here.
+from auditlog.context import set_actor
+from auditlog.models import LogEntry
+from django.apps import apps as django_apps
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication import access
+
+from EuropGreenSolar.search import search_queryset
+from EuropGreenSolar.testing import EndpointBudget, QueryBudgetMixin
+
+from billing.models import DocumentCounter, Quote
+from billing.numbering import INVOICE_SERIES, QUOTE_SERIES, next_document_number
+from billing.views import _create_quote_new_version
+from invoices.models import Installment, Invoice, Payment, reconcile_paid_totals
+from invoices.tasks import generate_invoice_pdf
+from installations.commissions import bulk_pay_commissions, rebuild_commission_ledger
+from installations.models import CommissionLedger, Form
+from offers.models import Offer
+from request.models import ProspectRequest
+from users.models import Role, User, UserAccess
+
+from .analytics import conversion_summary
+from .audit_sink import buffered_audit
+from .audit_subjects import rebuild_audit_subjects
+from .kpi import get_daily_kpis
+from .fec import build_incremental_fec_export
+from .models import AccountingExportCursor, AccountingExportEntry, AuditSubject, DailyKPI, MonthlySalesRollup, ReportJob
+from .report_cache import get_cache_stats
+from .reports import REPORT_JOB_TIME_LIMIT, run_report_job
+from .rollups import compute_sales_rollup, month_end, month_start, sales_rollup_rows
+from .synthetic import SYNTHETIC_DOMAIN, SyntheticDataGenerator, purge_synthetic_data
+from .tasks import generate_report_job, refresh_daily_kpis, write_audit_entries
+
+
+class DailyKPITests(TestCase):
+    """Snapshots DailyKPI : tâche nocturne, jour courant en direct, invalidation, lecture du dashboard."""
+
+    def setUp(self):
+        cache.clear()
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        self.admin = User.objects.create_superuser(email='admin-kpi@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _backdate(self, instance, day):
+        """Déplace la création au jour `day` (update() : aucun signal, comme un import)."""
+        created_at = timezone.make_aware(datetime.combine(day, time(12)))
+        type(instance).objects.filter(pk=instance.pk).update(created_at=created_at)
+        instance.refresh_from_db()
+        return instance
+
+    def _request(self, day):
+        request = ProspectRequest.objects.create(
+            last_name='Kpi', first_name='Test', email='kpi@example.com', phone='0600000000',
+            address='1 rue du Soleil', source_type=ProspectRequest.Source.WEB_FORM,
+        )
+        return self._backdate(request, day) if day != self.today else request
+
+    def _paid_invoice(self, total, day):
+        invoice = Invoice.objects.create(
+            custom_recipient_name='Client KPI', total=Decimal(total), status=Invoice.Status.PAID,
+        )
+        return self._backdate(invoice, day) if day != self.today else invoice
+
+    def test_nightly_task_snapshots_past_days_only(self):
+        self._request(self.yesterday)
+        self._request(self.yesterday)
+        self._paid_invoice('100.00', self.yesterday)
+        self._request(self.today)
+
+        self.assertEqual(refresh_daily_kpis(days=2), {'written': 2})
+
+        snapshot = DailyKPI.objects.get(date=self.yesterday)
+        self.assertEqual(snapshot.requests_count, 2)
+        self.assertEqual(snapshot.revenue_paid, Decimal('100.00'))
+        self.assertEqual(snapshot.requests_by_source, {ProspectRequest.Source.WEB_FORM: {'count': 2, 'converted': 0}})
+        self.assertFalse(DailyKPI.objects.filter(date=self.today).exists())
+
+    def test_today_is_computed_live(self):
+        self._request(self.today)
+        self.assertEqual(get_daily_kpis(self.today, self.today)[0]['requests_count'], 1)
+
+        self._request(self.today)
+        (day,) = get_daily_kpis(self.today, self.today)
+        self.assertEqual(day['date'], self.today)
+        self.assertEqual(day['requests_count'], 2)
+        self.assertFalse(DailyKPI.objects.exists())
+
+    def test_backdated_save_invalidates_snapshot(self):
+        invoice = self._paid_invoice('100.00', self.yesterday)
+        refresh_daily_kpis(days=1)
+        self.assertEqual(DailyKPI.objects.get(date=self.yesterday).revenue_paid, Decimal('100.00'))
+
+        invoice.status = Invoice.Status.ISSUED
+        invoice.save()
+        self.assertFalse(DailyKPI.objects.filter(date=self.yesterday).exists())
+
+        (day,) = get_daily_kpis(self.yesterday, self.yesterday)
+        self.assertEqual(day['revenue_paid'], Decimal('0'))
+        self.assertEqual(day['revenue_pending'], Decimal('100.00'))
+        self.assertTrue(DailyKPI.objects.filter(date=self.yesterday).exists())
+
+    def test_snapshot_rebuilt_before_commit_is_dropped(self):
+        invoice = self._paid_invoice('100.00', self.yesterday)
+        refresh_daily_kpis(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            invoice.status = Invoice.Status.ISSUED
+            invoice.save()
+            # Reconstruit pendant la transaction (un lecteur concurrent verrait l'état d'avant)
+            get_daily_kpis(self.yesterday, self.yesterday)
+            self.assertTrue(DailyKPI.objects.filter(date=self.yesterday).exists())
+        self.assertFalse(DailyKPI.objects.filter(date=self.yesterday).exists())
+
+    def test_dashboard_combines_snapshots_and_today(self):
+        self._paid_invoice('100.00', self.yesterday)
+        refresh_daily_kpis(days=1)
+        self._paid_invoice('50.00', self.today)
+
+        response = self.client.get('/admin-platform/dashboard/overview/', {'period': '7d'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['revenue']['total'], 150.0)
+        self.assertEqual(list(DailyKPI.objects.values_list('date', flat=True)), [self.yesterday])
+
+
+class ReportsCacheTests(TestCase):
+    """cached_action : clé par action et paramètres, invalidation par signaux, compteurs hits/misses."""
+
+    OVERVIEW = '/admin-platform/dashboard/overview/'
+    FUNNEL = '/admin-platform/dashboard/conversion_funnel/'
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin-cache@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.prospect = ProspectRequest.objects.create(
+            last_name='Cache', first_name='Test', email='cache@example.com', phone='0600000000',
+            address='1 rue du Soleil', source_type=ProspectRequest.Source.WEB_FORM,
+        )
+
+    def _stats(self, action_name):
+        return next(row for row in get_cache_stats()['actions'] if row['action'] == action_name)
+
+    def _get(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_key_depends_on_action_and_params(self):
+        _, first = self._get(self.OVERVIEW, {'period': '7d'})
+        response, second = self._get(self.OVERVIEW, {'period': '7d'})
+        self.assertGreater(first, 0)
+        self.assertEqual(second, 0)
+
+        self._get(self.OVERVIEW, {'period': '30d'})
+        self._get(self.FUNNEL, {'period': '7d'})
+        self.assertEqual(self._stats('overview')['hits'], 1)
+        self.assertEqual(self._stats('overview')['misses'], 2)
+        self.assertEqual(self._stats('conversion_funnel')['misses'], 1)
+
+    def test_param_order_does_not_change_key(self):
+        params = 'period=custom&start_date=2020-01-01&end_date=2020-12-31'
+        self._get(f'{self.OVERVIEW}?{params}')
+        _, queries = self._get(f'{self.OVERVIEW}?end_date=2020-12-31&period=custom&start_date=2020-01-01')
+        self.assertEqual(queries, 0)
+
+    def test_offer_save_and_delete_invalidate(self):
+        before, _ = self._get(self.OVERVIEW)
+        offer = Offer.objects.create(
+            request=self.prospect, last_name='Cache', first_name='Test', email='cache@example.com',
+            phone='0600000000', address='1 rue du Soleil',
+        )
+        after_create, _ = self._get(self.OVERVIEW)
+        self.assertEqual(after_create.data['active_projects'], before.data['active_projects'] + 1)
+
+        offer.delete()
+        after_delete, _ = self._get(self.OVERVIEW)
+        self.assertEqual(after_delete.data['active_projects'], before.data['active_projects'])
+        self.assertEqual(self._stats('overview')['misses'], 3)
+
+    def test_invalidated_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Offer.objects.create(
+                request=self.prospect, last_name='Cache', first_name='Test', email='cache@example.com',
+                phone='0600000000', address='1 rue du Soleil',
+            )
+            # Recalcul pendant la transaction (état d'avant le commit pour les autres connexions)
+            self._get(self.OVERVIEW)
+            _, queries = self._get(self.OVERVIEW)
+            self.assertEqual(queries, 0)
+        _, queries = self._get(self.OVERVIEW)
+        self.assertGreater(queries, 0)
+
+    def test_cache_stats_endpoint(self):
+        self._get(self.OVERVIEW)
+        self._get(self.OVERVIEW)
+        response = self.client.get('/admin-platform/dashboard/cache-stats/')
+        self.assertEqual(response.status_code, 200)
+        overview = next(row for row in response.data['actions'] if row['action'] == 'overview')
+        self.assertEqual((overview['hits'], overview['misses'], overview['hit_rate']), (1, 1, 50.0))
+
+
+class ConversionAnalyticsTests(TestCase):
+    """Le nombre de requêtes des analyses de conversion ne dépend pas du nombre de sources."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _create_requests(self, source_type, count=2):
+        for index in range(count):
+            ProspectRequest.objects.create(
+                last_name='Test', first_name=f'{source_type}-{index}', email='prospect@example.com',
+                phone='0600000000', address='1 rue du Soleil', source_type=source_type,
+                converted_decision=index == 0,
+            )
+
+    def _count_queries(self, func):
+        with CaptureQueriesContext(connection) as context:
+            result = func()
+        return len(context.captured_queries), result
+
+    def _period(self):
+        now = timezone.now()
+        return now - timedelta(days=1), now + timedelta(minutes=1)
+
+    def test_conversion_summary_single_query(self):
+        self._create_requests(ProspectRequest.Source.WEB_FORM)
+        queries_one_source, summary = self._count_queries(lambda: conversion_summary(*self._period()))
+
+        for source_type in ProspectRequest.Source.values:
+            self._create_requests(source_type)
+        queries_all_sources, summary = self._count_queries(lambda: conversion_summary(*self._period()))
+
+        self.assertEqual(queries_one_source, 1)
+        self.assertEqual(queries_all_sources, queries_one_source)
+        self.assertEqual(len(summary['sources']), len(ProspectRequest.Source.values))
+        self.assertEqual(summary['stages'][0]['count'], 2 * (len(ProspectRequest.Source.values) + 1))
+
+    def test_sources_breakdown_query_count_constant(self):
+        self._create_requests(ProspectRequest.Source.WEB_FORM)
+        cache.clear()
+        queries_one_source, response = self._count_queries(
+            lambda: self.client.get('/admin-platform/dashboard/sources_breakdown/')
+        )
+        self.assertEqual(response.status_code, 200)
+
+        for source_type in ProspectRequest.Source.values:
+            self._create_requests(source_type)
+        cache.clear()
+        queries_all_sources, response = self._count_queries(
+            lambda: self.client.get('/admin-platform/dashboard/sources_breakdown/')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['labels']), len(ProspectRequest.Source.values))
+        self.assertEqual(queries_all_sources, queries_one_source)
+
+    def test_dashboard_serves_conversion_summary(self):
+        for source_type in ProspectRequest.Source.values:
+            self._create_requests(source_type)
+        cache.clear()
+        summary = conversion_summary(timezone.now() - timedelta(days=30), timezone.now() + timedelta(minutes=1))
+
+        funnel = self.client.get('/admin-platform/dashboard/conversion_funnel/').data
+        self.assertEqual(funnel['stages'], summary['stages'])
+        sources = self.client.get('/admin-platform/dashboard/sources_breakdown/').data
+        self.assertEqual(sources['data'], [source['count'] for source in summary['sources']])
+        self.assertEqual(sources['conversion_rates'], [source['conversion_rate'] for source in summary['sources']])
+        overview = self.client.get('/admin-platform/dashboard/overview/').data
+        self.assertEqual(overview['conversion_rate'], summary['stages'][-1]['percentage'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), REPORT_JOB_TTL=3600)
+class ReportJobTests(TestCase):
+    """Génération asynchrone des rapports et réutilisation des artefacts."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin-reports@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _create_job(self, params):
+        with patch('admin_platform.reports_views.generate_report_job.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    '/admin-platform/report-jobs/',
+                    {'report_type': 'accounting', 'params': params},
+                    format='json',
+                )
+        return response, delay
+
+    def test_identical_params_reuse_job(self):
+        params = {'start_date': '2025-01-01', 'end_date': '2025-01-31'}
+        response, delay = self._create_job(params)
+        self.assertEqual(response.status_code, 202)
+        delay.assert_called_once_with(response.data['id'])
+
+        job = ReportJob.objects.get(pk=response.data['id'])
+        run_report_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ReportJob.Status.COMPLETED)
+
+        response, delay = self._create_job({**params, 'unknown': 'ignored'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], str(job.id))
+        self.assertIsNotNone(response.data['download_url'])
+        delay.assert_not_called()
+
+        download = self.client.get(f'/admin-platform/report-jobs/{job.id}/download/')
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content).startswith('\ufeff'.encode('utf-8')))
+
+    def test_different_params_create_new_job(self):
+        first, _ = self._create_job({'status': 'paid'})
+        second, _ = self._create_job({'status': 'issued'})
+        self.assertEqual(second.status_code, 202)
+        self.assertNotEqual(first.data['id'], second.data['id'])
+
+    def test_running_job_reused_until_time_limit(self):
+        first, _ = self._create_job({'status': 'paid'})
+        ReportJob.objects.filter(pk=first.data['id']).update(
+            status=ReportJob.Status.RUNNING, started_at=timezone.now() - timedelta(seconds=60),
+        )
+        second, _ = self._create_job({'status': 'paid'})
+        self.assertEqual((second.status_code, second.data['id']), (200, first.data['id']))
+
+        ReportJob.objects.filter(pk=first.data['id']).update(
+            started_at=timezone.now() - timedelta(seconds=REPORT_JOB_TIME_LIMIT + 1),
+        )
+        third, delay = self._create_job({'status': 'paid'})
+        self.assertEqual(third.status_code, 202)
+        self.assertNotEqual(third.data['id'], first.data['id'])
+        delay.assert_called_once_with(third.data['id'])
+        dead = ReportJob.objects.get(pk=first.data['id'])
+        self.assertEqual(dead.status, ReportJob.Status.FAILED)
+        self.assertIsNotNone(dead.completed_at)
+
+    @override_settings(REPORT_JOB_PENDING_TIMEOUT=600)
+    def test_lost_pending_job_fails(self):
+        first, _ = self._create_job({'status': 'issued'})
+        ReportJob.objects.filter(pk=first.data['id']).update(created_at=timezone.now() - timedelta(seconds=601))
+
+        detail = self.client.get(f"/admin-platform/report-jobs/{first.data['id']}/")
+        self.assertEqual(detail.data['status'], ReportJob.Status.FAILED)
+        second, _ = self._create_job({'status': 'issued'})
+        self.assertEqual(second.status_code, 202)
+        # Le message tardif d'un job abandonné ne le relance pas
+        self.assertEqual(generate_report_job(first.data['id'])['status'], ReportJob.Status.FAILED)
+
+
+class IncrementalFecExportTests(TestCase):
+    """L'export FEC incrémental ne relit que les factures et paiements modifiés depuis le watermark."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin-fec@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _export(self):
+        response = self.client.get(
+            '/admin-platform/reports/accounting-export/',
+            {'export_format': 'fec', 'consumer': 'cabinet'},
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+    def _invoice(self, number):
+        return Invoice.objects.create(
+            number=number, custom_recipient_name='Client Test', subtotal=Decimal('1000.00'),
+            tax_rate=Decimal('20.00'), total=Decimal('1200.00'),
+        )
+
+    def _entries(self, lines):
+        """{EcritureNum: [(compte, débit, crédit)]} des lignes d'un export (hors en-tête)."""
+        entries = {}
+        for line in lines[1:]:
+            columns = line.split('\t')
+            entries.setdefault(columns[2], []).append(
+                (columns[4], Decimal(columns[11].replace(',', '.')), Decimal(columns[12].replace(',', '.')))
+            )
+        return entries
+
+    def _assert_balanced(self, lines):
+        entries = self._entries(lines)
+        for number, rows in entries.items():
+            self.assertEqual(sum(row[1] for row in rows), sum(row[2] for row in rows), number)
+
+    def test_sales_entry_exported_once(self):
+        first = self._invoice('F-TEST-0001')
+        lines = self._export()
+        self.assertEqual(lines[0].split('\t')[0], 'JournalCode')
+        self.assertEqual(len(lines), 1 + 3)
+        self.assertEqual(AccountingExportCursor.objects.get(consumer='cabinet').last_export_invoices, 1)
+
+        # Rien de nouveau : seul l'en-tête
+        self.assertEqual(len(self._export()), 1)
+
+        # Le paiement modifie paid_total et le statut de la facture : seul le règlement est exporté
+        self._invoice('F-TEST-0002')
+        payment = Payment.objects.create(invoice=first, amount=Decimal('1200.00'))
+        first.refresh_from_db()
+        self.assertEqual(first.status, Invoice.Status.PAID)
+        lines = self._export()
+        self.assertEqual(set(self._entries(lines)), {'F-TEST-0002', f'RG-{payment.id.hex[:8].upper()}'})
+        self._assert_balanced(lines)
+        self.assertEqual(len(self._export()), 1)
+
+    def test_accounting_change_reverses_previous_entry(self):
+        invoice = self._invoice('F-TEST-0003')
+        self._export()
+
+        invoice.subtotal, invoice.total = Decimal('2000.00'), Decimal('2400.00')
+        invoice.save()
+        lines = self._export()
+        entries = self._entries(lines)
+        self.assertEqual(set(entries), {'F-TEST-0003-A1', 'F-TEST-0003-R1'})
+        self.assertIn(('411000', Decimal('0'), Decimal('1200.00')), entries['F-TEST-0003-A1'])
+        self.assertIn(('411000', Decimal('2400.00'), Decimal('0')), entries['F-TEST-0003-R1'])
+        self._assert_balanced(lines)
+
+        # Annulation : contrepassation seule
+        invoice.status = Invoice.Status.CANCELLED
+        invoice.save()
+        entries = self._entries(self._export())
+        self.assertEqual(set(entries), {'F-TEST-0003-A2'})
+        self.assertIn(('411000', Decimal('0'), Decimal('2400.00')), entries['F-TEST-0003-A2'])
+
+    def test_payment_edit_and_delete_are_reversed(self):
+        invoice = self._invoice('F-TEST-0004')
+        payment = Payment.objects.create(invoice=invoice, amount=Decimal('500.00'))
+        self._export()
+        number = f'RG-{payment.id.hex[:8].upper()}'
+
+        payment.amount = Decimal('600.00')
+        payment.save()
+        entries = self._entries(self._export())
+        self.assertEqual(set(entries), {f'{number}-A1', f'{number}-R1'})
+        self.assertIn(('512000', Decimal('0'), Decimal('500.00')), entries[f'{number}-A1'])
+        self.assertIn(('512000', Decimal('600.00'), Decimal('0')), entries[f'{number}-R1'])
+
+        payment.delete()
+        entries = self._entries(self._export())
+        # Sans paiement ni PDF, la facture repasse en brouillon : sa vente est contrepassée aussi
+        self.assertEqual(set(entries), {f'{number}-A2', 'F-TEST-0004-A1'})
+        self.assertIn(('512000', Decimal('0'), Decimal('600.00')), entries[f'{number}-A2'])
+        self.assertEqual(len(self._export()), 1)
+
+    def test_late_commit_inside_overlap_is_exported(self):
+        self._invoice('F-TEST-0005')
+        self._export()
+        watermark = AccountingExportCursor.objects.get(consumer='cabinet').watermark
+
+        # Enregistrée juste avant le début de l'export précédent, validée après
+        late = self._invoice('F-TEST-0006')
+        Invoice.objects.filter(pk=late.pk).update(updated_at=watermark - timedelta(seconds=1))
+        self.assertEqual(set(self._entries(self._export())), {'F-TEST-0006'})
+
+    def test_reset_reexports_current_state(self):
+        invoice = self._invoice('F-TEST-0007')
+        self._export()
+        invoice.total = Decimal('1500.00')
+        invoice.save()
+        response = self.client.get(
+            '/admin-platform/reports/accounting-export/',
+            {'export_format': 'fec', 'consumer': 'cabinet', 'reset': 'true'},
+        )
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(set(self._entries(lines)), {'F-TEST-0007'})
+        self.assertEqual(len(self._export()), 1)
+
+    def test_overlapping_export_is_refused(self):
+        self._invoice('F-TEST-0010')
+        first = build_incremental_fec_export('cabinet')
+        second = build_incremental_fec_export('cabinet')
+
+        lines = ''.join(first.chunks).splitlines()
+        self.assertEqual(set(self._entries(lines)), {'F-TEST-0010'})
+        watermark = AccountingExportCursor.objects.get(consumer='cabinet').watermark
+
+        # Le second export (mêmes écritures) n'aboutit pas et n'enregistre rien
+        with self.assertLogs('admin_platform.fec', 'ERROR'), self.assertRaises(RuntimeError):
+            ''.join(second.chunks)
+        self.assertEqual(AccountingExportCursor.objects.get(consumer='cabinet').watermark, watermark)
+        self.assertEqual(AccountingExportEntry.objects.filter(cursor__consumer='cabinet').count(), 1)
+        self.assertEqual(len(self._export()), 1)
+
+    def test_cursor_exported_before_entry_tracking(self):
+        self._invoice('F-TEST-0008')
+        AccountingExportCursor.objects.create(consumer='cabinet', watermark=timezone.now())
+        new = self._invoice('F-TEST-0009')
+        self.assertEqual(set(self._entries(self._export())), {new.number})
+
+
+class CommissionLedgerTests(TestCase):
+    """Registre des commissions : synchronisation depuis les fiches et les demandes, rattrapage, /ledger, paiement groupé."""
+
+    LEDGER = '/installations/commissions/ledger/'
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin-ledger@example.com', password='secret')
+        self.source = User.objects.create_user(email='apporteur@example.com', password='secret', first_name='Apporteur')
+        self.salesperson = User.objects.create_user(email='commercial-ledger@example.com', password='secret')
+        self.customer = User.objects.create_user(email='client-ledger@example.com', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _installation(self, commission='100.00', sales_commission='50.00', **form_fields):
+        prospect = ProspectRequest.objects.create(
+            last_name='Ledger', first_name='Test', email='ledger@example.com', phone='0600000000',
+            address='1 rue du Soleil', source=self.source, assigned_to=self.salesperson,
+        )
+        offer = Offer.objects.create(
+            request=prospect, last_name='Ledger', first_name='Test', email='ledger@example.com',
+            phone='0600000000', address='1 rue du Soleil',
+        )
+        return Form.objects.create(
+            offer=offer, client=self.customer, client_address='1 rue du Soleil',
+            installation_power=Decimal('6.00'), installation_type='Toiture',
+            commission_amount=Decimal(commission), sales_commission_amount=Decimal(sales_commission),
+            **form_fields,
+        )
+
+    def _entry(self, form, entry_type):
+        return CommissionLedger.objects.get(installation=form, type=entry_type)
+
+    def test_copy_creates_entries_with_beneficiaries(self):
+        form = self._installation()
+        source_entry = self._entry(form, CommissionLedger.Type.SOURCE)
+        sales_entry = self._entry(form, CommissionLedger.Type.SALES)
+        self.assertEqual((source_entry.amount, source_entry.beneficiary_id), (Decimal('100.00'), self.source.id))
+        self.assertEqual((sales_entry.amount, sales_entry.beneficiary_id), (Decimal('50.00'), self.salesperson.id))
+        self.assertEqual(source_entry.client_id, self.customer.id)
+        self.assertEqual(source_entry.installation_created_at, form.created_at)
+        self.assertFalse(source_entry.paid)
+
+        # Création sans commission : pas de ligne
+        self.assertFalse(CommissionLedger.objects.filter(installation=self._installation('0', '0')).exists())
+
+    def test_pay_sets_paid_at_once_and_unpay_clears_it(self):
+        form = self._installation()
+        response = self.client.patch(f'/installations/commissions/{form.id}/pay-source-commission/')
+        self.assertEqual(response.status_code, 200)
+        entry = self._entry(form, CommissionLedger.Type.SOURCE)
+        self.assertTrue(entry.paid)
+        self.assertIsNotNone(entry.paid_at)
+        self.assertFalse(self._entry(form, CommissionLedger.Type.SALES).paid)
+
+        # Une nouvelle synchronisation ne déplace pas la date de paiement
+        paid_at = entry.paid_at
+        form.refresh_from_db()
+        form.commission_amount = Decimal('120.00')
+        form.save(update_fields=['commission_amount', 'updated_at'])
+        entry.refresh_from_db()
+        self.assertEqual((entry.amount, entry.paid_at), (Decimal('120.00'), paid_at))
+
+        form.commission_paid = False
+        form.save(update_fields=['commission_paid', 'updated_at'])
+        entry.refresh_from_db()
+        self.assertEqual((entry.paid, entry.paid_at), (False, None))
+
+    def test_zero_amount_deletes_entry(self):
+        form = self._installation()
+        form.sales_commission_amount = Decimal('0')
+        form.save(update_fields=['sales_commission_amount', 'updated_at'])
+        self.assertEqual(
+            list(CommissionLedger.objects.filter(installation=form).values_list('type', flat=True)),
+            [CommissionLedger.Type.SOURCE],
+        )
+
+    def test_unrelated_form_save_does_not_touch_ledger(self):
+        form = self._installation()
+        with CaptureQueriesContext(connection) as queries:
+            form.status = Form.Status.INSTALLATION_COMPLETED
+            form.save(update_fields=['status', 'updated_at'])
+        self.assertFalse([query for query in queries if CommissionLedger._meta.db_table in query['sql']])
+
+    def test_request_beneficiary_change_updates_ledger(self):
+        form = self._installation()
+        other = User.objects.create_user(email='autre-commercial@example.com', password='secret')
+        prospect = ProspectRequest.objects.get(pk=form.offer.request_id)
+
+        prospect.assigned_to = other
+        prospect.save(update_fields=['assigned_to'])
+        self.assertEqual(self._entry(form, CommissionLedger.Type.SALES).beneficiary_id, other.id)
+        self.assertEqual(self._entry(form, CommissionLedger.Type.SOURCE).beneficiary_id, self.source.id)
+
+        prospect.source = None
+        prospect.save()
+        self.assertIsNone(self._entry(form, CommissionLedger.Type.SOURCE).beneficiary_id)
+
+        # Bénéficiaires inchangés : aucune requête sur le registre
+        with CaptureQueriesContext(connection) as queries:
+            prospect.status = ProspectRequest.Status.IN_PROGRESS
+            prospect.save()
+        self.assertFalse([query for query in queries if CommissionLedger._meta.db_table in query['sql']])
+
+    def test_rebuild_repairs_drift(self):
+        form = self._installation()
+        self.client.patch(f'/installations/commissions/{form.id}/pay-source-commission/')
+        paid_at = self._entry(form, CommissionLedger.Type.SOURCE).paid_at
+        other = User.objects.create_user(email='repris@example.com', password='secret')
+
+        # Modifications hors signaux
+        ProspectRequest.objects.filter(pk=form.offer.request_id).update(assigned_to=other)
+        Form.objects.filter(pk=form.pk).update(sales_commission_amount=Decimal('75.00'))
+        orphan = self._installation()
+        Form.objects.filter(pk=orphan.pk).update(commission_amount=Decimal('0'))
+
+        self.assertEqual(rebuild_commission_ledger(), {'written': 3, 'deleted': 1})
+        sales_entry = self._entry(form, CommissionLedger.Type.SALES)
+        self.assertEqual((sales_entry.amount, sales_entry.beneficiary_id), (Decimal('75.00'), other.id))
+        self.assertEqual(self._entry(form, CommissionLedger.Type.SOURCE).paid_at, paid_at)
+        self.assertFalse(CommissionLedger.objects.filter(installation=orphan, type=CommissionLedger.Type.SOURCE).exists())
+
+    def test_migration_backfill(self):
+        paid = self._installation(commission_paid=True)
+        unpaid = self._installation('0', '80.00')
+        CommissionLedger.objects.all().delete()
+
+        migration = import_module('installations.migrations.0003_commission_ledger')
+        migration.backfill_commission_ledger(django_apps, None)
+
+        rows = set(CommissionLedger.objects.values_list('installation_id', 'type', 'amount', 'paid', 'beneficiary_id'))
+        self.assertEqual(rows, {
+            (paid.id, CommissionLedger.Type.SOURCE, Decimal('100.00'), True, self.source.id),
+            (paid.id, CommissionLedger.Type.SALES, Decimal('50.00'), False, self.salesperson.id),
+            (unpaid.id, CommissionLedger.Type.SALES, Decimal('80.00'), False, self.salesperson.id),
+        })
+        paid.refresh_from_db()
+        self.assertEqual(self._entry(paid, CommissionLedger.Type.SOURCE).paid_at, paid.updated_at)
+
+    def test_ledger_filters_and_totals(self):
+        first = self._installation(commission_paid=True)
+        second = self._installation('200.00', '0')
+        Form.objects.filter(pk=second.pk).update(created_at=timezone.now() - timedelta(days=40))
+        rebuild_commission_ledger()
+
+        response = self.client.get(self.LEDGER)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['totals'], {'total': 350.0, 'paid': 100.0, 'unpaid': 250.0})
+
+        response = self.client.get(self.LEDGER, {'type': 'source', 'paid': 'false'})
+        self.assertEqual([row['installation_id'] for row in response.data['results']], [str(second.id)])
+        self.assertEqual(response.data['totals'], {'total': 200.0, 'paid': 0.0, 'unpaid': 200.0})
+
+        response = self.client.get(self.LEDGER, {'beneficiary': str(self.salesperson.id)})
+        self.assertEqual([row['installation_id'] for row in response.data['results']], [str(first.id)])
+        self.assertEqual(response.data['results'][0]['beneficiary']['email'], self.salesperson.email)
+
+        start = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(self.LEDGER, {'start_date': start, 'page_size': 1})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['totals']['total'], 150.0)
+
+
+    def _bulk_pay(self, **data):
+        with patch('EuropGreenSolar.email_utils.send_mail') as send_mail:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.post('/installations/commissions/bulk-pay/', data, format='json')
+        return response, queries, callbacks, send_mail
+
+    def _updates(self, queries, model):
+        return [query for query in queries if query['sql'].startswith(f'UPDATE "{model._meta.db_table}"')]
+
+    def test_bulk_pay_by_ids(self):
+        first, second, untouched = self._installation(), self._installation(), self._installation()
+        response, queries, callbacks, send_mail = self._bulk_pay(installation_ids=[str(first.id), str(second.id)])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['paid_count'], response.data['total_amount']), (4, 300.0))
+        self.assertEqual(len(self._updates(queries, CommissionLedger)), 1)
+        self.assertEqual(len(self._updates(queries, Form)), 1)
+        for form in (first, second):
+            form.refresh_from_db()
+            self.assertTrue(form.commission_paid and form.sales_commission_paid)
+        self.assertFalse(CommissionLedger.objects.filter(installation__in=[first, second], paid=False).exists())
+        self.assertFalse(CommissionLedger.objects.filter(installation=untouched, paid=True).exists())
+        self.assertFalse(CommissionLedger.objects.filter(paid=True, paid_at__isnull=True).exists())
+
+        entries = LogEntry.objects.filter(content_type=ContentType.objects.get_for_model(CommissionLedger))
+        self.assertEqual(entries.count(), 1)
+        self.assertEqual(entries.get().object_pk, 'bulk')
+        self.assertEqual(entries.get().actor, self.admin)
+        self.assertEqual(entries.get().additional_data['installations'], sorted([str(first.id), str(second.id)]))
+
+        # Un email par bénéficiaire, envoyé au commit
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(sorted(call.kwargs['to'] for call in send_mail.call_args_list), [self.source.email, self.salesperson.email])
+        totals = {call.kwargs['to']: call.kwargs['context']['total'] for call in send_mail.call_args_list}
+        self.assertEqual(totals, {self.source.email: '200.00', self.salesperson.email: '100.00'})
+
+    def test_bulk_pay_by_beneficiary_and_period_skips_paid(self):
+        recent, old = self._installation(), self._installation()
+        already_paid = self._installation(commission_paid=True)
+        Form.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=40))
+        rebuild_commission_ledger()
+
+        start = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response, _, _, send_mail = self._bulk_pay(beneficiary=str(self.source.id), start_date=start)
+
+        self.assertEqual(response.data['paid_count'], 1)
+        self.assertEqual(response.data['beneficiaries'], [
+            {'id': str(self.source.id), 'name': 'Apporteur', 'count': 1, 'amount': 100.0},
+        ])
+        self.assertEqual(
+            set(CommissionLedger.objects.filter(paid=True).values_list('installation_id', 'type')),
+            {(recent.id, CommissionLedger.Type.SOURCE), (already_paid.id, CommissionLedger.Type.SOURCE)},
+        )
+        old.refresh_from_db()
+        self.assertFalse(old.commission_paid)
+        self.assertEqual(send_mail.call_count, 1)
+
+        # Tout est déjà payé : rien à faire, ni audit ni email
+        response, queries, _, send_mail = self._bulk_pay(installation_ids=[str(already_paid.id)], type='source')
+        self.assertEqual(response.data, {'paid_count': 0, 'total_amount': 0, 'beneficiaries': []})
+        self.assertFalse(self._updates(queries, Form))
+        self.assertEqual(LogEntry.objects.filter(object_pk='bulk').count(), 1)
+        send_mail.assert_not_called()
+
+    def test_bulk_pay_rolls_back_without_notification(self):
+        form = self._installation()
+        with patch('EuropGreenSolar.email_utils.send_mail') as send_mail:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                with self.assertRaises(RuntimeError):
+                    with transaction.atomic():
+                        bulk_pay_commissions(CommissionLedger.objects.filter(installation=form))
+                        raise RuntimeError
+        self.assertEqual(callbacks, [])
+        send_mail.assert_not_called()
+        self.assertFalse(CommissionLedger.objects.filter(paid=True).exists())
+
+    def test_bulk_pay_requires_a_criterion(self):
+        self._installation()
+        response, _, _, _ = self._bulk_pay(type='sales')
+        self.assertEqual(response.status_code, 400)
+        response, _, _, _ = self._bulk_pay(installation_ids=['pas-un-uuid'])
+        self.assertEqual(response.status_code, 400)
+        # Type inconnu : refusé plutôt qu'ignoré (paierait les deux types)
+        for bad_type in ('sale', 'Source'):
+            response, _, _, send_mail = self._bulk_pay(beneficiary=str(self.salesperson.id), type=bad_type)
+            self.assertEqual(response.status_code, 400)
+            send_mail.assert_not_called()
+        self.assertFalse(CommissionLedger.objects.filter(paid=True).exists())
+
+class MonthlySalesRollupTests(TestCase):
+    """L'agrégat mensuel des ventes suit les signatures de devis et les paiements."""
+
+    def setUp(self):
+        self.salesperson = User.objects.create_user(email='commercial@example.com', password='secret')
+        request = ProspectRequest.objects.create(
+            last_name='Test', first_name='Rollup', email='prospect@example.com',
+            phone='0600000000', address='1 rue du Soleil', assigned_to=self.salesperson,
+        )
+        self.offer = Offer.objects.create(
+            request=request, last_name='Test', first_name='Rollup', email='prospect@example.com',
+            phone='0600000000', address='1 rue du Soleil',
+        )
+        self.month = month_start(timezone.localdate())
+
+    def _rollup(self):
+        return MonthlySalesRollup.objects.get(month=self.month, salesperson=self.salesperson)
+
+    def test_signals_keep_month_in_sync(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            quote = Quote.objects.create(offer=self.offer, number='D-TEST-0001', total=Decimal('9000.00'))
+        self.assertFalse(MonthlySalesRollup.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quote.status = Quote.Status.ACCEPTED
+            quote.save()
+        self.assertEqual(self._rollup().signed_quotes_count, 1)
+        self.assertEqual(self._rollup().signed_revenue, Decimal('9000.00'))
+
+        invoice = Invoice.objects.create(
+            number='F-TEST-0100', quote=quote, subtotal=Decimal('7500.00'), total=Decimal('9000.00'),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            payment = Payment.objects.create(invoice=invoice, amount=Decimal('3000.00'))
+        self.assertEqual(self._rollup().paid_revenue, Decimal('3000.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+            quote.status = Quote.Status.DECLINED
+            quote.save()
+        self.assertFalse(MonthlySalesRollup.objects.exists())
+
+    def test_reader_matches_live_computation(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Quote.objects.create(
+                offer=self.offer, number='D-TEST-0002', total=Decimal('5000.00'), status=Quote.Status.ACCEPTED,
+            )
+        # Mois complet : lu depuis la table ; mois partiel : calculé en direct
+        for start_day, end_day in ((self.month, month_end(self.month)), (timezone.localdate(), timezone.localdate())):
+            self.assertEqual(
+                sales_rollup_rows(start_day, end_day),
+                compute_sales_rollup(start_day, end_day),
+            )
+
+    def test_migration_backfills_existing_months(self):
+        quote = Quote.objects.create(
+            offer=self.offer, number='D-TEST-0003', total=Decimal('6000.00'), status=Quote.Status.ACCEPTED,
+        )
+        invoice = Invoice.objects.create(
+            number='F-TEST-0101', quote=quote, subtotal=Decimal('5000.00'), total=Decimal('6000.00'),
+        )
+        Payment.objects.create(invoice=invoice, amount=Decimal('2000.00'))
+        MonthlySalesRollup.objects.all().delete()
+
+        migration = import_module('admin_platform.migrations.0008_backfill_monthly_sales_rollup')
+        migration.backfill_monthly_sales_rollup(django_apps, None)
+
+        self.assertEqual(
+            sales_rollup_rows(self.month, month_end(self.month)),
+            compute_sales_rollup(self.month, month_end(self.month)),
+        )
+        self.assertEqual(self._rollup().paid_revenue, Decimal('2000.00'))
+
+
+class SyntheticDataTests(TestCase):
+    """Le générateur produit un graphe cohérent, reproductible et supprimable."""
+
+    def test_generated_graph_is_consistent_and_purgeable(self):
+        counts = SyntheticDataGenerator(requests=60, batch_size=25, seed=7).run()
+
+        self.assertEqual(counts['request.ProspectRequest'], 60)
+        self.assertEqual(
+            Quote.objects.filter(status=Quote.Status.ACCEPTED).count(),
+            counts['installations.Form'],
+        )
+        # Une seule version acceptée par offre, dates générées conservées
+        self.assertFalse(Offer.objects.annotate(
+            accepted=Count('quotes', filter=Q(quotes__status=Quote.Status.ACCEPTED))
+        ).filter(accepted__gt=1).exists())
+        self.assertLess(ProspectRequest.objects.order_by('created_at').first().created_at,
+                        timezone.now() - timedelta(days=30))
+        for invoice in Invoice.objects.prefetch_related('payments'):
+            self.assertLessEqual(sum(p.amount for p in invoice.payments.all()), invoice.total)
+        self.assertEqual(
+            MonthlySalesRollup.objects.aggregate(total=Sum('signed_quotes_count'))['total'],
+            counts['installations.Form'],
+        )
+
+        purge_synthetic_data()
+        self.assertFalse(ProspectRequest.objects.exists())
+        self.assertFalse(User.objects.filter(email__endswith=SYNTHETIC_DOMAIN).exists())
+        self.assertFalse(MonthlySalesRollup.objects.exists())
+
+
+PERIOD = {'start_date': '2000-01-01', 'end_date': '2100-12-31'}
+
+
+@override_settings(SERVER_TIMING_HEADERS=True)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Budgets de requêtes SQL des endpoints critiques, mesurés sur un jeu synthétique.
+
+    Un dépassement signale une régression (N+1, cache contourné) : ajuster le
+    budget uniquement si la requête supplémentaire est voulue.
+    """
+
+    QUERY_BUDGETS = [
+        EndpointBudget('/admin-platform/dashboard/overview/', queries=25),
+        EndpointBudget('/admin-platform/dashboard/conversion_funnel/', queries=1),
+        EndpointBudget('/admin-platform/dashboard/conversion-cohorts/', queries=1),
+        EndpointBudget('/admin-platform/dashboard/revenue_chart/', queries=7),
+        EndpointBudget('/admin-platform/dashboard/sources_breakdown/', queries=1),
+        EndpointBudget('/admin-platform/dashboard/products_performance/', queries=1),
+        EndpointBudget('/admin-platform/reports/accounting-export/', queries=1, data=PERIOD),
+        EndpointBudget('/admin-platform/reports/sales-report/', queries=6, data=PERIOD),
+        EndpointBudget('/admin-platform/reports/commissions-report/', queries=2, data=PERIOD),
+        EndpointBudget('/admin-platform/reports/prospects-report/', queries=4, data=PERIOD),
+        EndpointBudget('/installations/commissions/list/', queries=1),
+        EndpointBudget('/installations/commissions/ledger/', queries=3),
+        # Listes : constant quel que soit le nombre de lignes (pas de N+1)
+        EndpointBudget('/offers/', queries=3),
+        EndpointBudget('/offers/', queries=2, data={'last_quote': 'summary'}),
+        EndpointBudget('/offers/', queries=3, data={'page_size': 10}),
+        EndpointBudget('/users/', queries=2),
+        EndpointBudget('/invoices/', queries=4),
+        EndpointBudget('/users/', queries=2, data={'role': User.UserRoles.CUSTOMER, 'page_size': 10}),
+        EndpointBudget('/requests/', queries=1, data={'scope': 'all'}),
+        EndpointBudget('/installations/forms/', queries=1),
+        # Champs à la demande : relations chargées selon les champs servis
+        EndpointBudget('/offers/', queries=1, data={'fields': 'id,status'}),
+        EndpointBudget('/installations/forms/', queries=6, data={'expand': 'technical_visit,invoice,quotes,consuels,cerfa16702'}),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=40, batch_size=20, seed=3).run()
+        cls.admin = User.objects.create_superuser(email='admin-budget@example.com', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_endpoint_budgets(self):
+        self.assertEndpointBudgets()
+
+    def test_offer_list_last_quote(self):
+        offers = self.client.get('/offers/').data
+        self.assertTrue(offers)
+        for offer in offers:
+            expected = Offer.objects.get(pk=offer['id']).quotes.order_by('-version', '-created_at').first()
+            self.assertEqual(offer['last_quote'] and offer['last_quote']['id'], expected and str(expected.id))
+        summary = self.client.get('/offers/', {'last_quote': 'summary'}).data[0]['last_quote']
+        self.assertNotIn('lines', summary)
+        self.assertIn('is_signed', summary)
+
+    def test_user_list_installations(self):
+        users = self.client.get('/users/', {'role': User.UserRoles.CUSTOMER}).data
+        self.assertTrue(any(user['installations_count'] for user in users))
+        for user in users:
+            forms = Form.objects.filter(client_id=user['id'])
+            last = forms.order_by('-created_at').first()
+            self.assertEqual(user['installations_count'], forms.count())
+            self.assertEqual(user['last_installation'] and user['last_installation']['id'], last and str(last.id))
+
+    def test_server_timing_header(self):
+        response = self.client.get('/installations/commissions/ledger/')
+        self.assertEqual(response.query_stats['view'], 'CommissionViewSet.ledger')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn(f'desc="{response.query_stats["queries"]} queries"', response['Server-Timing'])
+
+
+class KeysetPaginationTests(TestCase):
+    """Pagination par curseur des listes : ordre stable, sans doublon ni saut, opt-in."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=30, batch_size=30, seed=5).run()
+        # Horodatages identiques : départage par id
+        tied = list(ProspectRequest.objects.values_list('id', flat=True)[:8])
+        ProspectRequest.objects.filter(id__in=tied).update(created_at=timezone.now() - timedelta(days=3))
+        cls.admin = User.objects.create_superuser(email='admin-pages@example.com', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_next_and_previous_links_cover_every_row_once(self):
+        expected = [
+            str(pk) for pk in ProspectRequest.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        ]
+        pages = self._walk('/requests/?scope=all&page_size=7', 'next')
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 7, 2])
+
+        last = self.client.get('/requests/?scope=all&page_size=7')
+        while last.data['next']:
+            last = self.client.get(last.data['next'])
+        backwards = self._walk(last.data['previous'], 'previous')
+        self.assertEqual(backwards[::-1], pages[:-1])
+
+    def test_count_is_opt_in_and_legacy_array_kept(self):
+        response = self.client.get('/requests/', {'scope': 'all', 'page_size': 10, 'with_count': 'true'})
+        self.assertEqual(response.data['count'], 30)
+        self.assertNotIn('with_count', response.data['next'])
+        self.assertNotIn('count', self.client.get('/requests/', {'page_size': 10}).data)
+
+        self.assertIsInstance(self.client.get('/requests/').data, list)
+        with override_settings(LIST_PAGINATION_REQUIRED=True):
+            self.assertEqual(set(self.client.get('/offers/').data), {'next', 'previous', 'results'})
+
+    def test_main_lists_paginate(self):
+        for url in ['/offers/', '/installations/forms/', '/invoices/', '/tasks/', '/users/']:
+            with self.subTest(url=url):
+                response = self.client.get(url, {'page_size': 2})
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(response.data['results']), 2)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/requests/', {'cursor': 'invalide'}).status_code, 404)
+
+
+class SearchTests(TestCase):
+    """`?search=` des listes : sous SQLite, OU de icontains sur les champs du document."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=20, batch_size=20, seed=11).run()
+        cls.admin = User.objects.create_superuser(email='admin-search@example.com', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_lists_filter_on_search_documents(self):
+        form = Form.objects.select_related('client').first()
+        cases = [
+            ('/requests/', {'scope': 'all'}, ProspectRequest.objects.first().last_name.upper()),
+            ('/offers/', {}, Offer.objects.filter(installation_moved_at__isnull=True).first().email),
+            ('/users/', {}, form.client.first_name.lower()),
+            ('/installations/forms/', {}, form.client_address.split(',')[0]),
+            ('/installations/forms/', {}, form.client.email),
+        ]
+        for url, params, term in cases:
+            with self.subTest(url=url, term=term):
+                results = self.client.get(url, {**params, 'search': term}).data
+                everything = self.client.get(url, params).data
+                self.assertGreater(len(results), 0)
+                self.assertLess(len(results), len(everything))
+
+    def test_keyset_pages_are_not_ranked(self):
+        # La pagination impose (created_at, id) : classer par pertinence serait perdu
+        term = ProspectRequest.objects.first().last_name
+        with patch('request.views.search_queryset', wraps=search_queryset) as search:
+            self.client.get('/requests/', {'scope': 'all', 'search': term})
+            self.assertTrue(search.call_args.kwargs['ranked'])
+            response = self.client.get('/requests/', {'scope': 'all', 'search': term, 'page_size': 5})
+            self.assertFalse(search.call_args.kwargs['ranked'])
+
+        expected = search_queryset(
+            ProspectRequest.objects.all(), term, ProspectRequest.SEARCH_FIELDS, ranked=False,
+        ).order_by('-created_at', '-id')
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            [str(pk) for pk in expected.values_list('id', flat=True)[:5]],
+        )
+
+
+class AuditTimelineTests(TestCase):
+    """Timeline utilisateur lue depuis l'index AuditSubject, équivalente à l'ancien OU sur les objets liés."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=40, batch_size=20, seed=13).run()
+        cls.admin = User.objects.create_superuser(email='admin-timeline@example.com', password='secret')
+        busiest = (
+            ProspectRequest.objects.filter(source__isnull=False)
+            .values('source').annotate(total=Count('id')).order_by('-total').first()
+        )
+        cls.source = User.objects.get(pk=busiest['source'])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.url = f'/admin-platform/audit-logs/user-timeline/{self.source.pk}/'
+
+    def _legacy_ids(self, user):
+        requests = ProspectRequest.objects.filter(source=user)
+        related = [
+            (User, [user.pk]),
+            (ProspectRequest, requests.values_list('pk', flat=True)),
+            (Offer, Offer.objects.filter(request__in=requests).values_list('pk', flat=True)),
+            (Quote, Quote.objects.filter(offer__request__in=requests).values_list('pk', flat=True)),
+            (Form, Form.objects.filter(offer__request__in=requests).values_list('pk', flat=True)),
+            (Invoice, Invoice.objects.filter(installation__offer__request__in=requests).values_list('pk', flat=True)),
+        ]
+        query = Q(actor_id=user.pk)
+        for model, pks in related:
+            query |= Q(content_type=ContentType.objects.get_for_model(model), object_pk__in=[str(pk) for pk in pks])
+        return list(LogEntry.objects.filter(query).order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def _walk(self, params):
+        ids, url, data = [], self.url, params
+        while url:
+            response = self.client.get(url, data)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['user']['id'], str(self.source.pk))
+            ids.extend(entry['id'] for entry in response.data['results'])
+            url, data = response.data['next'], None
+        return ids
+
+    def test_timeline_matches_related_objects(self):
+        expected = self._legacy_ids(self.source)
+        self.assertGreater(len(expected), 3)
+        self.assertEqual(sorted(self._walk({'page_size': 3})), sorted(expected))
+        self.assertEqual(self._walk({'cursor': '', 'page_size': 3}), expected)
+        self.assertEqual(self.client.get(self.url).data['count'], len(expected))
+
+    def test_entries_indexed_on_write_including_deletions(self):
+        prospect = ProspectRequest.objects.filter(source=self.source).first()
+        prospect_pk = str(prospect.pk)
+        prospect.first_name = 'Timeline'
+        prospect.save()
+        prospect.delete()
+
+        entries = LogEntry.objects.filter(object_pk=prospect_pk).order_by('timestamp')
+        self.assertGreaterEqual(entries.count(), 2)
+        self.assertEqual(entries.last().action, LogEntry.Action.DELETE)
+        for entry in entries:
+            self.assertTrue(AuditSubject.objects.filter(log_entry=entry, subject_id=self.source.pk).exists())
+
+        rebuilt = rebuild_audit_subjects()
+        self.assertEqual(rebuilt, AuditSubject.objects.count())
+
+
+class AuditSinkTests(TestCase):
+    """Audit écrit dans la transaction par défaut ; regroupement en un INSERT sur option."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=10, batch_size=10, seed=17).run()
+        cls.admin = User.objects.create_superuser(email='admin-sink@example.com', password='secret')
+
+    def _rename(self, prospects, name):
+        for prospect in prospects:
+            prospect.first_name = name
+            prospect.save()
+
+    def _audit_inserts(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "auditlog_logentry"')]
+
+    def _updates(self, prospects):
+        return LogEntry.objects.filter(object_pk__in=[str(p.pk) for p in prospects], action=LogEntry.Action.UPDATE)
+
+    def test_sync_by_default_in_same_transaction(self):
+        prospects = list(ProspectRequest.objects.all()[:2])
+        with self.assertRaises(RuntimeError):
+            with set_actor(self.admin), transaction.atomic():
+                self._rename(prospects, 'Immédiat')
+                # Écrites dans la transaction, avec l'acteur
+                self.assertEqual(set(self._updates(prospects).values_list('actor_id', flat=True)), {self.admin.pk})
+                raise RuntimeError
+        self.assertFalse(self._updates(prospects).exists())
+
+    def test_buffered_block_writes_one_insert(self):
+        prospects = list(ProspectRequest.objects.all()[:5])
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic(), buffered_audit(actor=self.admin, remote_addr='10.0.0.1'):
+                self._rename(prospects, 'Groupé')
+                self.assertFalse(self._updates(prospects).exists())
+
+        self.assertEqual(len(self._audit_inserts(queries.captured_queries)), 1)
+        entries = self._updates(prospects)
+        self.assertEqual(entries.count(), 5)
+        self.assertEqual({(entry.actor_id, entry.remote_addr) for entry in entries}, {(self.admin.pk, '10.0.0.1')})
+        self.assertEqual(entries.first().changes['first_name'][1], 'Groupé')
+        self.assertEqual(AuditSubject.objects.filter(log_entry__in=entries, subject_id=self.admin.pk).count(), 5)
+
+    def test_buffered_entries_follow_the_transaction(self):
+        kept, dropped = list(ProspectRequest.objects.all()[:2])
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                with buffered_audit():
+                    self._rename([dropped], 'Annulé')
+                raise RuntimeError
+        self.assertFalse(self._updates([dropped]).exists())
+
+        # Transaction vouée au rollback : rien n'est écrit
+        with transaction.atomic():
+            with buffered_audit():
+                self._rename([kept], 'Condamné')
+                transaction.set_rollback(True)
+        self.assertFalse(self._updates([kept]).exists())
+
+    def test_buffered_create_delete_and_m2m(self):
+        group = Group.objects.create(name='Audit groupé')
+        with buffered_audit(actor=self.admin):
+            prospect = ProspectRequest.objects.create(
+                last_name='Groupé', first_name='Test', email='groupe@example.com', phone='0600000000',
+                address='1 rue du Soleil',
+            )
+            prospect_pk = str(prospect.pk)
+            prospect.delete()
+            self.admin.groups.add(group)
+
+        actions = set(LogEntry.objects.filter(object_pk=prospect_pk).values_list('action', flat=True))
+        self.assertEqual(actions, {LogEntry.Action.CREATE, LogEntry.Action.DELETE})
+        m2m = LogEntry.objects.filter(object_pk=str(self.admin.pk), changes__groups__operation='add')
+        self.assertEqual(m2m.count(), 1)
+
+    def test_request_buffering_is_opt_in(self):
+        prospect = ProspectRequest.objects.first()
+        client = APIClient()
+        client.cookies['access_token'] = str(RefreshToken.for_user(self.admin).access_token)
+
+        with override_settings(AUDIT_LOG_SINK='buffered'):
+            with CaptureQueriesContext(connection) as queries:
+                response = client.patch(f'/requests/{prospect.pk}/', {'first_name': 'Requête'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self._audit_inserts(queries.captured_queries)), 1)
+        self.assertEqual(self._updates([prospect]).get().actor_id, self.admin.pk)
+
+    def test_celery_sink_serializes_batch(self):
+        prospects = list(ProspectRequest.objects.all()[:3])
+        with patch('admin_platform.tasks.write_audit_entries.delay', side_effect=write_audit_entries) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic(), buffered_audit(actor=self.admin, deferred=True):
+                    self._rename(prospects, 'Celery')
+                self.assertFalse(self._updates(prospects).exists())
+        delay.assert_called_once()
+        entries = self._updates(prospects)
+        self.assertEqual(entries.count(), 3)
+        self.assertEqual(entries.first().changes['first_name'][1], 'Celery')
+
+    def test_celery_unavailable_writes_directly(self):
+        prospect = ProspectRequest.objects.first()
+        with patch('admin_platform.tasks.write_audit_entries.delay', side_effect=ConnectionError):
+            with self.assertLogs('admin_platform.audit_sink', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic(), buffered_audit(deferred=True):
+                    self._rename([prospect], 'Secours')
+        self.assertTrue(self._updates([prospect]).exists())
+
+
+class AuthenticationCacheTests(TestCase):
+    """Une authentification par requête, utilisateur et accès servis par le cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='staff-auth@example.com', password='secret', is_staff=True)
+        UserAccess.objects.create(user=cls.user, requests=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+
+    def _user_lookups(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "users_user"' in q['sql']
+                and '"users_useraccess"' in q['sql']]
+
+    def test_single_lookup_then_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/payments/').status_code, 200)
+        # Middleware d'audit + DRF + permission HasRequestsAccess : une seule lecture jointe
+        self.assertEqual(len(self._user_lookups(queries.captured_queries)), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get('/payments/').status_code, 200)
+        self.assertEqual(self._user_lookups(queries.captured_queries), [])
+        self.assertFalse(any('"users_user"' in q['sql'] for q in queries.captured_queries))
+
+    def test_access_change_invalidates_cache(self):
+        self.assertEqual(self.client.get('/payments/').status_code, 200)
+        access = UserAccess.objects.get(user=self.user)
+        access.requests = False
+        access.save()
+        self.assertEqual(self.client.get('/payments/').status_code, 403)
+
+    def test_inactive_user_rejected(self):
+        self.assertEqual(self.client.get('/payments/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/payments/').status_code, 401)
+
+
+class AccessResolutionTests(TestCase):
+    """Droits compilés (UserAccess | Role) en masque de bits, servis par le cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.role = Role.objects.create(name='Technicien', requests=True)
+        cls.user = User.objects.create_user(
+            email='tech-access@example.com', password='secret', is_staff=True, role='Technicien'
+        )
+        UserAccess.objects.create(user=cls.user, offers=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+
+    def test_user_access_and_role_merged(self):
+        user = User.objects.select_related('useraccess').get(pk=self.user.pk)
+        self.assertEqual(access.access_bits(user), access.REQUESTS | access.OFFERS)
+        self.assertTrue(access.has_access(user, access.REQUESTS))
+        self.assertFalse(access.has_access(user, access.INSTALLATION))
+
+    def test_cached_bits_without_queries(self):
+        access.access_bits(User.objects.select_related('useraccess').get(pk=self.user.pk))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(access.has_access(user, access.OFFERS))
+            self.assertTrue(access.has_access(user, access.REQUESTS))
+
+    def test_role_change_invalidates(self):
+        self.assertEqual(self.client.get('/payments/').status_code, 200)
+        self.role.requests = False
+        self.role.save()
+        self.assertEqual(self.client.get('/payments/').status_code, 403)
+
+    def test_superuser_has_everything(self):
+        admin = User.objects.create_superuser(email='root-access@example.com', password='secret')
+        with self.assertNumQueries(0):
+            self.assertEqual(access.access_bits(admin), access.ALL)
+
+
+class DocumentNumberingTests(TestCase):
+    """Numéros de devis / factures attribués par compteur verrouillé, sans trou."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=5, batch_size=5, seed=23).run()
+        cls.offer = Offer.objects.first()
+        cls.year = timezone.now().year
+
+    def _new_quote(self):
+        version = (Quote.objects.filter(offer=self.offer).order_by('-version').values_list('version', flat=True).first() or 0) + 1
+        return Quote.objects.create(offer=self.offer, version=version)
+
+    def test_sequential_numbers_in_constant_queries(self):
+        first = self._new_quote()
+        self.assertEqual(first.number, f'D-{self.year}-0001')
+        self.assertEqual(self._new_quote().number, f'D-{self.year}-0002')
+        with self.assertNumQueries(4):
+            # SAVEPOINT, SELECT ... FOR UPDATE du compteur, UPDATE, RELEASE
+            self.assertEqual(next_document_number(QUOTE_SERIES), f'D-{self.year}-0003')
+
+    def test_counter_starts_after_existing_numbers(self):
+        Quote.objects.filter(pk=self._new_quote().pk).update(number=f'D-{self.year}-0041')
+        DocumentCounter.objects.all().delete()
+        self.assertEqual(next_document_number(QUOTE_SERIES), f'D-{self.year}-0042')
+        self.assertEqual(next_document_number(INVOICE_SERIES), f'F-{self.year}-0001')
+
+    def test_rolled_back_creation_keeps_number(self):
+        self._new_quote()
+        try:
+            with transaction.atomic():
+                self._new_quote()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(self._new_quote().number, f'D-{self.year}-0002')
+
+
+class PaidTotalsTests(TestCase):
+    """Montants payés stockés sur factures et échéances, tenus à jour par les paiements."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=20, batch_size=20, seed=29).run()
+        cls.admin = User.objects.create_superuser(email='admin-paid@example.com', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.installment = Installment.objects.filter(is_paid=False, amount__gt=0).select_related('invoice').first()
+        self.invoice = self.installment.invoice
+
+    def test_synthetic_data_consistent(self):
+        self.assertEqual(reconcile_paid_totals(dry_run=True), (0, 0))
+
+    def test_payment_create_update_delete(self):
+        paid_before = self.invoice.paid_total
+        response = self.client.post('/payments/', {
+            'invoice': str(self.invoice.pk), 'installment': str(self.installment.pk),
+            'amount': str(self.installment.amount), 'method': 'virement',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.installment.refresh_from_db()
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.installment.paid_total, self.installment.amount)
+        self.assertTrue(self.installment.is_paid)
+        self.assertEqual(self.invoice.paid_total, paid_before + self.installment.amount)
+
+        response = self.client.patch(f"/payments/{response.data['id']}/", {'amount': '1.00'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.installment.refresh_from_db()
+        self.assertEqual(self.installment.paid_total, Decimal('1.00'))
+        self.assertFalse(self.installment.is_paid)
+
+        self.assertEqual(self.client.delete(f"/payments/{response.data['id']}/").status_code, 204)
+        self.invoice.refresh_from_db()
+        self.installment.refresh_from_db()
+        self.assertEqual(self.invoice.paid_total, paid_before)
+        self.assertEqual(self.installment.paid_total, 0)
+
+    def test_balance_without_queries(self):
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(invoice.balance_due, invoice.total - invoice.paid_total)
+
+    def test_reconcile_fixes_drift(self):
+        Invoice.objects.filter(pk=self.invoice.pk).update(paid_total=Decimal('123.45'))
+        self.assertEqual(reconcile_paid_totals(), (1, 0))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.paid_total, sum(p.amount for p in self.invoice.payments.all()))
+
+    def test_stale_instance_does_not_overwrite_locked_invoice(self):
+        stale = Invoice.objects.get(pk=self.invoice.pk)
+        # Total revu ailleurs : le paiement solde désormais la facture
+        new_total = self.invoice.paid_total + Decimal('100.00')
+        Invoice.objects.filter(pk=self.invoice.pk).update(total=new_total)
+
+        with patch('invoices.tasks.generate_invoice_pdf.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                Payment.objects.create(invoice=stale, amount=Decimal('100.00'))
+
+        delay.assert_called_once_with(str(self.invoice.pk))
+        self.invoice.refresh_from_db()
+        self.assertEqual((self.invoice.total, self.invoice.status), (new_total, Invoice.Status.PAID))
+        # Valeurs recalculées recopiées sur l'instance en mémoire
+        self.assertEqual((stale.paid_total, stale.status), (new_total, Invoice.Status.PAID))
+        self.assertEqual(stale.pdf_status, Invoice.PdfStatus.PENDING)
+
+    def test_reconcile_fixes_status_is_paid_and_schedules_pdf(self):
+        Payment.objects.bulk_create([
+            Payment(invoice=self.invoice, installment=self.installment, amount=self.installment.amount),
+            Payment(invoice=self.invoice, amount=self.invoice.balance_due - self.installment.amount),
+        ])
+        self.assertEqual(reconcile_paid_totals(dry_run=True), (1, 1))
+
+        with patch('invoices.tasks.generate_invoice_pdf.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(reconcile_paid_totals(), (1, 1))
+        delay.assert_called_once_with(str(self.invoice.pk))
+
+        self.invoice.refresh_from_db()
+        self.installment.refresh_from_db()
+        self.assertEqual(self.invoice.paid_total, self.invoice.total)
+        self.assertEqual(self.invoice.status, Invoice.Status.PAID)
+        self.assertEqual(self.invoice.pdf_status, Invoice.PdfStatus.PENDING)
+        self.assertTrue(self.installment.is_paid)
+        self.assertEqual(reconcile_paid_totals(dry_run=True), (0, 0))
+
+        # Statut seul incohérent (paid_total juste)
+        Invoice.objects.filter(pk=self.invoice.pk).update(status=Invoice.Status.PARTIALLY_PAID)
+        Installment.objects.filter(pk=self.installment.pk).update(is_paid=False)
+        self.assertEqual(reconcile_paid_totals(), (1, 1))
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, Invoice.Status.PAID)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class InvoicePdfTests(TestCase):
+    """PDF de facture généré en arrière-plan quand un paiement solde la facture."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=20, batch_size=20, seed=31).run()
+        cls.admin = User.objects.create_superuser(email='admin-pdf@example.com', password='secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.invoice = Invoice.objects.filter(paid_total__lt=F('total'), pdf='').first()
+
+    def _settle(self):
+        with patch('invoices.tasks.generate_invoice_pdf.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/payments/', {
+                    'invoice': str(self.invoice.pk), 'amount': str(self.invoice.balance_due), 'method': 'virement',
+                }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.invoice.refresh_from_db()
+        return delay
+
+    def test_settling_payment_enqueues_pdf(self):
+        with patch('invoices.pdf.render_invoice_pdf') as render:
+            delay = self._settle()
+        render.assert_not_called()
+        delay.assert_called_once_with(str(self.invoice.pk))
+        self.assertEqual(self.invoice.pdf_status, Invoice.PdfStatus.PENDING)
+        self.assertEqual(self.invoice.status, Invoice.Status.PAID)
+
+    def test_task_is_idempotent(self):
+        self._settle()
+        with patch('invoices.pdf.render_invoice_pdf', return_value=b'%PDF-1.4') as render:
+            self.assertEqual(generate_invoice_pdf.apply(args=[str(self.invoice.pk)]).get()['status'], 'ready')
+            generate_invoice_pdf.apply(args=[str(self.invoice.pk)])
+        render.assert_called_once()
+        self.invoice.refresh_from_db()
+        self.assertTrue(self.invoice.pdf)
+        self.assertEqual(self.invoice.pdf_status, Invoice.PdfStatus.READY)
+
+    @override_settings(INVOICE_PDF_MAX_RETRIES=1)
+    def test_failures_retried_then_marked(self):
+        self._settle()
+        with patch('invoices.pdf.render_invoice_pdf', side_effect=RuntimeError('chromium')) as render:
+            generate_invoice_pdf.apply(args=[str(self.invoice.pk)])
+        self.assertEqual(render.call_count, 2)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.pdf_status, Invoice.PdfStatus.FAILED)
+        self.assertIn('chromium', self.invoice.pdf_error)
+
+
+class QuoteVersioningTests(TestCase):
+    """Nouvelle version de devis : lignes clonées en un INSERT, totaux agrégés, drapeau is_latest."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=20, batch_size=20, seed=37).run()
+
+    def setUp(self):
+        self.previous = Quote.objects.filter(is_latest=True).annotate(n=Count('lines')).filter(n__gt=1).first()
+
+    def test_synthetic_flags_consistent(self):
+        latest = Quote.objects.filter(is_latest=True)
+        self.assertEqual(latest.count(), Offer.objects.filter(quotes__isnull=False).distinct().count())
+        for quote in latest:
+            self.assertFalse(Quote.objects.filter(offer_id=quote.offer_id, version__gt=quote.version).exists())
+
+    def test_new_version_clones_lines_in_bulk(self):
+        with CaptureQueriesContext(connection) as queries:
+            new_quote = _create_quote_new_version(self.previous, {})
+        line_inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "billing_quote_line"')]
+        self.assertEqual(len(line_inserts), 1)
+
+        self.assertEqual(new_quote.version, self.previous.version + 1)
+        self.assertEqual(new_quote.lines.count(), self.previous.lines.count())
+        self.assertEqual(new_quote.subtotal, sum(line.line_total for line in self.previous.lines.all()))
+        self.assertTrue(new_quote.is_latest)
+        self.previous.refresh_from_db()
+        self.assertFalse(self.previous.is_latest)
+
+    def test_deleting_latest_promotes_previous(self):
+        new_quote = _create_quote_new_version(self.previous, {'lines': [
+            {'name': 'Panneau', 'product_type': 'panel', 'unit_price': '100', 'quantity': '3', 'discount_rate': '10'},
+        ]})
+        self.assertEqual(new_quote.subtotal, Decimal('270.00'))
+        new_quote.delete()
+        self.previous.refresh_from_db()
+        self.assertTrue(self.previous.is_latest)
+
+
+class SparseFieldsetsTests(TestCase):
+    """?fields= / ?expand= des fiches d'installation, offres et demandes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        SyntheticDataGenerator(requests=20, batch_size=20, seed=41).run()
+        cls.admin = User.objects.create_superuser(email='admin-fields@example.com', password='secret')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_default_representation_unchanged(self):
+        rows = self.client.get('/requests/', {'scope': 'all'}).json()
+        self.assertIn('assigned_to', rows[0])
+        self.assertIn('offer', rows[0])
+        form = self.client.get('/installations/forms/').json()[0]
+        self.assertNotIn('technical_visit', form)
+        self.assertIn('client', form)
+
+    def test_fields_restricts_keys(self):
+        for url, params in [('/requests/', {'scope': 'all'}), ('/offers/', {}), ('/installations/forms/', {})]:
+            rows = self.client.get(url, {**params, 'fields': 'status,created_at'}).json()
+            self.assertTrue(rows)
+            self.assertEqual({tuple(sorted(row)) for row in rows}, {('created_at', 'id', 'status')})
+
+    def test_fields_skip_relations(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/installations/forms/', {'fields': 'id,status'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries.captured_queries[0]['sql'])
+
+    def test_expand_matches_detail(self):
+        form = Form.objects.filter(technical_visit__isnull=False).first()
+        rows = self.client.get('/installations/forms/', {'expand': 'technical_visit,quotes', 'fields': 'technical_visit,quotes'}).json()
+        row = next(row for row in rows if row['id'] == str(form.pk))
+        detail = self.client.get(f'/installations/forms/{form.pk}/').json()
+        self.assertEqual(row['technical_visit'], detail['technical_visit'])
+        self.assertEqual(row['quotes'], detail['quotes'])
+
+    def test_writes_ignore_fields(self):
+        offer = Offer.objects.filter(installation_moved_at__isnull=True, returned_to_request_at__isnull=True).first()
+        response = self.client.patch(f'/offers/{offer.pk}/?fields=id', {'status': offer.status}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('last_quote', response.json())
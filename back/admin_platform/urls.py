@@ -6,13 +6,14 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import EmailLogViewSet, AuditLogViewSet
 from .dashboard_views import DashboardViewSet
-from .reports_views import ReportsViewSet
+from .reports_views import ReportsViewSet, ReportJobViewSet
 
 router = DefaultRouter()
 router.register(r'email-logs', EmailLogViewSet, basename='email-log')
 router.register(r'audit-logs', AuditLogViewSet, basename='audit-log')
 router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 router.register(r'reports', ReportsViewSet, basename='reports')
+router.register(r'report-jobs', ReportJobViewSet, basename='report-job')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -2,6 +2,7 @@
 Vues pour l'application admin_platform.
 """
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from rest_framework import viewsets, permissions, filters, status
@@ -10,7 +11,8 @@ from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 from auditlog.models import LogEntry
-from .models import EmailLog
+from EuropGreenSolar.pagination import KeysetPagination
+from .models import AuditSubject, EmailLog
 from .serializers import EmailLogSerializer, AuditLogSerializer
 
 
@@ -24,6 +26,18 @@ class TimelinePagination(PageNumberPagination):
     max_page_size = 100
 
 
+class TimelineKeysetPagination(KeysetPagination):
+    """
+    Pagination par curseur de la timeline (?cursor=), sur (timestamp, entrée)
+    des rattachements AuditSubject : coût constant quelle que soit la page.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering_fields = ('timestamp', 'log_entry_id')
+    tie_type = int
+    always_paginate = True
+
+
 @extend_schema_view(
     list=extend_schema(
         summary="Liste des logs d'emails", 
@@ -211,7 +225,11 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     
     @extend_schema(
         summary="Timeline complète d'un utilisateur",
-        description="Récupère tous les logs liés à un utilisateur : user lui-même, ses demandes, offres, devis, installations, factures, etc. Paginé (20 items par page).",
+        description=(
+            "Récupère tous les logs liés à un utilisateur : user lui-même, ses demandes, offres, devis, "
+            "installations, factures, etc. Paginé (20 items par page) : par numéro de page (?page=, avec count) "
+            "ou par curseur (?cursor=, vide pour la première page)."
+        ),
         parameters=[
             OpenApiParameter(
                 name='user_id',
@@ -227,6 +245,13 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
                 type=int,
                 location=OpenApiParameter.QUERY
             ),
+            OpenApiParameter(
+                name='cursor',
+                description='Curseur de page (liens next / previous), prioritaire sur page',
+                required=False,
+                type=str,
+                location=OpenApiParameter.QUERY
+            ),
         ]
     )
     @action(detail=False, methods=['get'], url_path='user-timeline/(?P<user_id>[^/.]+)')
@@ -243,87 +268,41 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
         6. Ses factures (Invoice liées aux installations)
         7. TOUS les logs où il est l'acteur (peu importe l'objet)
         
+        Les rattachements sont calculés à l'écriture des logs (AuditSubject,
+        voir `admin_platform.audit_subjects`) : la lecture parcourt l'index
+        (subject_id, timestamp).
+        
         GET /api/admin-platform/audit-logs/user-timeline/{user_id}/?page=1
+        GET /api/admin-platform/audit-logs/user-timeline/{user_id}/?cursor=
         
-        Retourne une réponse paginée avec count, next, previous, results.
+        Retourne une réponse paginée avec count (pagination par page), next, previous, results.
         """
         # Activer la pagination pour cette action uniquement
-        self.pagination_class = TimelinePagination
+        if 'cursor' in request.query_params:
+            self.pagination_class = TimelineKeysetPagination
+        else:
+            self.pagination_class = TimelinePagination
         
         from users.models import User
-        from request.models import ProspectRequest
-        from offers.models import Offer
-        from billing.models import Quote
-        from installations.models import Form
-        from invoices.models import Invoice
         
         try:
             user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        except (User.DoesNotExist, ValueError, ValidationError):
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Content types
-        user_ct = ContentType.objects.get_for_model(User)
-        request_ct = ContentType.objects.get_for_model(ProspectRequest)
-        offer_ct = ContentType.objects.get_for_model(Offer)
-        quote_ct = ContentType.objects.get_for_model(Quote)
-        form_ct = ContentType.objects.get_for_model(Form)
-        invoice_ct = ContentType.objects.get_for_model(Invoice)
-        
-        # Récupérer tous les objets liés à l'utilisateur
-        requests = ProspectRequest.objects.filter(source=user)
-        offers = Offer.objects.filter(request__in=requests)
-        quotes = Quote.objects.filter(offer__in=offers)
-        forms = Form.objects.filter(offer__in=offers)
-        invoices = Invoice.objects.filter(installation__in=forms)
-        
-        # Convertir les IDs en strings (auditlog stocke object_pk en string)
-        request_pks = [str(r.pk) for r in requests] if requests.exists() else []
-        offer_pks = [str(o.pk) for o in offers] if offers.exists() else []
-        quote_pks = [str(q.pk) for q in quotes] if quotes.exists() else []
-        form_pks = [str(f.pk) for f in forms] if forms.exists() else []
-        invoice_pks = [str(i.pk) for i in invoices] if invoices.exists() else []
-        
-        # Construire la requête de logs
-        # IMPORTANT: Inclure TOUS les logs où user est acteur + objets liés
-        query = models.Q(actor_id=user.id)  # Tous les logs où il est acteur
-        query |= models.Q(content_type=user_ct, object_pk=str(user.pk))  # User lui-même
-        
-        if request_pks:
-            query |= models.Q(content_type=request_ct, object_pk__in=request_pks)
-        if offer_pks:
-            query |= models.Q(content_type=offer_ct, object_pk__in=offer_pks)
-        if quote_pks:
-            query |= models.Q(content_type=quote_ct, object_pk__in=quote_pks)
-        if form_pks:
-            query |= models.Q(content_type=form_ct, object_pk__in=form_pks)
-        if invoice_pks:
-            query |= models.Q(content_type=invoice_ct, object_pk__in=invoice_pks)
-        
-        logs = LogEntry.objects.filter(query).select_related('actor', 'content_type').order_by('-timestamp')
-        
-        # Appliquer la pagination
-        page = self.paginate_queryset(logs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            response = self.get_paginated_response(serializer.data)
-            # Ajouter les infos utilisateur à la réponse paginée
-            response.data['user'] = {
-                'id': str(user.id),
-                'email': user.email,
-                'full_name': user.get_full_name(),
-            }
-            return response
-        
-        # Fallback sans pagination (ne devrait pas arriver)
-        serializer = self.get_serializer(logs, many=True)
-        return Response({
-            'user': {
-                'id': str(user.id),
-                'email': user.email,
-                'full_name': user.get_full_name(),
-            },
-            'logs': serializer.data,
-            'count': logs.count(),
-        })
+        subjects = (
+            AuditSubject.objects.filter(subject_id=user.id)
+            .select_related('log_entry__actor', 'log_entry__content_type')
+            .order_by('-timestamp', '-log_entry_id')
+        )
+        page = self.paginate_queryset(subjects)
+        serializer = self.get_serializer([subject.log_entry for subject in page], many=True)
+        response = self.get_paginated_response(serializer.data)
+        # Ajouter les infos utilisateur à la réponse paginée
+        response.data['user'] = {
+            'id': str(user.id),
+            'email': user.email,
+            'full_name': user.get_full_name(),
+        }
+        return response
 
@@ -0,0 +1,127 @@
+"""
+Droits d'accès compilés des utilisateurs (permissions `Has*Access`).
+
+Les droits d'un utilisateur fusionnent (OU) les indicateurs de son UserAccess
+et ceux du Role dynamique portant le nom de son `role`, sous forme d'un masque
+de bits :
+
+    REQUESTS | OFFERS | INSTALLATION | ADMINISTRATIVE
+
+Le masque est mis en cache par utilisateur, avec deux numéros de version dans
+la clé : celui de l'utilisateur (voir `user_cache`, incrémenté à chaque
+modification du User ou de son UserAccess) et une génération commune aux
+rôles, incrémentée à chaque modification d'un Role. Il est aussi mémorisé sur
+l'instance User : plusieurs contrôles dans une même requête ne coûtent rien.
+
+Un superutilisateur a tous les droits.
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+
+from users.models import Role, UserAccess
+
+from .user_cache import version_key, cache_timeout
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'auth_access'
+ROLES_GENERATION_KEY = f'{CACHE_PREFIX}:roles_generation'
+
+REQUESTS = 1
+OFFERS = 2
+INSTALLATION = 4
+ADMINISTRATIVE = 8
+ALL = REQUESTS | OFFERS | INSTALLATION | ADMINISTRATIVE
+
+# Bit -> champ booléen de UserAccess / Role
+ACCESS_FIELDS = {
+    REQUESTS: 'requests',
+    OFFERS: 'offers',
+    INSTALLATION: 'installation',
+    ADMINISTRATIVE: 'administrative_procedures',
+}
+
+_MEMO_ATTRIBUTE = '_access_bits'
+
+
+def bits_of(obj):
+    """Masque des indicateurs d'un UserAccess ou d'un Role (0 si None)."""
+    if obj is None:
+        return 0
+    return sum(bit for bit, field in ACCESS_FIELDS.items() if getattr(obj, field, False))
+
+
+def _roles_generation():
+    generation = cache.get(ROLES_GENERATION_KEY)
+    if generation is None:
+        cache.add(ROLES_GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(ROLES_GENERATION_KEY)
+    return generation
+
+
+def role_bits(generation):
+    """{nom du rôle: masque}, en cache pour la génération de rôles donnée."""
+    key = f'{CACHE_PREFIX}:roles:{generation}'
+    roles = cache.get(key)
+    if roles is None:
+        roles = {role.name: bits_of(role) for role in Role.objects.all()}
+        cache.set(key, roles, None)
+    return roles
+
+
+def compile_access(user, generation=None):
+    """Masque de `user` calculé depuis son UserAccess et son Role (sans cache utilisateur)."""
+    try:
+        access = user.useraccess
+    except UserAccess.DoesNotExist:
+        access = None
+    if generation is None:
+        generation = _roles_generation()
+    return bits_of(access) | role_bits(generation).get(user.role, 0)
+
+
+def access_bits(user):
+    """Masque des droits de `user` (tous les bits pour un superutilisateur, 0 si anonyme)."""
+    if not getattr(user, 'is_authenticated', False):
+        return 0
+    if user.is_superuser:
+        return ALL
+    bits = getattr(user, _MEMO_ATTRIBUTE, None)
+    if bits is not None:
+        return bits
+
+    timeout = cache_timeout()
+    if timeout <= 0:
+        bits = compile_access(user)
+    else:
+        versions = cache.get_many([version_key(user.pk), ROLES_GENERATION_KEY])
+        generation = versions.get(ROLES_GENERATION_KEY)
+        if generation is None:
+            generation = _roles_generation()
+        key = f'{CACHE_PREFIX}:{user.pk}:{versions.get(version_key(user.pk), 0)}:{generation}'
+        bits = cache.get(key)
+        if bits is None:
+            bits = compile_access(user, generation)
+            cache.set(key, bits, timeout)
+
+    setattr(user, _MEMO_ATTRIBUTE, bits)
+    return bits
+
+
+def has_access(user, bit):
+    """`user` dispose-t-il du droit `bit` (ex : access.OFFERS) ?"""
+    return bool(access_bits(user) & bit)
+
+
+def invalidate_roles_cache():
+    """Invalide les masques de tous les utilisateurs (rôle créé, modifié ou supprimé)."""
+    try:
+        cache.incr(ROLES_GENERATION_KEY)
+    except ValueError:
+        # Clé absente : une nouvelle génération sera créée au prochain accès
+        pass
+    except Exception as e:
+        logger.warning("Invalidation du cache des rôles impossible: %s", e)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        """Connecte l'invalidation du cache des utilisateurs authentifiés"""
+        import authentication.signals  # noqa
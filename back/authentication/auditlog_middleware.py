@@ -7,6 +7,8 @@ car il cherche request.user qui n'est défini que par DRF dans les vues API.
 Ce middleware définit explicitement l'actor pour auditlog en utilisant set_actor.
 """
 from auditlog.context import set_actor
+from rest_framework.exceptions import AuthenticationFailed
+
 from authentication.auth_method import CookieJWTAuthentication
 
 
@@ -22,8 +24,12 @@ class AuditlogActorMiddleware:
         self.auth = CookieJWTAuthentication()
     
     def __call__(self, request):
-        # Essayer d'authentifier via JWT cookie
-        auth_result = self.auth.authenticate(request)
+        # Essayer d'authentifier via JWT cookie (résultat réutilisé ensuite par DRF)
+        try:
+            auth_result = self.auth.authenticate(request)
+        except AuthenticationFailed:
+            # Utilisateur inactif / introuvable : DRF renverra l'erreur (401)
+            auth_result = None
         
         if auth_result:
             user, _ = auth_result
@@ -1,9 +1,68 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-    
-class CookieJWTAuthentication(JWTAuthentication):
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.models import User
+
+from .user_cache import load_user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication dont l'utilisateur (avec son UserAccess) est lu via le
+    cache court de `user_cache`, par identifiant et `jti` du jeton.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = load_user(user_id, validated_token.get(api_settings.JTI_CLAIM))
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        # Contrôles de simplejwt, refaits à chaque requête sur l'utilisateur en cache
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class CookieJWTAuthentication(CachedJWTAuthentication):
+    """
+    Authentification par le cookie `access_token`.
+
+    Le résultat (ou l'échec AuthenticationFailed) est mémorisé sur la requête
+    HTTP : AuditlogActorMiddleware puis DRF partagent une seule authentification
+    par requête.
+    """
+
+    request_attribute = '_cookie_jwt_auth'
 
     def authenticate(self, request):
+        # Request DRF -> HttpRequest sous-jacente, partagée avec les middlewares
+        http_request = getattr(request, '_request', request)
+        if not hasattr(http_request, self.request_attribute):
+            try:
+                result = self.authenticate_cookie(request)
+            except AuthenticationFailed as exc:
+                result = exc
+            setattr(http_request, self.request_attribute, result)
+        result = getattr(http_request, self.request_attribute)
+        if isinstance(result, AuthenticationFailed):
+            raise result
+        return result
+
+    def authenticate_cookie(self, request):
         access_token = request.COOKIES.get('access_token')
         if not access_token:
             return None
@@ -1,5 +1,8 @@
 from rest_framework import permissions
 
+from . import access
+from .access import has_access
+
 class IsAdmin(permissions.BasePermission):
     """
     Permission personnalisée pour vérifier que l'utilisateur est un administrateur.
@@ -35,11 +38,8 @@ class HasRequestsAccess(permissions.BasePermission):
         user = request.user
         if not user.is_authenticated:
             return False
-        # Autorise si l'utilisateur a l'accès requests ou est superuser
-        try:
-            return bool(getattr(user.useraccess, 'requests', False)) or bool(user.is_superuser)
-        except Exception:
-            return bool(user.is_superuser)
+        # Autorise si l'utilisateur a l'accès requests (UserAccess ou rôle) ou est superuser
+        return has_access(user, access.REQUESTS)
 
 class HasOfferAccess(permissions.BasePermission):
     """
@@ -50,11 +50,8 @@ class HasOfferAccess(permissions.BasePermission):
         user = request.user
         if not user.is_authenticated:
             return False
-        # Autorise si l'utilisateur a l'accès offers ou est superuser
-        try:
-            return bool(getattr(user.useraccess, 'offers', False)) or bool(user.is_superuser)
-        except Exception:
-            return bool(user.is_superuser)
+        # Autorise si l'utilisateur a l'accès offers (UserAccess ou rôle) ou est superuser
+        return has_access(user, access.OFFERS)
 
 class HasInstallationAccess(permissions.BasePermission):
     """
@@ -65,11 +62,8 @@ class HasInstallationAccess(permissions.BasePermission):
         user = request.user
         if not user.is_authenticated:
             return False
-        # Autorise si l'utilisateur a l'accès installations ou est superuser
-        try:
-            return bool(getattr(user.useraccess, 'installation', False)) or bool(user.is_superuser)
-        except Exception:
-            return bool(user.is_superuser)
+        # Autorise si l'utilisateur a l'accès installations (UserAccess ou rôle) ou est superuser
+        return has_access(user, access.INSTALLATION)
         
 class HasAdministrativeAccess(permissions.BasePermission):
     """
@@ -80,8 +74,5 @@ class HasAdministrativeAccess(permissions.BasePermission):
         user = request.user
         if not user.is_authenticated:
             return False
-        # Autorise si l'utilisateur a l'accès administrative ou est superuser
-        try:
-            return bool(getattr(user.useraccess, 'administrative_procedures', False)) or bool(user.is_superuser)
-        except Exception:
-            return bool(user.is_superuser)
\ No newline at end of file
+        # Autorise si l'utilisateur a l'accès administrative (UserAccess ou rôle) ou est superuser
+        return has_access(user, access.ADMINISTRATIVE)
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Invalidation du cache des utilisateurs authentifiés (voir `user_cache`) et
+de leurs droits compilés (voir `access`).
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import Role, User, UserAccess
+
+from .access import invalidate_roles_cache
+from .user_cache import invalidate_user_cache
+
+
+@receiver(post_save, sender=User, dispatch_uid='auth_user_cache_user_saved')
+@receiver(post_delete, sender=User, dispatch_uid='auth_user_cache_user_deleted')
+def invalidate_user_on_change(sender, instance, **kwargs):
+    """Utilisateur modifié (mot de passe, is_active, droits...) ou supprimé."""
+    invalidate_user_cache(instance.pk)
+    # Une requête concurrente a pu remettre l'ancienne version en cache avant le commit
+    transaction.on_commit(lambda: invalidate_user_cache(instance.pk))
+
+
+@receiver(post_save, sender=UserAccess, dispatch_uid='auth_user_cache_access_saved')
+@receiver(post_delete, sender=UserAccess, dispatch_uid='auth_user_cache_access_deleted')
+def invalidate_user_on_access_change(sender, instance, **kwargs):
+    """Accès de l'utilisateur modifiés."""
+    invalidate_user_cache(instance.user_id)
+    transaction.on_commit(lambda: invalidate_user_cache(instance.user_id))
+
+
+@receiver(post_save, sender=Role, dispatch_uid='auth_access_role_saved')
+@receiver(post_delete, sender=Role, dispatch_uid='auth_access_role_deleted')
+def invalidate_access_on_role_change(sender, **kwargs):
+    """Rôle créé, modifié ou supprimé : droits de tous les utilisateurs recompilés."""
+    invalidate_roles_cache()
+    transaction.on_commit(invalidate_roles_cache)
@@ -0,0 +1,67 @@
+"""
+Cache court des utilisateurs authentifiés.
+
+L'utilisateur d'un jeton d'accès est chargé avec son UserAccess
+(`select_related`) puis mis en cache, par identifiant et par `jti` du jeton,
+pendant AUTH_USER_CACHE_TIMEOUT secondes : les requêtes suivantes portant le
+même jeton ne touchent plus la base, permissions `Has*Access` comprises.
+
+Chaque utilisateur a un numéro de version inclus dans la clé. Les signaux de
+`authentication.signals` l'incrémentent à chaque modification de l'utilisateur
+ou de ses accès, ce qui invalide toutes ses entrées. Les modifications faites
+sans signal (`QuerySet.update`) restent visibles au plus tard à l'expiration.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'auth_user'
+
+
+def version_key(user_id):
+    return f'{CACHE_PREFIX}:version:{user_id}'
+
+
+def _user_key(user_id, jti):
+    version = cache.get(version_key(user_id), 0)
+    return f'{CACHE_PREFIX}:{user_id}:{version}:{jti}'
+
+
+def cache_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def load_user(user_id, jti=None):
+    """
+    Utilisateur `user_id` avec son UserAccess, depuis le cache si possible.
+
+    Sans `jti` (jeton sans identifiant) ou avec un délai nul, lecture directe.
+    Lève User.DoesNotExist si l'utilisateur n'existe pas.
+    """
+    if not jti or cache_timeout() <= 0:
+        return User.objects.select_related('useraccess').get(pk=user_id)
+    key = _user_key(user_id, jti)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.select_related('useraccess').get(pk=user_id)
+        cache.set(key, user, cache_timeout())
+    return user
+
+
+def invalidate_user_cache(user_id):
+    """Invalide les entrées en cache de l'utilisateur `user_id`."""
+    key = version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Version absente (0 implicite) : valeur unique pour ne pas retomber sur une ancienne
+        cache.set(key, time.time_ns(), None)
+    except Exception as e:
+        logger.warning("Invalidation du cache utilisateur impossible: %s", e)
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('series', models.CharField(max_length=8)),
+                ('year', models.PositiveIntegerField()),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Compteur de numérotation',
+                'verbose_name_plural': 'Compteurs de numérotation',
+                'db_table': 'billing_document_counter',
+                'constraints': [models.UniqueConstraint(fields=('series', 'year'), name='uq_document_counter_series_year')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_latest_versions(apps, schema_editor):
+    Quote = apps.get_model('billing', 'Quote')
+    newer = Quote.objects.filter(offer=models.OuterRef('offer'), version__gt=models.OuterRef('version'))
+    Quote.objects.filter(models.Exists(newer)).update(is_latest=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_document_counter'),
+        ('offers', '0004_offer_search_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='is_latest',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(flag_latest_versions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='quote',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_latest', True)), fields=('offer',), name='uq_quote_offer_latest'),
+        ),
+    ]
@@ -1,6 +1,5 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
-from django.utils import timezone
 from decimal import Decimal
 import uuid
 
@@ -36,6 +35,26 @@ class Product(models.Model):
 		return f"{self.name} ({self.get_type_display()})"
 
 
+class DocumentCounter(models.Model):
+	"""Dernier numéro attribué d'une série de documents pour une année (voir billing.numbering)."""
+
+	series = models.CharField(max_length=8)
+	year = models.PositiveIntegerField()
+	last_value = models.PositiveIntegerField(default=0)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	class Meta:
+		db_table = "billing_document_counter"
+		verbose_name = "Compteur de numérotation"
+		verbose_name_plural = "Compteurs de numérotation"
+		constraints = [
+			models.UniqueConstraint(fields=["series", "year"], name="uq_document_counter_series_year"),
+		]
+
+	def __str__(self) -> str:
+		return f"{self.series}-{self.year} : {self.last_value}"
+
+
 class Quote(models.Model):
 
 	class Status(models.TextChoices):
@@ -53,6 +72,8 @@ class Quote(models.Model):
 	predecessor = models.ForeignKey(
 		"self", on_delete=models.SET_NULL, null=True, blank=True, related_name="next_versions"
 	)
+	# Dernière version de l'offre, tenu à jour à la création / suppression d'une version
+	is_latest = models.BooleanField(default=True, editable=False)
 
 	status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT)
 	title = models.CharField(max_length=255, blank=True)
@@ -88,16 +109,12 @@ class Quote(models.Model):
 		verbose_name_plural = "Devis"
 		constraints = [
 			models.UniqueConstraint(fields=["offer", "version"], name="uq_quote_offer_version"),
+			models.UniqueConstraint(fields=["offer"], condition=models.Q(is_latest=True), name="uq_quote_offer_latest"),
 		]
 
 	def __str__(self) -> str:
 		return f"Devis {self.number} - {self.get_status_display()}"
 
-	@property
-	def is_latest(self) -> bool:
-		latest = Quote.objects.filter(offer=self.offer).order_by("-version").values_list("version", flat=True).first()
-		return latest == self.version if latest is not None else True
-
 	def clean(self):
 		# S'assurer que le prédécesseur appartient à la même offre
 		if self.predecessor and self.predecessor.offer_id != self.offer_id:
@@ -115,18 +132,40 @@ class Quote(models.Model):
 				Quote.objects.filter(offer=self.offer).order_by("-version").values_list("version", flat=True).first()
 			)
 			self.version = (last_version or 0) + 1
-		# Générer un numéro unique si manquant: D-YYYY-####
-		if not self.number:
-			year = timezone.now().year
-			base = f"D-{year}-"
-			seq = 1
-			while True:
-				candidate = f"{base}{seq:04d}"
-				if not Quote.objects.filter(number=candidate).exists():
-					self.number = candidate
-					break
-				seq += 1
-		super().save(*args, **kwargs)
+		if not self._state.adding:
+			super().save(*args, **kwargs)
+			return
+		with transaction.atomic(using=kwargs.get("using")):
+			# Générer un numéro unique si manquant: D-YYYY-####
+			if not self.number:
+				from .numbering import QUOTE_SERIES, next_document_number
+
+				# Compteur verrouillé jusqu'au commit : pas de trou si l'insertion échoue
+				self.number = next_document_number(QUOTE_SERIES, using=kwargs.get("using"))
+			# Nouvelle dernière version : le drapeau quitte la version précédente
+			others = Quote.objects.filter(offer_id=self.offer_id)
+			self.is_latest = not others.filter(version__gt=self.version).exists()
+			if self.is_latest:
+				others.filter(is_latest=True).update(is_latest=False)
+			super().save(*args, **kwargs)
+
+	def delete(self, *args, **kwargs):
+		with transaction.atomic():
+			result = super().delete(*args, **kwargs)
+			if self.is_latest:
+				# La version précédente redevient la dernière
+				previous = Quote.objects.filter(offer_id=self.offer_id).order_by("-version").values_list("pk", flat=True)[:1]
+				Quote.objects.filter(pk__in=list(previous)).update(is_latest=True)
+		return result
+
+	def recalculate_totals(self):
+		"""Sous-total (somme des lignes, une agrégation SQL) et total TTC, enregistrés."""
+		subtotal = self.lines.aggregate(s=models.Sum("line_total"))["s"] or Decimal("0")
+		self.subtotal = subtotal.quantize(Decimal("0.01"))
+		# discount_amount global laissé à 0 par défaut pour l'instant
+		tax = (self.tax_rate or Decimal("0")) / Decimal("100")
+		self.total = (self.subtotal * (Decimal("1") + tax)).quantize(Decimal("0.01"))
+		self.save(update_fields=["subtotal", "total"])
 
 
 class QuoteLine(models.Model):
@@ -160,13 +199,17 @@ class QuoteLine(models.Model):
 	def __str__(self) -> str:
 		return f"Ligne: {self.name} x{self.quantity}"
 
-	def save(self, *args, **kwargs):
-		# Calcul simple du total de ligne
+	def compute_line_total(self):
+		"""Calcul simple du total de ligne (à appeler avant un bulk_create, qui ne passe pas par save)."""
 		if self.unit_price is not None and self.quantity is not None:
 			price = (self.unit_price or Decimal("0")) * (self.quantity or Decimal("0"))
 			discount = (self.discount_rate or Decimal("0")) / Decimal("100")
 			factor = Decimal("1") - discount
 			self.line_total = (price * factor).quantize(Decimal("0.01"))
+		return self.line_total
+
+	def save(self, *args, **kwargs):
+		self.compute_line_total()
 		super().save(*args, **kwargs)
 
 
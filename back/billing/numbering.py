@@ -0,0 +1,82 @@
+"""
+Numérotation des documents (devis D-YYYY-####, factures F-YYYY-####).
+
+Chaque série possède, par année, une ligne DocumentCounter contenant le
+dernier numéro attribué. L'attribution la verrouille (`SELECT ... FOR UPDATE`)
+et l'incrémente : une seule requête quelle que soit la taille de la table, et
+deux créations concurrentes obtiennent des numéros distincts.
+
+Le verrou est conservé jusqu'à la fin de la transaction appelante, qui doit
+aussi insérer le document : si elle est annulée, l'incrément l'est aussi et le
+numéro n'est pas perdu (numérotation sans trou).
+
+À la première attribution d'une année, le compteur démarre au plus grand
+numéro déjà présent pour ce préfixe (documents créés avant les compteurs).
+"""
+
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import DocumentCounter, Quote
+
+QUOTE_SERIES = 'D'
+INVOICE_SERIES = 'F'
+
+
+def _series_model(series):
+    if series == INVOICE_SERIES:
+        # invoices dépend de billing : import différé
+        from invoices.models import Invoice
+        return Invoice
+    return Quote
+
+
+def _existing_max(series, year, using=None):
+    """Plus grand numéro déjà attribué dans la série (0 si aucun)."""
+    prefix = f'{series}-{year}-'
+    # Suffixes numériques complétés par des zéros : le plus long, puis le plus grand
+    last = (
+        _series_model(series).objects.using(using)
+        .filter(number__regex=rf'^{re.escape(prefix)}[0-9]+$')
+        .order_by(Length('number').desc(), '-number')
+        .values_list('number', flat=True).first()
+    )
+    return int(last[len(prefix):]) if last else 0
+
+
+def _locked_counter(series, year, using=None):
+    counters = DocumentCounter.objects.using(using).select_for_update()
+    try:
+        return counters.get(series=series, year=year)
+    except DocumentCounter.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic(using=using):
+            return DocumentCounter.objects.using(using).create(
+                series=series, year=year, last_value=_existing_max(series, year, using)
+            )
+    except IntegrityError:
+        # Créé entre-temps par une transaction concurrente : attendre son verrou
+        return counters.get(series=series, year=year)
+
+
+def format_document_number(series, year, value):
+    return f'{series}-{year}-{value:04d}'
+
+
+def next_document_number(series, year=None, using=None):
+    """
+    Attribue le prochain numéro de la série `series` pour l'année `year`
+    (année courante par défaut).
+
+    À appeler dans la transaction qui enregistre le document.
+    """
+    year = year or timezone.now().year
+    with transaction.atomic(using=using):
+        counter = _locked_counter(series, year, using)
+        counter.last_value += 1
+        counter.save(update_fields=['last_value', 'updated_at'])
+    return format_document_number(series, year, counter.last_value)
@@ -1,7 +1,6 @@
 from rest_framework import serializers
 from .models import Product, Quote, QuoteLine, QuoteSignature
 from django.db import transaction
-from decimal import Decimal
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -67,6 +66,23 @@ class QuoteSignatureSerializer(serializers.ModelSerializer):
         return url
 
 
+class QuoteSummarySerializer(serializers.ModelSerializer):
+    """Représentation allégée d'un devis pour les listes (sans lignes)."""
+    pdf = serializers.SerializerMethodField()
+    is_signed = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Quote
+        fields = ["id", "number", "version", "is_latest", "status", "valid_until", "total", "pdf", "is_signed", "created_at", "updated_at"]
+        read_only_fields = fields
+
+    def get_pdf(self, obj: Quote):
+        return QuoteSerializer.get_pdf(self, obj)
+
+    def get_is_signed(self, obj: Quote):
+        return hasattr(obj, "signature")
+
+
 class QuotePDFSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -87,6 +103,7 @@ class QuoteSerializer(serializers.ModelSerializer):
             "offer",
             "version",
             "predecessor",
+            "is_latest",
             "status",
             "title",
             "negociations",
@@ -107,7 +124,7 @@ class QuoteSerializer(serializers.ModelSerializer):
             "lines",
             "signature",
         ]
-        read_only_fields = ["id", "number", "version", "subtotal", "discount_amount", "total", "commission_amount", "sales_commission_amount", "pdf", "created_at", "updated_at",]
+        read_only_fields = ["id", "number", "version", "is_latest", "subtotal", "discount_amount", "total", "commission_amount", "sales_commission_amount", "pdf", "created_at", "updated_at",]
     # Aucun override requis; 'offer' reste obligatoire pour les créations classiques
 
     def get_pdf(self, obj: Quote):
@@ -123,12 +140,7 @@ class QuoteSerializer(serializers.ModelSerializer):
         return url
 
     def _recalculate(self, quote: Quote):
-        subtotal = sum((line.line_total for line in quote.lines.all()), Decimal("0"))
-        quote.subtotal = subtotal.quantize(Decimal("0.01"))
-        # discount_amount global laissé à 0 par défaut pour l'instant
-        tax = (quote.tax_rate or Decimal("0")) / Decimal("100")
-        quote.total = (quote.subtotal * (Decimal("1") + tax)).quantize(Decimal("0.01"))
-        quote.save(update_fields=["subtotal", "total"])
+        quote.recalculate_totals()
 
     @transaction.atomic
     def create(self, validated_data):
@@ -202,10 +202,9 @@ def _create_quote_new_version(previous: Quote, payload: dict, user=None) -> Quot
     )
 
     lines = payload.get('lines')
-    created_lines = 0
     if not lines:
-        for idx, ol in enumerate(previous.lines.order_by('position', 'created_at')):
-            QuoteLine.objects.create(
+        new_lines = [
+            QuoteLine(
                 quote=new_quote,
                 position=ol.position or idx,
                 product_type=ol.product_type,
@@ -216,8 +215,10 @@ def _create_quote_new_version(previous: Quote, payload: dict, user=None) -> Quot
                 quantity=ol.quantity,
                 discount_rate=ol.discount_rate,
             )
-            created_lines += 1
+            for idx, ol in enumerate(previous.lines.order_by('position', 'created_at'))
+        ]
     else:
+        new_lines = []
         for idx, l in enumerate(lines or []):
             try:
                 up = Decimal(str(l.get('unit_price', 0)))
@@ -235,7 +236,7 @@ def _create_quote_new_version(previous: Quote, payload: dict, user=None) -> Quot
                 disc = Decimal(str(l.get('discount_rate', 0)))
             except Exception:
                 disc = Decimal('0')
-            QuoteLine.objects.create(
+            new_lines.append(QuoteLine(
                 quote=new_quote,
                 position=l.get('position', idx),
                 product_type=l.get('product_type') or 'other',
@@ -245,18 +246,16 @@ def _create_quote_new_version(previous: Quote, payload: dict, user=None) -> Quot
                 cost_price=cp,
                 quantity=qty,
                 discount_rate=disc,
-            )
-            created_lines += 1
+            ))
 
-    # Recalculate totals
-    subtotal = sum((line.line_total for line in new_quote.lines.all()), Decimal('0'))
-    new_quote.subtotal = subtotal
-    try:
-        tax_factor = (new_quote.tax_rate or Decimal('0')) / Decimal('100')
-    except Exception:
-        tax_factor = Decimal('0')
-    new_quote.total = (new_quote.subtotal * (Decimal('1') + tax_factor)).quantize(Decimal('0.01'))
-    new_quote.save(update_fields=['subtotal', 'total'])
+    # Un seul INSERT pour toutes les lignes (bulk_create ne passe pas par QuoteLine.save)
+    for line in new_lines:
+        line.compute_line_total()
+    QuoteLine.objects.bulk_create(new_lines)
+    created_lines = len(new_lines)
+
+    # Totaux : une agrégation SQL sur les lignes
+    new_quote.recalculate_totals()
 
     logger.info("Created new quote version", extra={
         'previous_id': str(previous.id),
@@ -421,8 +420,7 @@ class QuoteViewSet(viewsets.ModelViewSet):
     def negotiate(self, request, pk=None):
         quote = self.get_object()
         # Règle métier: seule la dernière version d'une offre peut être négociée
-        latest = Quote.objects.filter(offer=quote.offer).order_by("-version").first()
-        if not latest or latest.id != quote.id:
+        if not quote.is_latest:
             return Response({"detail": "Seul le dernier devis est négociable."}, status=status.HTTP_400_BAD_REQUEST)
         serializer = QuoteNegotiationSerializer(data=request.data, context={'quote': quote})
         serializer.is_valid(raise_exception=True)
@@ -435,8 +433,7 @@ class QuoteViewSet(viewsets.ModelViewSet):
     def reply_current(self, request, pk=None):
         quote = self.get_object()
         # Vérifier que c'est la dernière version
-        latest = Quote.objects.filter(offer=quote.offer).order_by("-version").first()
-        if not latest or latest.id != quote.id:
+        if not quote.is_latest:
             return Response({"detail": "Seul le dernier devis est modifiable."}, status=status.HTTP_400_BAD_REQUEST)
         ser = QuoteNegotiationReplySerializer(data=request.data)
         ser.is_valid(raise_exception=True)
@@ -484,8 +481,7 @@ class QuoteViewSet(viewsets.ModelViewSet):
     def reply_new_version(self, request, pk=None):
         previous = self.get_object()
         # Vérifier que c'est la dernière version
-        latest = Quote.objects.filter(offer=previous.offer).order_by("-version").first()
-        if not latest or latest.id != previous.id:
+        if not previous.is_latest:
             return Response({"detail": "Seul le dernier devis est modifiable."}, status=status.HTTP_400_BAD_REQUEST)
 
         # Réponse séparée du payload devis
@@ -546,8 +542,7 @@ class QuoteViewSet(viewsets.ModelViewSet):
     def sign(self, request, pk=None):
         quote = self.get_object()
         # Valider dernière version
-        latest = Quote.objects.filter(offer=quote.offer).order_by("-version").first()
-        if not latest or latest.id != quote.id:
+        if not quote.is_latest:
             return Response({"detail": "Seul le dernier devis est signable."}, status=status.HTTP_400_BAD_REQUEST)
         # Déjà signé
         if getattr(quote, "signature", None):
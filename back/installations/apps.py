@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class InstallationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'installations'
+
+    def ready(self):
+        """Charge les signaux (registre des commissions)."""
+        import installations.signals  # noqa
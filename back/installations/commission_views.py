@@ -2,11 +2,91 @@
 Vues dédiées à la gestion des commissions d'installation.
 Modularisation pour améliorer la maintenabilité du code.
 """
+import uuid
+from datetime import datetime, time
+
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Form
+from django.db.models import Q, F
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from EuropGreenSolar.utils.helpers import get_client_ip
+from .commissions import commission_totals, bulk_pay_commissions
+from .models import Form, CommissionLedger
+
+
+class CommissionLedgerPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def _person_fields(prefix, with_role=False):
+    """Colonnes values() d'un utilisateur lié (id, prénom, nom, email, [rôle])."""
+    fields = ['id', 'first_name', 'last_name', 'email'] + (['role'] if with_role else [])
+    return [f'{prefix}__{field}' for field in fields]
+
+
+def _person(row, prefix, with_role=False):
+    """Reconstruit le dict d'un utilisateur lié depuis une ligne values() (None si absent)."""
+    if not row[f'{prefix}__id']:
+        return None
+    data = {
+        'id': str(row[f'{prefix}__id']),
+        'first_name': row[f'{prefix}__first_name'],
+        'last_name': row[f'{prefix}__last_name'],
+        'email': row[f'{prefix}__email'],
+    }
+    if with_role:
+        data['role'] = row[f'{prefix}__role']
+    return data
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
+
+
+def _parse_uuid(value):
+    try:
+        return uuid.UUID(value) if value else None
+    except ValueError:
+        return None
+
+
+def filter_commission_ledger(entries, params):
+    """
+    Applique les filtres de requête au registre des commissions.
+    
+    Paramètres : type (source/sales), paid (true/false), beneficiary, client,
+    start_date / end_date (YYYY-MM-DD, date de création de l'installation).
+    """
+    entry_type = params.get('type')
+    if entry_type in CommissionLedger.Type.values:
+        entries = entries.filter(type=entry_type)
+    
+    paid = params.get('paid')
+    if paid in ('true', 'false'):
+        entries = entries.filter(paid=paid == 'true')
+    
+    beneficiary_id = _parse_uuid(params.get('beneficiary'))
+    if beneficiary_id:
+        entries = entries.filter(beneficiary_id=beneficiary_id)
+    client_id = _parse_uuid(params.get('client'))
+    if client_id:
+        entries = entries.filter(client_id=client_id)
+    
+    start_date = _parse_date(params.get('start_date'))
+    end_date = _parse_date(params.get('end_date'))
+    if start_date:
+        entries = entries.filter(installation_created_at__gte=timezone.make_aware(datetime.combine(start_date, time.min)))
+    if end_date:
+        entries = entries.filter(installation_created_at__lte=timezone.make_aware(datetime.combine(end_date, time.max)))
+    return entries
 
 
 class CommissionViewSet(viewsets.ViewSet):
@@ -21,79 +101,101 @@ class CommissionViewSet(viewsets.ViewSet):
         """
         Récupère toutes les installations avec des commissions non nulles/non-zero.
         Inclut les informations du client, de la source (collaborateur/client) et du commercial.
+        
+        Une seule requête (values() sur les jointures), sans instancier de modèles.
+        Pour une liste paginée et filtrable avec totaux, voir `ledger`.
         """
         # Filtrer les installations avec au moins une commission non nulle et non zero
-        installations = (
+        rows = (
             Form.objects
-            .select_related('client', 'offer__request__source', 'offer__request__assigned_to')
             .filter(
                 Q(commission_amount__gt=0) | Q(sales_commission_amount__gt=0)
             )
             .order_by('-created_at')
+            .values(
+                'id', 'commission_amount', 'commission_paid',
+                'sales_commission_amount', 'sales_commission_paid', 'created_at',
+                *_person_fields('client'),
+                *_person_fields('offer__request__source', with_role=True),
+                *_person_fields('offer__request__assigned_to', with_role=True),
+                request_id=F('offer__request__id'),
+                request_source_type=F('offer__request__source_type'),
+            )
         )
         
         results = []
-        for installation in installations:
-            # Informations client
-            client_data = None
-            if installation.client:
-                client_data = {
-                    'id': str(installation.client.id),
-                    'first_name': installation.client.first_name,
-                    'last_name': installation.client.last_name,
-                    'email': installation.client.email,
-                }
-            
-            # Informations demande
-            request_data = None
-            source_data = None
-            assigned_to_data = None
-            
-            if hasattr(installation, 'offer') and installation.offer:
-                offer = installation.offer
-                if hasattr(offer, 'request') and offer.request:
-                    prospect_request = offer.request
-                    request_data = {
-                        'id': str(prospect_request.id),
-                        'source_type': prospect_request.source_type,
-                    }
-                    
-                    # Source (collaborateur/client apporteur)
-                    if prospect_request.source:
-                        source_data = {
-                            'id': str(prospect_request.source.id),
-                            'first_name': prospect_request.source.first_name,
-                            'last_name': prospect_request.source.last_name,
-                            'email': prospect_request.source.email,
-                            'role': prospect_request.source.role,
-                        }
-                    
-                    # Commercial (assigned_to)
-                    if prospect_request.assigned_to:
-                        assigned_to_data = {
-                            'id': str(prospect_request.assigned_to.id),
-                            'first_name': prospect_request.assigned_to.first_name,
-                            'last_name': prospect_request.assigned_to.last_name,
-                            'email': prospect_request.assigned_to.email,
-                            'role': prospect_request.assigned_to.role,
-                        }
-            
-            # Construction de la réponse
+        for row in rows:
             results.append({
-                'id': str(installation.id),
-                'client': client_data,
-                'request': request_data,
-                'source': source_data,
-                'assigned_to': assigned_to_data,
-                'commission_amount': float(installation.commission_amount) if installation.commission_amount else 0,
-                'commission_paid': installation.commission_paid,
-                'sales_commission_amount': float(installation.sales_commission_amount) if installation.sales_commission_amount else 0,
-                'sales_commission_paid': installation.sales_commission_paid,
-                'created_at': installation.created_at,
+                'id': str(row['id']),
+                'client': _person(row, 'client'),
+                'request': {
+                    'id': str(row['request_id']),
+                    'source_type': row['request_source_type'],
+                } if row['request_id'] else None,
+                'source': _person(row, 'offer__request__source', with_role=True),
+                'assigned_to': _person(row, 'offer__request__assigned_to', with_role=True),
+                'commission_amount': float(row['commission_amount']) if row['commission_amount'] else 0,
+                'commission_paid': row['commission_paid'],
+                'sales_commission_amount': float(row['sales_commission_amount']) if row['sales_commission_amount'] else 0,
+                'sales_commission_paid': row['sales_commission_paid'],
+                'created_at': row['created_at'],
             })
         
         return Response(results, status=status.HTTP_200_OK)
     
+    @extend_schema(
+        summary="Registre des commissions",
+        description="Liste paginée des commissions (une ligne par installation et par bénéficiaire) avec totaux.",
+        parameters=[
+            OpenApiParameter(name='type', description='Type (source, sales)', required=False, type=str),
+            OpenApiParameter(name='paid', description='Statut de paiement (true, false)', required=False, type=str),
+            OpenApiParameter(name='beneficiary', description='ID du bénéficiaire', required=False, type=str),
+            OpenApiParameter(name='client', description='ID du client', required=False, type=str),
+            OpenApiParameter(name='start_date', description='Installations créées à partir du (YYYY-MM-DD)', required=False, type=str),
+            OpenApiParameter(name='end_date', description="Installations créées jusqu'au (YYYY-MM-DD)", required=False, type=str),
+            OpenApiParameter(name='page', description='Numéro de page', required=False, type=int),
+            OpenApiParameter(name='page_size', description='Taille de page (max 500)', required=False, type=int),
+        ]
+    )
+    @action(detail=False, methods=['get'], url_path='ledger')
+    def ledger(self, request):
+        """
+        Registre des commissions filtré et paginé.
+        
+        Retourne {count, next, previous, results, totals: {total, paid, unpaid}} ;
+        les totaux portent sur l'ensemble des lignes filtrées (pas seulement la page).
+        """
+        entries = filter_commission_ledger(CommissionLedger.objects.all(), request.query_params)
+        totals = commission_totals(entries)
+        
+        rows = entries.order_by('-installation_created_at', 'type').values(
+            'id', 'type', 'amount', 'paid', 'paid_at', 'installation_created_at',
+            *_person_fields('beneficiary', with_role=True),
+            *_person_fields('client'),
+            installation_ref=F('installation_id'),
+        )
+        
+        paginator = CommissionLedgerPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        results = [
+            {
+                'id': str(row['id']),
+                'installation_id': str(row['installation_ref']),
+                'type': row['type'],
+                'type_display': CommissionLedger.Type(row['type']).label,
+                'beneficiary': _person(row, 'beneficiary', with_role=True),
+                'client': _person(row, 'client'),
+                'amount': float(row['amount']),
+                'paid': row['paid'],
+                'paid_at': row['paid_at'],
+                'installation_created_at': row['installation_created_at'],
+            }
+            for row in page
+        ]
+        response = paginator.get_paginated_response(results)
+        response.data['totals'] = totals
+        return response
+    
     @action(detail=True, methods=['patch'], url_path='pay-source-commission')
     def pay_source_commission(self, request, pk=None):
         """
@@ -175,3 +277,75 @@ class CommissionViewSet(viewsets.ViewSet):
             },
             status=status.HTTP_200_OK
         )
+    
+    @extend_schema(
+        summary="Paiement groupé de commissions",
+        description=(
+            "Marque payées en une transaction les commissions désignées par une liste "
+            "d'installations et/ou un filtre (type, bénéficiaire, période)."
+        ),
+        request={
+            'application/json': {
+                'type': 'object',
+                'properties': {
+                    'installation_ids': {'type': 'array', 'items': {'type': 'string', 'format': 'uuid'}},
+                    'type': {'type': 'string', 'enum': ['source', 'sales']},
+                    'beneficiary': {'type': 'string', 'format': 'uuid'},
+                    'start_date': {'type': 'string', 'format': 'date'},
+                    'end_date': {'type': 'string', 'format': 'date'},
+                },
+            }
+        },
+    )
+    @action(detail=False, methods=['post'], url_path='bulk-pay')
+    def bulk_pay(self, request):
+        """
+        Paiement groupé des commissions non payées.
+        
+        Corps : installation_ids (liste) et/ou filtres type, beneficiary, start_date,
+        end_date. Au moins un critère parmi installation_ids, beneficiary ou période
+        est requis (pas de paiement de toutes les commissions par erreur).
+        
+        Une requête UPDATE par table, une entrée d'audit récapitulative et un email
+        par bénéficiaire. Retourne {paid_count, total_amount, beneficiaries}.
+        """
+        data = request.data
+        installation_ids = data.get('installation_ids') or []
+        if not isinstance(installation_ids, list):
+            return Response(
+                {'error': 'installation_ids doit être une liste'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        parsed_ids = [_parse_uuid(str(value)) for value in installation_ids]
+        if None in parsed_ids:
+            return Response(
+                {'error': 'installation_ids contient un identifiant invalide'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Un filtre invalide serait ignoré par filter_commission_ledger : le refuser explicitement
+        if data.get('type') and data['type'] not in CommissionLedger.Type.values:
+            return Response(
+                {'error': f"type invalide ({', '.join(CommissionLedger.Type.values)})"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if data.get('beneficiary') and not _parse_uuid(str(data['beneficiary'])):
+            return Response({'error': 'beneficiary invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        for key in ('start_date', 'end_date'):
+            if data.get(key) and not _parse_date(str(data[key])):
+                return Response({'error': f'{key} invalide (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not (parsed_ids or data.get('beneficiary') or data.get('start_date') or data.get('end_date')):
+            return Response(
+                {'error': 'Préciser installation_ids, beneficiary ou une période'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        entries = filter_commission_ledger(CommissionLedger.objects.all(), {
+            key: data.get(key) for key in ('type', 'beneficiary', 'start_date', 'end_date')
+        })
+        if parsed_ids:
+            entries = entries.filter(installation_id__in=parsed_ids)
+        
+        summary = bulk_pay_commissions(entries, actor=request.user, remote_addr=get_client_ip(request))
+        return Response(summary, status=status.HTTP_200_OK)
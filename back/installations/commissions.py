@@ -0,0 +1,305 @@
+"""
+Tenue du registre des commissions (CommissionLedger).
+
+Les montants et statuts de paiement restent portés par `Form` (copiés depuis
+le devis, marqués payés par le CommissionViewSet) ; le registre en est la
+projection indexée, une ligne par fiche et par type de commission.
+"""
+from decimal import Decimal
+
+from auditlog.models import LogEntry
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q, F, Sum, Case, When, Value, DecimalField, BooleanField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from request.models import ProspectRequest
+from .models import CommissionLedger, Form
+
+
+# Champs de Form dont la modification impose une resynchronisation du registre
+COMMISSION_FIELDS = {
+    'commission_amount', 'commission_paid', 'sales_commission_amount', 'sales_commission_paid',
+    'client', 'client_id', 'offer', 'offer_id',
+}
+# Champs de ProspectRequest copiés dans le registre (bénéficiaires)
+BENEFICIARY_FIELDS = {'source', 'source_id', 'assigned_to', 'assigned_to_id'}
+
+
+def sync_commission_ledger(form):
+    """
+    Aligne les lignes du registre sur les champs de commission d'une fiche.
+
+    Une commission nulle supprime la ligne correspondante. `paid_at` est
+    renseigné au premier passage à payé.
+    """
+    beneficiaries = (
+        ProspectRequest.objects
+        .filter(offer__installations_form=form)
+        .values('source_id', 'assigned_to_id')
+        .first()
+    ) or {}
+
+    entries = {
+        CommissionLedger.Type.SOURCE: (form.commission_amount, form.commission_paid, beneficiaries.get('source_id')),
+        CommissionLedger.Type.SALES: (form.sales_commission_amount, form.sales_commission_paid, beneficiaries.get('assigned_to_id')),
+    }
+    existing = {entry.type: entry for entry in CommissionLedger.objects.filter(installation=form)}
+
+    for entry_type, (amount, paid, beneficiary_id) in entries.items():
+        entry = existing.get(entry_type)
+        if not amount or amount <= 0:
+            if entry:
+                entry.delete()
+            continue
+
+        if entry is None:
+            entry = CommissionLedger(installation=form, type=entry_type)
+        if paid and not entry.paid:
+            entry.paid_at = timezone.now()
+        elif not paid:
+            entry.paid_at = None
+        entry.amount = amount
+        entry.paid = paid
+        entry.beneficiary_id = beneficiary_id
+        entry.client_id = form.client_id
+        entry.installation_created_at = form.created_at
+        entry.save()
+
+
+def sync_request_beneficiaries(prospect_request):
+    """Reporte la source et le commercial d'une demande sur les lignes du registre de sa fiche."""
+    entries = CommissionLedger.objects.filter(installation__offer__request=prospect_request)
+    now = timezone.now()
+    for entry_type, beneficiary_id in (
+        (CommissionLedger.Type.SOURCE, prospect_request.source_id),
+        (CommissionLedger.Type.SALES, prospect_request.assigned_to_id),
+    ):
+        (
+            entries.filter(type=entry_type)
+            .exclude(beneficiary_id=beneficiary_id)
+            .update(beneficiary_id=beneficiary_id, updated_at=now)
+        )
+
+
+def rebuild_commission_ledger(batch_size=2000):
+    """
+    Reconstruit le registre depuis les fiches, en masse.
+
+    Rattrape les modifications qui échappent aux signaux (queryset.update,
+    SQL direct, changement de demande d'une offre). Les dates de paiement
+    déjà connues sont conservées. Retourne {"written", "deleted"}.
+    """
+    now = timezone.now()
+    written = 0
+    with transaction.atomic():
+        # Commissions nulles : plus de ligne
+        deleted, _ = CommissionLedger.objects.filter(
+            Q(type=CommissionLedger.Type.SOURCE, installation__commission_amount__lte=0)
+            | Q(type=CommissionLedger.Type.SOURCE, installation__commission_amount__isnull=True)
+            | Q(type=CommissionLedger.Type.SALES, installation__sales_commission_amount__lte=0)
+            | Q(type=CommissionLedger.Type.SALES, installation__sales_commission_amount__isnull=True)
+        ).delete()
+
+        forms = (
+            Form.objects
+            .filter(Q(commission_amount__gt=0) | Q(sales_commission_amount__gt=0))
+            .order_by('pk')
+            .values(
+                'id', 'client_id', 'created_at',
+                'commission_amount', 'commission_paid', 'sales_commission_amount', 'sales_commission_paid',
+                'offer__request__source_id', 'offer__request__assigned_to_id',
+            )
+        )
+        batch = []
+        for form in forms.iterator(chunk_size=batch_size):
+            batch.append(form)
+            if len(batch) == batch_size:
+                written += _rebuild_ledger_rows(batch, now)
+                batch = []
+        if batch:
+            written += _rebuild_ledger_rows(batch, now)
+
+    from admin_platform.report_cache import invalidate_reports_cache
+    invalidate_reports_cache()
+    return {'written': written, 'deleted': deleted}
+
+
+def _rebuild_ledger_rows(forms, now):
+    """Upsert des lignes du registre d'un lot de fiches (values de `rebuild_commission_ledger`)."""
+    # Dates de paiement déjà connues, conservées
+    paid_at = {
+        (installation_id, entry_type): at
+        for installation_id, entry_type, at in CommissionLedger.objects
+        .filter(installation_id__in=[form['id'] for form in forms], paid=True)
+        .values_list('installation_id', 'type', 'paid_at')
+    }
+    entries = []
+    for form in forms:
+        for entry_type, amount, paid, beneficiary_id in (
+            (CommissionLedger.Type.SOURCE, form['commission_amount'], form['commission_paid'], form['offer__request__source_id']),
+            (CommissionLedger.Type.SALES, form['sales_commission_amount'], form['sales_commission_paid'], form['offer__request__assigned_to_id']),
+        ):
+            if not amount or amount <= 0:
+                continue
+            entries.append(CommissionLedger(
+                installation_id=form['id'],
+                type=entry_type,
+                beneficiary_id=beneficiary_id,
+                client_id=form['client_id'],
+                amount=amount,
+                paid=paid,
+                paid_at=(paid_at.get((form['id'], entry_type)) or now) if paid else None,
+                installation_created_at=form['created_at'],
+                updated_at=now,
+            ))
+    CommissionLedger.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['installation', 'type'],
+        update_fields=['beneficiary', 'client', 'amount', 'paid', 'paid_at', 'installation_created_at', 'updated_at'],
+    )
+    return len(entries)
+
+
+def commission_totals(entries):
+    """Totaux (total, payé, à payer) d'un queryset du registre, en une requête."""
+    zero = Value(0, output_field=DecimalField())
+    # Alias distincts du champ `paid` (un agrégat ne peut pas masquer un champ filtré)
+    totals = entries.aggregate(
+        total_amount=Coalesce(Sum('amount'), zero),
+        paid_amount=Coalesce(Sum('amount', filter=Q(paid=True)), zero),
+        unpaid_amount=Coalesce(Sum('amount', filter=Q(paid=False)), zero),
+    )
+    return {
+        'total': float(totals['total_amount']),
+        'paid': float(totals['paid_amount']),
+        'unpaid': float(totals['unpaid_amount']),
+    }
+
+
+def bulk_pay_commissions(entries, actor=None, remote_addr=None):
+    """
+    Marque payées, en une transaction, les commissions non payées de `entries`.
+
+    Une seule requête UPDATE par table (registre, puis fiches via CASE),
+    une entrée d'audit récapitulative et, après commit, un email par bénéficiaire.
+
+    Retourne {"paid_count", "total_amount", "beneficiaries": [{"id", "name", "count", "amount"}]}.
+    """
+    with transaction.atomic():
+        rows = list(
+            entries.filter(paid=False)
+            .select_for_update(of=('self',))
+            .values(
+                'id', 'installation_id', 'type', 'amount', 'beneficiary_id',
+                'beneficiary__first_name', 'beneficiary__last_name', 'beneficiary__email',
+                'client__first_name', 'client__last_name',
+            )
+        )
+        if not rows:
+            return {'paid_count': 0, 'total_amount': 0, 'beneficiaries': []}
+
+        now = timezone.now()
+        CommissionLedger.objects.filter(id__in=[row['id'] for row in rows]).update(
+            paid=True, paid_at=now, updated_at=now
+        )
+
+        # Les fiches restent la source des champs commission_paid / sales_commission_paid
+        source_ids = [row['installation_id'] for row in rows if row['type'] == CommissionLedger.Type.SOURCE]
+        sales_ids = [row['installation_id'] for row in rows if row['type'] == CommissionLedger.Type.SALES]
+        Form.objects.filter(id__in=source_ids + sales_ids).update(
+            commission_paid=Case(
+                When(id__in=source_ids, then=Value(True)),
+                default=F('commission_paid'), output_field=BooleanField(),
+            ),
+            sales_commission_paid=Case(
+                When(id__in=sales_ids, then=Value(True)),
+                default=F('sales_commission_paid'), output_field=BooleanField(),
+            ),
+            updated_at=now,
+        )
+
+        beneficiaries = _group_by_beneficiary(rows)
+        total_amount = sum((row['amount'] for row in rows), Decimal('0'))
+        summary = {
+            'paid_count': len(rows),
+            'total_amount': float(total_amount),
+            'beneficiaries': [
+                {key: data[key] for key in ('id', 'name', 'count', 'amount')}
+                for data in beneficiaries.values()
+            ],
+        }
+
+        LogEntry.objects.create(
+            content_type=ContentType.objects.get_for_model(CommissionLedger),
+            object_pk='bulk',
+            object_repr=f"Paiement groupé de {len(rows)} commission(s) - {total_amount} €",
+            action=LogEntry.Action.UPDATE,
+            changes={'paid': [False, True]},
+            changes_text='',
+            actor=actor,
+            remote_addr=remote_addr,
+            additional_data={
+                **summary,
+                'installations': sorted({str(row['installation_id']) for row in rows}),
+            },
+        )
+
+        transaction.on_commit(lambda: _notify_beneficiaries(beneficiaries.values()))
+
+    # Les UPDATE en masse ne déclenchent pas les signaux d'invalidation du cache
+    from admin_platform.report_cache import invalidate_reports_cache
+    invalidate_reports_cache()
+
+    return summary
+
+
+def _group_by_beneficiary(rows):
+    """Regroupe les commissions payées par bénéficiaire (clé None : bénéficiaire inconnu)."""
+    beneficiaries = {}
+    for row in rows:
+        beneficiary_id = row['beneficiary_id']
+        data = beneficiaries.setdefault(beneficiary_id, {
+            'id': str(beneficiary_id) if beneficiary_id else None,
+            'name': (
+                f"{row['beneficiary__first_name'] or ''} {row['beneficiary__last_name'] or ''}".strip()
+                or row['beneficiary__email'] or "Bénéficiaire inconnu"
+            ),
+            'first_name': row['beneficiary__first_name'],
+            'email': row['beneficiary__email'],
+            'count': 0,
+            'amount': 0.0,
+            'commissions': [],
+        })
+        data['count'] += 1
+        data['amount'] += float(row['amount'])
+        data['commissions'].append({
+            'client': f"{row['client__first_name'] or ''} {row['client__last_name'] or ''}".strip() or "Client inconnu",
+            'type': CommissionLedger.Type(row['type']).label,
+            'amount': f"{row['amount']:.2f}",
+        })
+    return beneficiaries
+
+
+def _notify_beneficiaries(beneficiaries):
+    """Un email récapitulatif par bénéficiaire (sans bloquer le paiement en cas d'erreur)."""
+    from EuropGreenSolar.email_utils import send_mail
+
+    for data in beneficiaries:
+        if not data['email']:
+            continue
+        try:
+            send_mail(
+                template='emails/commission/commissions_paid.html',
+                context={
+                    'beneficiary': {'first_name': data['first_name']},
+                    'commissions': data['commissions'],
+                    'total': f"{data['amount']:.2f}",
+                },
+                subject=f"Versement de vos commissions ({data['amount']:.2f} €)",
+                to=data['email'],
+            )
+        except Exception as e:
+            print(f"Erreur lors de l'envoi de la notification de commission : {e}")
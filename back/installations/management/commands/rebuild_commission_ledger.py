@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from installations.commissions import rebuild_commission_ledger
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit le registre des commissions (CommissionLedger) depuis les fiches et les demandes'
+
+    def handle(self, *args, **options):
+        result = rebuild_commission_ledger()
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['written']} ligne(s) du registre écrite(s), {result['deleted']} supprimée(s)"
+        ))
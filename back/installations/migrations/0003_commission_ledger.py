@@ -0,0 +1,79 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_commission_ledger(apps, schema_editor):
+    """Crée les lignes du registre pour les commissions déjà copiées sur les fiches."""
+    Form = apps.get_model('installations', 'Form')
+    CommissionLedger = apps.get_model('installations', 'CommissionLedger')
+
+    entries = []
+    forms = (
+        Form.objects
+        .filter(models.Q(commission_amount__gt=0) | models.Q(sales_commission_amount__gt=0))
+        .values(
+            'id', 'client_id', 'created_at', 'updated_at',
+            'commission_amount', 'commission_paid', 'sales_commission_amount', 'sales_commission_paid',
+            'offer__request__source_id', 'offer__request__assigned_to_id',
+        )
+    )
+    for form in forms.iterator(chunk_size=2000):
+        for entry_type, amount, paid, beneficiary_id in (
+            ('source', form['commission_amount'], form['commission_paid'], form['offer__request__source_id']),
+            ('sales', form['sales_commission_amount'], form['sales_commission_paid'], form['offer__request__assigned_to_id']),
+        ):
+            if amount and amount > 0:
+                entries.append(CommissionLedger(
+                    installation_id=form['id'],
+                    type=entry_type,
+                    beneficiary_id=beneficiary_id,
+                    client_id=form['client_id'],
+                    amount=amount,
+                    paid=paid,
+                    # Date de paiement inconnue : dernière modification de la fiche
+                    paid_at=form['updated_at'] if paid else None,
+                    installation_created_at=form['created_at'],
+                ))
+    CommissionLedger.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('installations', '0002_initial'),
+        ('offers', '0002_initial'),
+        ('request', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommissionLedger',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type', models.CharField(choices=[('source', "Apporteur d'affaires"), ('sales', 'Commercial')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('paid', models.BooleanField(default=False)),
+                ('paid_at', models.DateTimeField(blank=True, null=True)),
+                ('installation_created_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('beneficiary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='commission_entries', to=settings.AUTH_USER_MODEL)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('installation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commission_entries', to='installations.form')),
+            ],
+            options={
+                'verbose_name': 'Commission',
+                'verbose_name_plural': 'Registre des commissions',
+                'db_table': 'installations_commission_ledger',
+                'ordering': ['-installation_created_at'],
+                'indexes': [models.Index(fields=['paid', 'type', '-installation_created_at'], name='commission_paid_type_idx'), models.Index(fields=['beneficiary', 'paid'], name='commission_beneficiary_idx'), models.Index(fields=['-installation_created_at'], name='commission_inst_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('installation', 'type'), name='uq_commission_ledger_installation_type')],
+            },
+        ),
+        migrations.RunPython(backfill_commission_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('installations', '0003_commission_ledger'),
+        ('offers', '0003_offer_offer_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='form',
+            index=models.Index(fields=['created_at', 'id'], name='form_created_id_idx'),
+        ),
+    ]
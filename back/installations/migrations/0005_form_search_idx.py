@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 18:40
+
+from django.db import migrations
+
+from EuropGreenSolar.search import CreateSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('installations', '0004_form_form_created_id_idx'),
+    ]
+
+    operations = [
+        CreateSearchIndex(
+            model_name='form',
+            name='form_search_trgm_idx',
+            fields=['client_address'],
+        ),
+    ]
@@ -83,11 +83,18 @@ class Form(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Document de recherche (EuropGreenSolar.search), indexé par la migration 0005
+    SEARCH_FIELDS = ("client_address",)
+
     class Meta:
         db_table = "installations_form"
         ordering = ["-created_at"]
         verbose_name = "Fiche d'installation"
         verbose_name_plural = "Fiches d'installation"
+        indexes = [
+            # Pagination keyset de la liste (EuropGreenSolar.pagination)
+            models.Index(fields=["created_at", "id"], name="form_created_id_idx"),
+        ]
 
     def __str__(self) -> str:
         client_name = self.client.get_full_name() if self.client else "Client inconnu"
@@ -412,6 +419,54 @@ class Commissioning(models.Model):
         return f"Mise en service - {client_name} - {status}"
 
 
+class CommissionLedger(models.Model):
+    """Registre des commissions : une ligne par fiche d'installation et par bénéficiaire.
+
+    Tenu à jour depuis les champs de commission de `Form` (copie depuis le devis,
+    paiement) par `installations.signals`. Les listes, filtres et totaux de
+    commissions sont des requêtes indexées sur cette table.
+    """
+
+    class Type(models.TextChoices):
+        SOURCE = "source", "Apporteur d'affaires"
+        SALES = "sales", "Commercial"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    installation = models.ForeignKey(Form, on_delete=models.CASCADE, related_name="commission_entries")
+    type = models.CharField(max_length=10, choices=Type.choices)
+    # Source de la demande (apporteur) ou commercial assigné
+    beneficiary = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="commission_entries")
+    client = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    paid = models.BooleanField(default=False)
+    paid_at = models.DateTimeField(null=True, blank=True)
+
+    # Date de création de la fiche (filtres par période sans jointure)
+    installation_created_at = models.DateTimeField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "installations_commission_ledger"
+        ordering = ["-installation_created_at"]
+        verbose_name = "Commission"
+        verbose_name_plural = "Registre des commissions"
+        constraints = [
+            models.UniqueConstraint(fields=["installation", "type"], name="uq_commission_ledger_installation_type"),
+        ]
+        indexes = [
+            models.Index(fields=["paid", "type", "-installation_created_at"], name="commission_paid_type_idx"),
+            models.Index(fields=["beneficiary", "paid"], name="commission_beneficiary_idx"),
+            models.Index(fields=["-installation_created_at"], name="commission_inst_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        status = "Payée" if self.paid else "À payer"
+        return f"Commission {self.get_type_display()} - {self.amount}€ - {status}"
+
+
 # ==============================
 # Documents administratifs (3.2)
 # ==============================
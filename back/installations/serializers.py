@@ -1,4 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from EuropGreenSolar.fieldsets import Relations, SparseFieldsetMixin
 from .models import (
 	Form,
 	Signature,
@@ -12,6 +14,7 @@ from .models import (
 )
 from administrative.serializers import Cerfa16702Serializer, ElectricalDiagramSerializer, EnedisMandateSerializer, ConsuelSerializer
 from invoices.serializers import InvoiceSerializer
+from billing.models import Quote
 from billing.serializers import QuotePDFSerializer
 from offers.serializers import OfferBaseSerializer
 from offers.models import Offer
@@ -99,7 +102,50 @@ class UserMiniSerializer(serializers.Serializer):
 	phone_number = serializers.CharField()
 	email = serializers.EmailField()
 
-class FormSerializer(serializers.ModelSerializer):
+def signed_step(name):
+	"""Relations d'une étape signée (client / installateur)."""
+	return Relations(select=(f'{name}__client_signature', f'{name}__installer_signature'))
+
+# Relations des champs de la fiche détaillée (FormDetailSerializer, ?expand= de la liste)
+FORM_DETAIL_RELATIONS = {
+	'created_by': Relations(select=('created_by',)),
+	'client': Relations(select=('client',)),
+	'offer': Relations(select=('offer__request',)),
+	'technical_visit': signed_step('technical_visit'),
+	'representation_mandate': signed_step('representation_mandate'),
+	'administrative_validation': Relations(select=('administrative_validation',)),
+	'installation_completed': signed_step('installation_completed'),
+	'consuel_visit': Relations(select=('consuel_visit',)),
+	'enedis_connection': Relations(select=('enedis_connection',)),
+	'commissioning': Relations(select=('commissioning',)),
+	'invoice': Relations(select=('invoice',), prefetch=('invoice__lines', 'invoice__installments', 'invoice__payments')),
+	'cerfa16702': Relations(select=('cerfa16702__declarant_signature',), prefetch=('cerfa16702__attachments',)),
+	'electrical_diagram': Relations(select=('electrical_diagram',)),
+	'enedis_mandate': signed_step('enedis_mandate'),
+	'consuels': Relations(prefetch=('consuels',)),
+	'quotes': Relations(
+		select=('offer',),
+		prefetch=(Prefetch('offer__quotes', queryset=Quote.objects.order_by('-version', '-created_at'), to_attr='ordered_quotes'),),
+	),
+}
+
+
+def form_quotes(form, context):
+	"""Devis de l'offre de la fiche, du plus récent au plus ancien (None si aucun)."""
+	offer = getattr(form, 'offer', None)
+	if not offer:
+		return None
+	# Préchargés par FormViewSet (Prefetch to_attr), requête unitaire sinon
+	if hasattr(offer, 'ordered_quotes'):
+		quotes = offer.ordered_quotes
+	else:
+		quotes = offer.quotes.order_by('-version', '-created_at')
+	if quotes:
+		return QuotePDFSerializer(quotes, many=True, context=context).data
+	return None
+
+
+class FormSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	client = UserMiniSerializer(read_only=True)
 	offer = OfferBaseSerializer(read_only=True)
 	offer_id = serializers.PrimaryKeyRelatedField(source='offer', queryset=Offer.objects.all(), write_only=True)
@@ -119,7 +165,29 @@ class FormSerializer(serializers.ModelSerializer):
 			'client_first_name', 'client_last_name'
 		]
 		read_only_fields = ['id', 'created_by', 'commission_amount', 'sales_commission_amount', 'created_at', 'updated_at']
-	
+
+	# ?expand= : sections de la fiche détaillée, sans passer par le détail de chaque fiche
+	expandable_fields = {
+		'created_by': (UserMiniSerializer, {}),
+		'technical_visit': (TechnicalVisitSerializer, {}),
+		'representation_mandate': (RepresentationMandateSerializer, {}),
+		'administrative_validation': (AdministrativeValidationSerializer, {}),
+		'installation_completed': (InstallationCompletedSerializer, {}),
+		'consuel_visit': (ConsuelVisitSerializer, {}),
+		'enedis_connection': (EnedisConnectionSerializer, {}),
+		'commissioning': (CommissioningSerializer, {}),
+		'invoice': (InvoiceSerializer, {}),
+		'cerfa16702': (Cerfa16702Serializer, {}),
+		'electrical_diagram': (ElectricalDiagramSerializer, {}),
+		'enedis_mandate': (EnedisMandateSerializer, {}),
+		'consuels': (ConsuelSerializer, {'many': True}),
+		'quotes': (serializers.SerializerMethodField, {}),
+	}
+	field_relations = FORM_DETAIL_RELATIONS
+
+	def get_quotes(self, obj):
+		return form_quotes(obj, self.context)
+
 	def create(self, validated_data):
 		# Extraire les champs qui ne vont pas dans le modèle Form
 		client_first_name = validated_data.pop('client_first_name', None)
@@ -142,7 +210,7 @@ class FormSerializer(serializers.ModelSerializer):
 		# Créer la fiche d'installation normalement
 		return super().create(validated_data)
 
-class FormDetailSerializer(serializers.ModelSerializer):
+class FormDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	created_by = UserMiniSerializer(read_only=True)
 	client = UserMiniSerializer(read_only=True)
 	technical_visit = TechnicalVisitSerializer(read_only=True)
@@ -177,12 +245,7 @@ class FormDetailSerializer(serializers.ModelSerializer):
 			'cerfa16702', 'electrical_diagram', 'enedis_mandate', 'quotes', 'invoice', 'consuels'
 		]
 
+	field_relations = FORM_DETAIL_RELATIONS
+
 	def get_quotes(self, obj):
-		offer = getattr(obj, 'offer', None)
-		if not offer:
-			return None
-		if hasattr(offer, 'quotes'):
-			quotes = offer.quotes.order_by('-version', '-created_at')
-		if quotes:
-			return QuotePDFSerializer(quotes, many=True, context=self.context).data
-		return None
+		return form_quotes(obj, self.context)
@@ -0,0 +1,46 @@
+"""
+Signaux de l'app installations.
+
+Synchronise le registre des commissions :
+- à chaque enregistrement d'une fiche touchant aux champs de commission
+  (copie depuis le devis, paiement, édition, client) ;
+- au changement de source ou de commercial d'une demande (bénéficiaires).
+Les mises à jour en masse (queryset.update) doivent appeler
+`sync_commission_ledger` ou mettre à jour le registre elles-mêmes ; la
+commande `rebuild_commission_ledger` rattrape les écarts.
+"""
+from django.db.models.signals import post_save
+
+from request.models import ProspectRequest
+from .commissions import BENEFICIARY_FIELDS, COMMISSION_FIELDS, sync_commission_ledger, sync_request_beneficiaries
+from .models import Form
+
+
+def _sync_commission_ledger(sender, instance, created, update_fields=None, **kwargs):
+    """Resynchronise le registre si un champ de commission a pu changer."""
+    if kwargs.get('raw'):
+        return
+    if update_fields is not None and not COMMISSION_FIELDS.intersection(update_fields):
+        return
+    if created and not (instance.commission_amount or instance.sales_commission_amount):
+        return
+    sync_commission_ledger(instance)
+
+
+def _sync_request_beneficiaries(sender, instance, created, update_fields=None, **kwargs):
+    """Reporte sur le registre un changement de source ou de commercial de la demande."""
+    if kwargs.get('raw') or created:
+        return
+    if update_fields is not None and not BENEFICIARY_FIELDS.intersection(update_fields):
+        return
+    beneficiaries = (instance.source_id, instance.assigned_to_id)
+    if getattr(instance, '_original_beneficiaries', None) == beneficiaries:
+        return
+    sync_request_beneficiaries(instance)
+    instance._original_beneficiaries = beneficiaries
+
+
+post_save.connect(_sync_commission_ledger, sender=Form, dispatch_uid='installations_sync_commission_ledger')
+post_save.connect(
+    _sync_request_beneficiaries, sender=ProspectRequest, dispatch_uid='installations_sync_request_beneficiaries'
+)
@@ -23,11 +23,16 @@ from administrative.models import EnedisMandate
 from administrative.serializers import EnedisMandateSerializer
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
+from EuropGreenSolar.fieldsets import SparseFieldsetViewMixin
+from EuropGreenSolar.pagination import KeysetPagination
+from EuropGreenSolar.search import search_queryset
 
 
-class FormViewSet(viewsets.ModelViewSet):
-	queryset = Form.objects.select_related('offer', 'created_by').all()
+class FormViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+	# Relations chargées selon les champs servis (?fields= / ?expand=), voir EuropGreenSolar.fieldsets
+	queryset = Form.objects.all()
 	serializer_class = FormSerializer
+	pagination_class = KeysetPagination
 	permission_classes = [permissions.IsAuthenticated]
 
 	# ----------------------
@@ -165,8 +170,13 @@ class FormViewSet(viewsets.ModelViewSet):
 
 		transaction.on_commit(lambda fid=str(str(form.id).split('-')[0]), related=cfg['related'], renderer=cfg['renderer'], fname=cfg['filename'], fattr=cfg['fileattr']: _gen_pdf_after_commit(fid, related, renderer, fname, fattr))
 
+	def get_serializer_class(self):
+		if getattr(self, 'action', None) == 'retrieve':
+			return FormDetailSerializer
+		return super().get_serializer_class()
+
 	def get_queryset(self):
-		qs = Form.objects.select_related('offer', 'created_by', 'client')
+		qs = Form.objects.all()
 		if getattr(self, 'action', None) == 'retrieve':
 			return qs
 		user = getattr(self.request, 'user', None)
@@ -204,6 +214,13 @@ class FormViewSet(viewsets.ModelViewSet):
 		elif affected_user_param:
 			base_qs = base_qs.filter(affected_user_id=affected_user_param)
 
+		# Recherche sur l'adresse du chantier ou l'identité du client
+		base_qs = search_queryset(
+			base_qs, params.get('search'),
+			Form.SEARCH_FIELDS, tuple(f'client__{field}' for field in User.SEARCH_FIELDS),
+			ranked=not self.paginator.is_active(self.request),
+		)
+
 		return base_qs
 
 	def get_permissions(self):
@@ -247,7 +264,7 @@ class FormViewSet(viewsets.ModelViewSet):
 		offer.installation_moved_at = timezone.now()
 		offer.save(update_fields=["installation_moved_at", "updated_at"])
 		# 1) Récupérer le dernier devis de l'offre et générer le PDF signé
-		quote = Quote.objects.filter(offer=form.offer).order_by('-version').first()
+		quote = Quote.objects.filter(offer=form.offer, is_latest=True).first()
 		pdf_attachment = None
 		if quote:
 			# Copier les commissions du devis vers la fiche d'installation
@@ -346,11 +363,6 @@ class FormViewSet(viewsets.ModelViewSet):
 			pass
 		return Response({'status': 'assigned', 'installer_id': str(installer.id)}, status=status.HTTP_200_OK)
 
-	def retrieve(self, request, *args, **kwargs):
-		instance = self.get_object()
-		serializer = FormDetailSerializer(instance, context=self.get_serializer_context())
-		return Response(serializer.data)
-
 	@action(detail=True, methods=['post'], url_path='technical-visit')
 	@transaction.atomic
 	def create_or_update_technical_visit(self, request, pk=None):
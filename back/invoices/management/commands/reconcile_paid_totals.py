@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from invoices.models import reconcile_paid_totals
+
+
+class Command(BaseCommand):
+    help = 'Recalcule depuis les paiements les montants payés, statuts de facture et échéances réglées divergents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compter les écarts sans rien corriger',
+        )
+
+    def handle(self, *args, **options):
+        invoices, installments = reconcile_paid_totals(dry_run=options['dry_run'])
+        verb = 'à corriger' if options['dry_run'] else 'corrigé(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f'{invoices} facture(s) et {installments} échéance(s) {verb}'
+        ))
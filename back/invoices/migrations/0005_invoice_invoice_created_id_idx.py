@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0002_initial'),
+        ('installations', '0004_form_form_created_id_idx'),
+        ('invoices', '0004_invoice_invoice_updated_at_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['created_at', 'id'], name='invoice_created_id_idx'),
+        ),
+    ]
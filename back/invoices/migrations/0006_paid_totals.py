@@ -0,0 +1,39 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:37
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_paid_totals(apps, schema_editor):
+    Payment = apps.get_model('invoices', 'Payment')
+    for model_name, fk in (('Invoice', 'invoice'), ('Installment', 'installment')):
+        paid = Payment.objects.filter(**{fk: models.OuterRef('pk')}).order_by().values(fk).annotate(
+            s=models.Sum('amount')
+        ).values('s')[:1]
+        apps.get_model('invoices', model_name).objects.update(paid_total=Coalesce(
+            models.Subquery(paid), models.Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0005_invoice_invoice_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='installment',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_paid_totals, migrations.RunPython.noop),
+    ]
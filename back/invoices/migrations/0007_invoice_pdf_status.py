@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:39
+
+from django.db import migrations, models
+
+
+def mark_existing_pdfs_ready(apps, schema_editor):
+    Invoice = apps.get_model('invoices', 'Invoice')
+    Invoice.objects.exclude(pdf='').exclude(pdf__isnull=True).update(pdf_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0006_paid_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_requested_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_status',
+            field=models.CharField(choices=[('none', 'Non demandé'), ('pending', 'En cours de génération'), ('ready', 'Généré'), ('failed', 'Échec')], default='none', editable=False, max_length=10),
+        ),
+        migrations.RunPython(mark_existing_pdfs_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Paiements existants : dernière modification connue = enregistrement
+    Payment = apps.get_model('invoices', 'Payment')
+    Payment.objects.update(updated_at=models.F('created_at'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0007_invoice_pdf_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='payment',
+            name='payment_created_at_idx',
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_at_idx'),
+        ),
+    ]
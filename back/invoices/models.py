@@ -1,9 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils import timezone
 import uuid
 from decimal import Decimal
 
+from billing.numbering import INVOICE_SERIES, next_document_number
+
 
 class Invoice(models.Model):
     class Status(models.TextChoices):
@@ -13,6 +16,12 @@ class Invoice(models.Model):
         PAID = "paid", "Payée"
         CANCELLED = "cancelled", "Annulée"
 
+    class PdfStatus(models.TextChoices):
+        NONE = "none", "Non demandé"
+        PENDING = "pending", "En cours de génération"
+        READY = "ready", "Généré"
+        FAILED = "failed", "Échec"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     number = models.CharField(max_length=32, unique=True, blank=True)
 
@@ -44,9 +53,15 @@ class Invoice(models.Model):
     discount_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     tax_rate = models.DecimalField(max_digits=5, decimal_places=2, default=20)
     total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Somme des paiements, maintenue par Payment.save / delete (voir sync_paid_totals)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
 
     # PDF généré de la facture
     pdf = models.FileField(upload_to="invoices/pdfs/", null=True, blank=True)
+    # Génération en arrière-plan à la facture soldée (voir invoices.pdf)
+    pdf_status = models.CharField(max_length=10, choices=PdfStatus.choices, default=PdfStatus.NONE, editable=False)
+    pdf_requested_at = models.DateTimeField(null=True, blank=True, editable=False)
+    pdf_error = models.TextField(blank=True, editable=False)
 
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.ISSUED)
 
@@ -65,6 +80,12 @@ class Invoice(models.Model):
         ordering = ["-issue_date", "-created_at"]
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
+        indexes = [
+            # Export comptable incrémental (watermark sur updated_at)
+            models.Index(fields=["updated_at"], name="invoice_updated_at_idx"),
+            # Pagination keyset de la liste (EuropGreenSolar.pagination)
+            models.Index(fields=["created_at", "id"], name="invoice_created_id_idx"),
+        ]
 
     @property
     def is_standalone(self) -> bool:
@@ -80,8 +101,11 @@ class Invoice(models.Model):
 
     @property
     def amount_paid(self) -> Decimal:
-        total = self.payments.aggregate(s=models.Sum("amount")) or {"s": Decimal("0")}
-        return total.get("s") or Decimal("0")
+        return self.paid_total or Decimal("0")
+
+    @property
+    def is_fully_paid(self) -> bool:
+        return bool(self.total) and self.total > 0 and self.amount_paid >= self.total
 
     @property
     def balance_due(self) -> Decimal:
@@ -101,15 +125,11 @@ class Invoice(models.Model):
     def save(self, *args, **kwargs):
         # Générer un numéro unique si manquant: F-YYYY-####
         if not self.number:
-            year = timezone.now().year
-            base = f"F-{year}-"
-            seq = 1
-            while True:
-                candidate = f"{base}{seq:04d}"
-                if not Invoice.objects.filter(number=candidate).exists():
-                    self.number = candidate
-                    break
-                seq += 1
+            # Compteur verrouillé jusqu'au commit : pas de trou si l'insertion échoue
+            with transaction.atomic(using=kwargs.get("using")):
+                self.number = next_document_number(INVOICE_SERIES, using=kwargs.get("using"))
+                super().save(*args, **kwargs)
+            return
         super().save(*args, **kwargs)
 
 
@@ -165,6 +185,8 @@ class Installment(models.Model):
     percentage = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     is_paid = models.BooleanField(default=False)
+    # Somme des paiements rattachés, maintenue comme Invoice.paid_total
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
 
     # position supprimé : l'ordre se base maintenant sur due_date puis created_at
 
@@ -196,24 +218,139 @@ class Payment(models.Model):
 
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="created_payments")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = "invoices_payment"
         ordering = ["-date", "-created_at"]
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
+        indexes = [
+            # Export comptable incrémental (watermark sur updated_at)
+            models.Index(fields=["updated_at"], name="payment_updated_at_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Paiement de {self.amount}€ - {self.date.strftime('%d/%m/%Y')} ({self.method or 'Non précisé'})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Rattachements d'origine : un paiement déplacé met aussi à jour les anciens totaux
+        instance._original_refs = (instance.__dict__.get("invoice_id"), instance.__dict__.get("installment_id"))
+        return instance
+
+    def _affected(self):
+        """(factures, échéances) dont les totaux dépendent de ce paiement, avant et après."""
+        invoice_ids = {self.invoice_id}
+        installment_ids = {self.installment_id}
+        original_invoice_id, original_installment_id = getattr(self, "_original_refs", (None, None))
+        invoice_ids.add(original_invoice_id)
+        installment_ids.add(original_installment_id)
+        return invoice_ids - {None}, installment_ids - {None}
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Mettre à jour le statut de la facture et l'état de l'échéance liée
-        invoice = self.invoice
-        if self.installment and self.installment.amount:
-            total_paid = self.installment.payments.aggregate(s=models.Sum("amount")).get("s") or Decimal("0")
-            if total_paid >= (self.installment.amount or Decimal("0")):
-                self.installment.is_paid = True
-                self.installment.save(update_fields=["is_paid", "updated_at"])
-        invoice.refresh_status()
-        invoice.save(update_fields=["status", "updated_at"])
+        # Paiement et totaux de la facture / de l'échéance dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            sync_paid_totals(*self._affected(), invoice=self.invoice, installment=self.installment)
+        self._original_refs = (self.invoice_id, self.installment_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            affected = self._affected()
+            result = super().delete(*args, **kwargs)
+            sync_paid_totals(*affected, invoice=self.invoice, installment=self.installment)
+        return result
+
+
+def _payments_sum(payments) -> Decimal:
+    return payments.aggregate(s=models.Sum("amount")).get("s") or Decimal("0")
+
+
+def sync_paid_totals(invoice_ids, installment_ids=(), invoice=None, installment=None):
+    """Recalcule paid_total des factures et échéances données, et les statuts qui en dépendent.
+
+    La facture est verrouillée (SELECT ... FOR UPDATE) et recalculée sur la
+    ligne relue : deux paiements concurrents sur une même facture sont
+    comptés l'un après l'autre, sans écraser la facture avec une instance
+    périmée. Une facture soldée sans PDF voit sa génération programmée au commit.
+    `invoice` / `installment` : instances en mémoire qui reçoivent les valeurs recalculées.
+    """
+    from .pdf import schedule_invoice_pdf  # invoices.pdf importe ce module
+
+    with transaction.atomic():
+        for locked in Invoice.objects.select_for_update().filter(pk__in=invoice_ids).order_by("pk"):
+            locked.paid_total = _payments_sum(Payment.objects.filter(invoice_id=locked.pk))
+            locked.refresh_status()
+            fields = ["paid_total", "status", "updated_at"]
+            if schedule_invoice_pdf(locked):
+                fields += ["pdf_status", "pdf_requested_at", "pdf_error"]
+            locked.save(update_fields=fields)
+            if invoice is not None and invoice.pk == locked.pk:
+                for field in fields:
+                    setattr(invoice, field, getattr(locked, field))
+        for item in Installment.objects.select_for_update().filter(pk__in=installment_ids).order_by("pk"):
+            item.paid_total = _payments_sum(Payment.objects.filter(installment_id=item.pk))
+            if item.amount:
+                item.is_paid = item.paid_total >= item.amount
+            fields = ["paid_total", "is_paid", "updated_at"]
+            item.save(update_fields=fields)
+            if installment is not None and installment.pk == item.pk:
+                for field in fields:
+                    setattr(installment, field, getattr(item, field))
+
+
+def _payments_sum_expression(fk):
+    """Somme des paiements rattachés (sous-requête), 0 sans paiement."""
+    return Coalesce(
+        models.Subquery(
+            Payment.objects.filter(**{fk: models.OuterRef("pk")}).order_by().values(fk)
+            .annotate(s=models.Sum("amount")).values("s")[:1]
+        ),
+        models.Value(Decimal("0")),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def drifted_invoices():
+    """Factures dont paid_total ou le statut de paiement ne suivent plus les paiements."""
+    Status = Invoice.Status
+    paid, partially_paid = models.Q(actual__gte=models.F("total")), models.Q(actual__lt=models.F("total"))
+    wrong_status = ~models.Q(status=Status.CANCELLED) & (
+        models.Q(actual__lte=0, status__in=[Status.PARTIALLY_PAID, Status.PAID])
+        | (models.Q(actual__gt=0) & partially_paid & ~models.Q(status=Status.PARTIALLY_PAID))
+        | (models.Q(actual__gt=0) & paid & ~models.Q(status=Status.PAID))
+    )
+    return (
+        Invoice.objects.annotate(actual=_payments_sum_expression("invoice"))
+        .filter(~models.Q(paid_total=models.F("actual")) | wrong_status)
+    )
+
+
+def drifted_installments():
+    """Échéances dont paid_total ou is_paid ne suivent plus les paiements."""
+    return (
+        Installment.objects.annotate(actual=_payments_sum_expression("installment"))
+        .filter(
+            ~models.Q(paid_total=models.F("actual"))
+            | models.Q(amount__gt=0, is_paid=True, actual__lt=models.F("amount"))
+            | models.Q(amount__gt=0, is_paid=False, actual__gte=models.F("amount"))
+        )
+    )
+
+
+def reconcile_paid_totals(dry_run=False, batch_size=500):
+    """Corrige les factures et échéances désynchronisées de leurs paiements.
+
+    Les lignes divergentes (voir `drifted_invoices` / `drifted_installments`)
+    sont repassées par lots dans `sync_paid_totals` : paid_total, statut de la
+    facture, is_paid de l'échéance, et PDF programmé si la facture se retrouve soldée.
+    Retourne (factures, échéances) corrigées (ou à corriger avec `dry_run`).
+    """
+    invoice_ids = list(drifted_invoices().values_list("pk", flat=True))
+    installment_ids = list(drifted_installments().values_list("pk", flat=True))
+    if not dry_run:
+        for start in range(0, max(len(invoice_ids), len(installment_ids)), batch_size):
+            sync_paid_totals(invoice_ids[start:start + batch_size], installment_ids[start:start + batch_size])
+    return len(invoice_ids), len(installment_ids)
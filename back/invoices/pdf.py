@@ -0,0 +1,150 @@
+"""
+Émission du PDF des factures totalement payées.
+
+Quand un paiement solde une facture (voir `sync_paid_totals`), la facture passe
+en `pdf_status = pending` et la tâche Celery `invoices.tasks.generate_invoice_pdf`
+est mise en file au commit. La tâche rend la page d'impression du front via
+Playwright, hors du temps de réponse de l'API paiement :
+
+- idempotente : une facture qui a déjà son PDF n'est pas re-rendue, et deux
+  exécutions concurrentes n'enregistrent qu'un fichier (ligne verrouillée) ;
+- réessayée avec un délai croissant (INVOICE_PDF_MAX_RETRIES) puis marquée
+  `failed` avec l'erreur ; un nouveau paiement la redemande ;
+- les factures restées `pending` (file indisponible au commit) sont remises en
+  file par la tâche périodique `retry_pending_invoice_pdfs`.
+"""
+
+import asyncio
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Invoice
+
+logger = logging.getLogger(__name__)
+
+
+async def _render_invoice_pdf_playwright_async(invoice_id: str) -> bytes:
+    from playwright.async_api import async_playwright  # type: ignore
+
+    base_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000').rstrip('/')
+    # Page d'impression unifiée pour toutes les factures
+    url = f"{base_url}/print/invoice/{invoice_id}"
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(args=["--no-sandbox", "--disable-dev-shm-usage"])  # type: ignore
+        context = await browser.new_context()
+        try:
+            page = await context.new_page()
+            await page.goto(url, wait_until="networkidle")
+            return await page.pdf(
+                format="A4",
+                print_background=True,
+                display_header_footer=True,
+                footer_template='''
+                    <div style="font-size:10px; color:#666; width:100%; padding:6px 10px; text-align:center;">
+                        Page <span class="pageNumber"></span> / <span class="totalPages"></span>
+                    </div>
+                ''',
+            )
+        finally:
+            try:
+                await context.close()
+            except Exception:
+                pass
+            try:
+                await browser.close()
+            except Exception:
+                pass
+
+
+def render_invoice_pdf(invoice: Invoice) -> bytes:
+    """Rend le PDF de la facture via la page front dédiée (lève une exception en cas d'échec)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop and loop.is_running():
+        new_loop = asyncio.new_event_loop()
+        try:
+            pdf_bytes = new_loop.run_until_complete(_render_invoice_pdf_playwright_async(str(invoice.id)))
+        finally:
+            new_loop.close()
+    else:
+        pdf_bytes = asyncio.run(_render_invoice_pdf_playwright_async(str(invoice.id)))
+    if not pdf_bytes:
+        raise RuntimeError(f"PDF vide pour la facture {invoice.number}")
+    return pdf_bytes
+
+
+def schedule_invoice_pdf(invoice: Invoice) -> bool:
+    """
+    Passe la facture en `pending` si elle vient d'être soldée et n'a pas de PDF.
+
+    À appeler dans la transaction qui enregistre la facture (champs modifiés en
+    mémoire, à inclure dans la sauvegarde) : la tâche est mise en file au commit.
+    """
+    if invoice.pdf or not invoice.is_fully_paid:
+        return False
+    if invoice.pdf_status in (Invoice.PdfStatus.PENDING, Invoice.PdfStatus.READY):
+        return False
+    invoice.pdf_status = Invoice.PdfStatus.PENDING
+    invoice.pdf_requested_at = timezone.now()
+    invoice.pdf_error = ""
+    transaction.on_commit(lambda invoice_id=str(invoice.pk): enqueue_invoice_pdf(invoice_id))
+    return True
+
+
+def enqueue_invoice_pdf(invoice_id: str) -> None:
+    from .tasks import generate_invoice_pdf
+
+    try:
+        generate_invoice_pdf.delay(invoice_id)
+    except Exception:
+        # Reste `pending` : repris par retry_pending_invoice_pdfs
+        logger.exception("File Celery indisponible : PDF de la facture %s différé", invoice_id)
+
+
+def issue_invoice_pdf(invoice_id) -> str:
+    """Génère et enregistre le PDF d'une facture soldée ; retourne le pdf_status final."""
+    invoice = Invoice.objects.filter(pk=invoice_id).first()
+    if invoice is None:
+        return 'missing'
+    if not invoice.pdf and not invoice.is_fully_paid:
+        # Paiement annulé entre-temps
+        Invoice.objects.filter(pk=invoice.pk, pdf_status=Invoice.PdfStatus.PENDING).update(
+            pdf_status=Invoice.PdfStatus.NONE
+        )
+        return Invoice.PdfStatus.NONE
+
+    pdf_bytes = render_invoice_pdf(invoice) if not invoice.pdf else None
+    with transaction.atomic():
+        locked = Invoice.objects.select_for_update().get(pk=invoice.pk)
+        fields = ["pdf_status", "pdf_error", "updated_at"]
+        if not locked.pdf and pdf_bytes:
+            safe_number = re.sub(r"[^A-Za-z0-9_-]", "_", locked.number or str(locked.id))
+            locked.pdf.save(f"{safe_number}.pdf", ContentFile(pdf_bytes), save=False)
+            locked.refresh_status()  # statut peut dépendre de la présence du PDF
+            fields += ["pdf", "status"]
+        locked.pdf_status = Invoice.PdfStatus.READY
+        locked.pdf_error = ""
+        locked.save(update_fields=fields)
+    return locked.pdf_status
+
+
+def mark_invoice_pdf_failed(invoice_id, error) -> None:
+    Invoice.objects.filter(pk=invoice_id, pdf_status=Invoice.PdfStatus.PENDING).update(
+        pdf_status=Invoice.PdfStatus.FAILED, pdf_error=str(error)[:2000], updated_at=timezone.now()
+    )
+
+
+def pending_invoice_pdfs(older_than=None):
+    """Factures en attente de PDF depuis plus de `older_than` (file perdue, worker arrêté)."""
+    older_than = older_than or timedelta(minutes=getattr(settings, 'INVOICE_PDF_PENDING_RETRY_MINUTES', 15))
+    return Invoice.objects.filter(
+        pdf_status=Invoice.PdfStatus.PENDING, pdf_requested_at__lt=timezone.now() - older_than
+    )
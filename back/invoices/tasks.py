@@ -0,0 +1,47 @@
+"""
+Tâches Celery des factures (émission des PDF, voir invoices.pdf).
+"""
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+
+@shared_task(name='invoices.tasks.generate_invoice_pdf', bind=True)
+def generate_invoice_pdf(self, invoice_id):
+    """
+    Génère le PDF d'une facture soldée.
+
+    Mis en file au commit du paiement qui solde la facture. En cas d'échec,
+    réessayée avec un délai croissant, puis facture marquée `failed`.
+    """
+    from invoices.pdf import issue_invoice_pdf, mark_invoice_pdf_failed
+
+    max_retries = getattr(settings, 'INVOICE_PDF_MAX_RETRIES', 3)
+    try:
+        status = issue_invoice_pdf(invoice_id)
+    except Exception as exc:
+        if self.request.retries >= max_retries:
+            mark_invoice_pdf_failed(invoice_id, exc)
+            print(f"[Factures] Échec du PDF de la facture {invoice_id} : {exc}")
+            return {'invoice_id': invoice_id, 'status': 'failed'}
+        raise self.retry(exc=exc, countdown=60 * 2 ** self.request.retries, max_retries=max_retries)
+    return {'invoice_id': invoice_id, 'status': status}
+
+
+@shared_task(name='invoices.tasks.retry_pending_invoice_pdfs')
+def retry_pending_invoice_pdfs():
+    """
+    Remet en file les PDF de factures restés en attente (file indisponible au commit).
+
+    Exécuté toutes les 30 minutes.
+    """
+    from invoices.pdf import pending_invoice_pdfs
+
+    invoice_ids = [str(pk) for pk in pending_invoice_pdfs().values_list('pk', flat=True)]
+    for invoice_id in invoice_ids:
+        generate_invoice_pdf.delay(invoice_id)
+    # Délai d'attente repart de maintenant
+    pending_invoice_pdfs().filter(pk__in=invoice_ids).update(pdf_requested_at=timezone.now())
+    print(f"[Factures] {len(invoice_ids)} PDF de facture remis en file")
+    return {'requeued': len(invoice_ids)}
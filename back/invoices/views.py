@@ -2,22 +2,21 @@ from rest_framework import viewsets, permissions, mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
-from django.db import models, transaction
+from django.db import transaction
 from decimal import Decimal
 from django_filters.rest_framework import DjangoFilterBackend
-from django.conf import settings
-from django.core.files.base import ContentFile
-import asyncio
-import re
 
 from .models import Invoice, InvoiceLine, Installment, Payment
 from .serializers import InvoiceSerializer, PaymentSerializer, InstallmentSerializer
 from authentication.permissions import IsAdmin, HasRequestsAccess, HasAdministrativeAccess
+from EuropGreenSolar.pagination import KeysetPagination
 
 
 class InvoiceViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
-    queryset = Invoice.objects.all().select_related("installation", "quote")
+    # Lignes, échéances et paiements imbriqués ; montants payés lus sur la facture (paid_total)
+    queryset = Invoice.objects.all().select_related("installation", "quote").prefetch_related("lines", "installments", "payments")
     serializer_class = InvoiceSerializer
+    pagination_class = KeysetPagination
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = {
@@ -178,123 +177,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return [HasRequestsAccess()]
         return [IsAdmin()]
 
+    # Payment.save / delete mettent à jour, dans la même transaction, paid_total et
+    # statut de la facture, paid_total et is_paid de l'échéance (sync_paid_totals).
+    # Le PDF d'une facture soldée est généré en arrière-plan (invoices.pdf).
     def perform_create(self, serializer):
-        instance = serializer.save(created_by=self.request.user if self.request.user.is_authenticated else None)
-        invoice = self._post_payment_common(instance)
-        self._maybe_generate_invoice_pdf(invoice)
-
-    def perform_update(self, serializer):
-        instance = serializer.save()
-        invoice = self._post_payment_common(instance)
-        self._maybe_generate_invoice_pdf(invoice)
-
-    def perform_destroy(self, instance):
-        invoice = instance.invoice
-        installment = instance.installment
-        super().perform_destroy(instance)
-        # Recompute after delete
-        if installment and installment.amount:
-            total_paid = installment.payments.aggregate(s=models.Sum("amount")).get("s") or Decimal("0")
-            is_paid = total_paid >= (installment.amount or Decimal("0"))
-            if installment.is_paid != is_paid:
-                installment.is_paid = is_paid
-                installment.save(update_fields=["is_paid", "updated_at"])
-        invoice.refresh_status()
-        invoice.save(update_fields=["status", "updated_at"]) 
-
-    # ------------------------- Utilitaires internes ------------------------- #
-    def _post_payment_common(self, payment: Payment) -> Invoice:
-        """Met à jour l'échéance liée et le statut de la facture après un paiement."""
-        invoice = payment.invoice
-        if payment.installment and payment.installment.amount:
-            total_paid = payment.installment.payments.aggregate(s=models.Sum("amount")).get("s") or Decimal("0")
-            is_paid = total_paid >= (payment.installment.amount or Decimal("0"))
-            if payment.installment.is_paid != is_paid:
-                payment.installment.is_paid = is_paid
-                payment.installment.save(update_fields=["is_paid", "updated_at"])
-        invoice.refresh_status()
-        invoice.save(update_fields=["status", "updated_at"])
-        return invoice
-
-    def _maybe_generate_invoice_pdf(self, invoice: Invoice) -> None:
-        """Génère et enregistre le PDF de facture si totalement payée et pas déjà généré.
-
-        Conditions:
-        - total > 0
-        - amount_paid >= total
-        - pas de pdf existant (on évite la régénération pour l'instant)
-        """
-        try:
-            if not invoice.total or invoice.total <= 0:
-                return
-            if invoice.amount_paid < invoice.total:
-                return
-            if invoice.pdf:  # déjà généré
-                return
-            pdf_bytes = self._render_invoice_pdf(invoice)
-            if not pdf_bytes:
-                return
-            safe_number = re.sub(r"[^A-Za-z0-9_-]", "_", invoice.number or str(invoice.id))
-            filename = f"{safe_number}.pdf"
-            invoice.pdf.save(filename, ContentFile(pdf_bytes), save=False)
-            invoice.refresh_status()  # statut peut dépendre de la présence du PDF
-            invoice.save(update_fields=["pdf", "status", "updated_at"])
-        except Exception:
-            # On ignore silencieusement pour ne pas bloquer l'API paiement
-            pass
-
-    # --------------------- Génération PDF via Playwright --------------------- #
-    def _render_invoice_pdf(self, invoice: Invoice) -> bytes | None:
-        """Rend le PDF de la facture via la page front dédiée.
-
-        Retourne les bytes du PDF ou None si échec.
-        """
-        base_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000').rstrip('/')
-        
-        # Utiliser la page d'impression unifiée pour toutes les factures
-        url = f"{base_url}/print/invoice/{invoice.id}"
-
-        async def _async_render() -> bytes:
-            from playwright.async_api import async_playwright  # type: ignore
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(args=["--no-sandbox", "--disable-dev-shm-usage"])  # type: ignore
-                context = await browser.new_context()
-                try:
-                    page = await context.new_page()
-                    await page.goto(url, wait_until="networkidle")
-                    pdf_bytes = await page.pdf(
-                        format="A4",
-                        print_background=True,
-                        display_header_footer=True,
-                        footer_template='''
-                            <div style="font-size:10px; color:#666; width:100%; padding:6px 10px; text-align:center;">
-                                Page <span class="pageNumber"></span> / <span class="totalPages"></span>
-                            </div>
-                        ''',
-                    )
-                    return pdf_bytes
-                finally:
-                    try:
-                        await context.close()
-                    except Exception:
-                        pass
-                    try:
-                        await browser.close()
-                    except Exception:
-                        pass
-
-        try:
-            try:
-                loop = asyncio.get_running_loop()
-            except RuntimeError:
-                loop = None
-            if loop and loop.is_running():
-                new_loop = asyncio.new_event_loop()
-                try:
-                    return new_loop.run_until_complete(_async_render())
-                finally:
-                    new_loop.close()
-            else:
-                return asyncio.run(_async_render())
-        except Exception:
-            return None
+        serializer.save(created_by=self.request.user if self.request.user.is_authenticated else None)
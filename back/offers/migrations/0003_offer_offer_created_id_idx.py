@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0002_initial'),
+        ('request', '0003_prospectrequest_request_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['created_at', 'id'], name='offer_created_id_idx'),
+        ),
+    ]
@@ -39,11 +39,18 @@ class Offer(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	# Document de recherche (EuropGreenSolar.search), indexé par la migration 0004
+	SEARCH_FIELDS = ("first_name", "last_name", "email", "phone", "address")
+
 	class Meta:
 		db_table = "offers_offer"
 		ordering = ["-created_at"]
 		verbose_name = "Offre"
 		verbose_name_plural = "Offres"
+		indexes = [
+			# Pagination keyset de la liste (EuropGreenSolar.pagination)
+			models.Index(fields=["created_at", "id"], name="offer_created_id_idx"),
+		]
 
 	def __str__(self) -> str:
 		return f"Offre pour {self.first_name} {self.last_name} - {self.get_status_display()}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from EuropGreenSolar.fieldsets import Relations, SparseFieldsetMixin
 from .models import Offer
-from billing.serializers import QuoteSerializer
+from billing.serializers import QuoteSerializer, QuoteSummarySerializer
 from request.models import ProspectRequest
 
 class ProspectRequestMiniSerializer(serializers.ModelSerializer):
@@ -18,7 +19,7 @@ class OfferBaseSerializer(serializers.ModelSerializer):
 		]
 		read_only_fields = ['id']
 
-class OfferSerializer(serializers.ModelSerializer):
+class OfferSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
 	last_quote = serializers.SerializerMethodField()
 	notes = serializers.ListField(child=serializers.DictField(), read_only=True)
 	class Meta:
@@ -29,12 +30,22 @@ class OfferSerializer(serializers.ModelSerializer):
 		]
 		read_only_fields = ['id', 'request', 'created_at', 'updated_at']
 
+	# ?expand=request : identité de la demande d'origine au lieu de son id
+	expandable_fields = {'request': (ProspectRequestMiniSerializer, {})}
+	# last_quote : préchargé par OfferViewSet.get_queryset (dépend de ?last_quote=summary)
+	field_relations = {'request': Relations(select=('request',))}
+
 	def get_last_quote(self, obj: Offer):
-		quote = obj.quotes.order_by('-version', '-created_at').first()
+		# Préchargé par OfferViewSet (Prefetch to_attr), requête unitaire sinon
+		if hasattr(obj, 'latest_quotes'):
+			quote = obj.latest_quotes[0] if obj.latest_quotes else None
+		else:
+			quote = obj.quotes.filter(is_latest=True).first()
 		if not quote:
 			return None
+		serializer_class = QuoteSummarySerializer if self.context.get('last_quote_summary') else QuoteSerializer
 		# Propager le contexte (request) pour construire des URLs absolues
-		return QuoteSerializer(quote, context=self.context).data
+		return serializer_class(quote, context=self.context).data
 
 
 class OfferReturnToRequestSerializer(serializers.Serializer):
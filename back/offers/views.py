@@ -2,14 +2,18 @@ from rest_framework import viewsets, mixins
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from drf_spectacular.utils import extend_schema, extend_schema_view
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from .models import Offer
+from billing.models import Quote
 from .serializers import OfferSerializer, OfferReturnToRequestSerializer, OfferAddNoteSerializer
 from authentication.permissions import HasOfferAccess
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
+from EuropGreenSolar.fieldsets import SparseFieldsetViewMixin
+from EuropGreenSolar.pagination import KeysetPagination
+from EuropGreenSolar.search import search_queryset
 
 
 @extend_schema_view(
@@ -18,6 +22,7 @@ from django.utils import timezone
 	partial_update=extend_schema(summary="Mettre à jour partiellement une offre"),
 )
 class OfferViewSet(
+	SparseFieldsetViewMixin,
 	mixins.ListModelMixin,
 	mixins.RetrieveModelMixin,
 	mixins.UpdateModelMixin,
@@ -25,6 +30,7 @@ class OfferViewSet(
 ):
 	queryset = Offer.objects.all().order_by('-created_at')
 	serializer_class = OfferSerializer
+	pagination_class = KeysetPagination
 	parser_classes = [JSONParser, FormParser, MultiPartParser]
 	permission_classes = [HasOfferAccess]
 
@@ -42,21 +48,35 @@ class OfferViewSet(
 		if created_to:
 			qs = qs.filter(created_at__date__lte=created_to)
 
-		search = self.request.query_params.get('search')
-		if search:
-			s = search.strip()
-			qs = qs.filter(
-				Q(first_name__icontains=s)
-				| Q(last_name__icontains=s)
-				| Q(email__icontains=s)
-				| Q(phone__icontains=s)
-				| Q(address__icontains=s)
-			)
+		# Recherche trigrammes (PostgreSQL) classée par pertinence hors pagination keyset, icontains sous SQLite
+		qs = search_queryset(
+			qs, self.request.query_params.get('search'), Offer.SEARCH_FIELDS,
+			ranked=not self.paginator.is_active(self.request),
+		)
 		if not user.is_superuser and user.is_staff:
 			qs = qs.filter(
 				Q(request__assigned_to_id=user.id) | Q(request__created_by_id=user.id) | Q(request__source_id=user.id)
 			)
-		return qs
+
+		# Dernier devis de chaque offre en une seule requête (drapeau Quote.is_latest),
+		# lu par OfferSerializer.get_last_quote : nombre de requêtes indépendant de la page
+		if not OfferSerializer.serves_field(self.request, 'last_quote'):
+			return qs
+		latest_quotes = Quote.objects.filter(is_latest=True).select_related('signature')
+		if not self.last_quote_summary:
+			latest_quotes = latest_quotes.prefetch_related('lines')
+		return qs.prefetch_related(Prefetch('quotes', queryset=latest_quotes, to_attr='latest_quotes'))
+
+	@property
+	def last_quote_summary(self):
+		"""?last_quote=summary : dernier devis résumé (sans lignes ni signature détaillée)."""
+		request = getattr(self, 'request', None)
+		return request is not None and request.query_params.get('last_quote') == 'summary'
+
+	def get_serializer_context(self):
+		context = super().get_serializer_context()
+		context['last_quote_summary'] = self.last_quote_summary
+		return context
 
 	def get_permissions(self):
 		# Rendre la route de détail publique (retrieve), le reste reste protégé
@@ -89,6 +89,8 @@ class Task(models.Model):
         indexes = [
             models.Index(fields=['due_date', 'status']),
             models.Index(fields=['assigned_to', 'status']),
+            # Pagination keyset de la liste (EuropGreenSolar.pagination)
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
         ]
 
     def __str__(self):
@@ -10,6 +10,7 @@ from .serializers import (
     TaskCreateSerializer, TaskUpdateSerializer
 )
 from authentication.permissions import IsAdmin
+from EuropGreenSolar.pagination import KeysetPagination
 
 
 class TaskViewSet(viewsets.ModelViewSet):
@@ -25,6 +26,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         'assigned_to', 'assigned_by', 'related_installation'
     ).all()
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
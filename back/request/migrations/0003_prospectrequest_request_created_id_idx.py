@@ -0,0 +1,19 @@
+# Generated by Django 5.1.4 on 2026-10-19 16:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prospectrequest',
+            index=models.Index(fields=['created_at', 'id'], name='request_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.4 on 2026-10-19 18:40
+
+from django.db import migrations
+
+from EuropGreenSolar.search import CreateSearchIndex
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('request', '0003_prospectrequest_request_created_id_idx'),
+    ]
+
+    operations = [
+        CreateSearchIndex(
+            model_name='prospectrequest',
+            name='request_search_trgm_idx',
+            fields=['first_name', 'last_name', 'email', 'phone'],
+        ),
+    ]
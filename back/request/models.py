@@ -81,11 +81,25 @@ class ProspectRequest(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	# Document de recherche (EuropGreenSolar.search), indexé par la migration 0004
+	SEARCH_FIELDS = ("first_name", "last_name", "email", "phone")
+
 	class Meta:
 		db_table = "requests_prospect"
 		ordering = ["-created_at"]
 		verbose_name = "Demande"
 		verbose_name_plural = "Demandes"
+		indexes = [
+			# Pagination keyset de la liste (EuropGreenSolar.pagination)
+			models.Index(fields=["created_at", "id"], name="request_created_id_idx"),
+		]
 
 	def __str__(self) -> str:
 		return f"Demande de {self.first_name} {self.last_name} - {self.get_status_display()}"
+
+	@classmethod
+	def from_db(cls, db, field_names, values):
+		instance = super().from_db(db, field_names, values)
+		# Bénéficiaires chargés : un changement resynchronise le registre des commissions
+		instance._original_beneficiaries = (instance.__dict__.get("source_id"), instance.__dict__.get("assigned_to_id"))
+		return instance
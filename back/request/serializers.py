@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from EuropGreenSolar.fieldsets import Relations, SparseFieldsetMixin
 from users.models import User
 from .models import ProspectRequest
 from offers.models import Offer
@@ -10,7 +11,7 @@ class AssignedToSerializer(serializers.ModelSerializer):
         fields = ["id", "first_name", "last_name", "email", "role"]
 
 
-class ProspectRequestSerializer(serializers.ModelSerializer):
+class ProspectRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     assigned_to = AssignedToSerializer(read_only=True)
     created_by = AssignedToSerializer(read_only=True)
     source = AssignedToSerializer(read_only=True)
@@ -36,6 +37,13 @@ class ProspectRequestSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["id", "created_at", "updated_at", "assigned_to", "created_by", "source"]
 
+    field_relations = {
+        "assigned_to": Relations(select=("assigned_to",)),
+        "created_by": Relations(select=("created_by",)),
+        "source": Relations(select=("source",)),
+        "offer": Relations(select=("offer",)),
+    }
+
     def validate(self, attrs):
         return super().validate(attrs)
 
@@ -59,7 +67,7 @@ class ProspectRequestSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ClientProspectRequestSerializer(serializers.ModelSerializer):
+class ClientProspectRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour les clients qui consultent leurs prospects parrainés."""
     offer = serializers.SerializerMethodField(read_only=True)
     installation = serializers.SerializerMethodField(read_only=True)
@@ -72,6 +80,11 @@ class ClientProspectRequestSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    field_relations = {
+        "offer": Relations(select=("offer",)),
+        "installation": Relations(select=("offer__installations_form",)),
+    }
+
     def get_offer(self, obj: ProspectRequest):
         """Retourne l'info minimale de l'offre liée: { id, status } ou None."""
         try:
@@ -88,9 +101,8 @@ class ClientProspectRequestSerializer(serializers.ModelSerializer):
             offer = obj.offer
             if not offer or not offer.installation_moved_at:
                 return None
-            # Récupérer l'installation via la relation inverse
-            from installations.models import Form
-            installation = Form.objects.filter(offer=offer).first()
+            # Fiche d'installation (OneToOne inverse), préchargée par ProspectRequestViewSet
+            installation = getattr(offer, "installations_form", None)
             if not installation:
                 return None
             return {
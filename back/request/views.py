@@ -14,6 +14,9 @@ from django.utils import timezone
 from offers.models import Offer
 from offers.serializers import OfferSerializer
 from django.contrib.auth import get_user_model
+from EuropGreenSolar.fieldsets import SparseFieldsetViewMixin
+from EuropGreenSolar.pagination import KeysetPagination
+from EuropGreenSolar.search import search_queryset
 
 
 @extend_schema_view(
@@ -23,9 +26,11 @@ from django.contrib.auth import get_user_model
 	partial_update=extend_schema(summary="Mettre à jour partiellement une demande"),
 	destroy=extend_schema(summary="Supprimer une demande"),
 )
-class ProspectRequestViewSet(viewsets.ModelViewSet):
-	queryset = ProspectRequest.objects.select_related("assigned_to", "offer").all()
+class ProspectRequestViewSet(SparseFieldsetViewMixin, viewsets.ModelViewSet):
+	# Relations chargées selon les champs servis (?fields=), voir EuropGreenSolar.fieldsets
+	queryset = ProspectRequest.objects.all()
 	serializer_class = ProspectRequestSerializer
+	pagination_class = KeysetPagination
 	http_method_names = ["get", "post", "patch", "delete"]
 	parser_classes = [MultiPartParser, FormParser, JSONParser]
 
@@ -103,13 +108,13 @@ class ProspectRequestViewSet(viewsets.ModelViewSet):
 		
 		# Portée de base selon le rôle
 		if user.is_superuser:
-			qs = ProspectRequest.objects.select_related("assigned_to", "offer")
+			qs = ProspectRequest.objects.all()
 		elif not user.is_staff:
 			# Utilisateur non staff (client): voir les demandes où il est source
-			qs = ProspectRequest.objects.select_related("assigned_to", "offer").filter(source_id=user.id)
+			qs = ProspectRequest.objects.filter(source_id=user.id)
 		else:
 			# Staff non-admin: ne voir que les demandes qui lui sont assignées
-			qs = ProspectRequest.objects.select_related("assigned_to", "offer").filter(
+			qs = ProspectRequest.objects.filter(
 					Q(assigned_to_id=user.id) | Q(created_by_id=user.id) | Q(source_id=user.id)
 				)
 
@@ -129,14 +134,11 @@ class ProspectRequestViewSet(viewsets.ModelViewSet):
 		if created_to:
 			qs = qs.filter(created_at__date__lte=created_to)
 
-		search = self.request.query_params.get("search")
-		if search:
-			qs = qs.filter(
-				Q(first_name__icontains=search)
-				| Q(last_name__icontains=search)
-				| Q(email__icontains=search)
-				| Q(phone__icontains=search)
-			)
+		# Recherche trigrammes (PostgreSQL) classée par pertinence hors pagination keyset, icontains sous SQLite
+		qs = search_queryset(
+			qs, self.request.query_params.get("search"), ProspectRequest.SEARCH_FIELDS,
+			ranked=not self.paginator.is_active(self.request),
+		)
 
 		# Scopes de filtrage en fin de chaîne
 		scope = self.request.query_params.get("scope")
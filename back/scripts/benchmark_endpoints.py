@@ -0,0 +1,140 @@
+"""
+Benchmark des endpoints critiques (dashboard, rapports, listes, commissions, timeline)
+Mesure, pour chaque endpoint, le nombre de requêtes SQL, le temps SQL et la
+latence (médiane, p95, max) sur la base configurée, idéalement peuplée avec :
+
+    python manage.py generate_synthetic_data --requests 100000
+
+Les caches du dashboard et des rapports sont invalidés avant chaque appel
+(mesure à froid), sauf avec --warm.
+
+Usage: python scripts/benchmark_endpoints.py [--iterations N] [--warm] [--only motif]
+"""
+
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EuropGreenSolar.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from EuropGreenSolar.query_profiling import QueryStats  # noqa: E402
+from admin_platform.report_cache import invalidate_reports_cache  # noqa: E402
+from admin_platform.synthetic import SYNTHETIC_DOMAIN  # noqa: E402
+from request.models import ProspectRequest  # noqa: E402
+from users.models import User  # noqa: E402
+
+
+def endpoints():
+    """(groupe, libellé, url) des endpoints mesurés."""
+    # Timeline de l'apporteur le plus actif : le pire cas de l'agrégation
+    busiest = (
+        ProspectRequest.objects.filter(source__isnull=False)
+        .values('source').annotate(total=Count('id')).order_by('-total').first()
+    )
+    period = 'start_date=2000-01-01&end_date=2100-12-31'
+    items = [
+        ('dashboard', 'overview', '/admin-platform/dashboard/overview/'),
+        ('dashboard', 'conversion_funnel', '/admin-platform/dashboard/conversion_funnel/'),
+        ('dashboard', 'conversion-cohorts', '/admin-platform/dashboard/conversion-cohorts/'),
+        ('dashboard', 'revenue_chart', '/admin-platform/dashboard/revenue_chart/'),
+        ('dashboard', 'sources_breakdown', '/admin-platform/dashboard/sources_breakdown/'),
+        ('dashboard', 'products_performance', '/admin-platform/dashboard/products_performance/'),
+        ('rapports', 'accounting-export (csv)', f'/admin-platform/reports/accounting-export/?{period}'),
+        ('rapports', 'sales-report', f'/admin-platform/reports/sales-report/?{period}'),
+        ('rapports', 'commissions-report', f'/admin-platform/reports/commissions-report/?{period}'),
+        ('rapports', 'prospects-report', f'/admin-platform/reports/prospects-report/?{period}'),
+        ('listes', 'requests', '/requests/'),
+        ('listes', 'offers', '/offers/'),
+        ('listes', 'quotes', '/quotes/'),
+        ('listes', 'installations', '/installations/forms/'),
+        ('listes', 'invoices', '/invoices/'),
+        ('listes', 'tasks', '/tasks/'),
+        ('listes', 'users', '/users/'),
+        ('commissions', 'list', '/installations/commissions/list/'),
+        ('commissions', 'ledger', '/installations/commissions/ledger/'),
+    ]
+    if busiest:
+        items.append(('timeline', 'user-timeline', f"/admin-platform/audit-logs/user-timeline/{busiest['source']}/"))
+    return items
+
+
+def call(client, url):
+    """Exécute la requête (corps en streaming consommé) et retourne (statut, octets)."""
+    response = client.get(url)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response.status_code, size
+
+
+def measure(client, url, iterations, warm):
+    timings, db_times = [], []
+    status = size = queries = 0
+    for _ in range(iterations):
+        if not warm:
+            invalidate_reports_cache()
+        counter = QueryStats()
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            status, size = call(client, url)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = counter.count
+        db_times.append(counter.duration * 1000)
+    return {
+        'status': status,
+        'size': size,
+        'queries': queries,
+        'db_ms': statistics.median(db_times),
+        'median_ms': statistics.median(timings),
+        'p95_ms': sorted(timings)[math.ceil(len(timings) * 0.95) - 1],
+        'max_ms': max(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5, help='Appels par endpoint (défaut: 5)')
+    parser.add_argument('--warm', action='store_true', help='Conserver les caches entre les appels')
+    parser.add_argument('--only', help='Ne mesurer que les endpoints dont le groupe ou le libellé contient ce motif')
+    args = parser.parse_args()
+
+    # Autorise l'hôte "testserver" du client de test
+    setup_test_environment()
+
+    admin = User.objects.filter(is_superuser=True).first()
+    if admin is None:
+        admin = User.objects.create_superuser(email=f"benchmark@{SYNTHETIC_DOMAIN}", password=None)
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    print(f"\nBenchmark endpoints - {ProspectRequest.objects.count()} demandes, "
+          f"{args.iterations} appels par endpoint ({'à chaud' if args.warm else 'à froid'})\n")
+    print(f"{'Groupe':<12} {'Endpoint':<26} {'HTTP':>4} {'Requêtes':>9} {'SQL ms':>9} "
+          f"{'Médiane ms':>11} {'p95 ms':>9} {'Max ms':>9} {'Taille Ko':>10}")
+
+    for group, label, url in endpoints():
+        if args.only and args.only not in group and args.only not in label:
+            continue
+        result = measure(client, url, args.iterations, args.warm)
+        print(f"{group:<12} {label:<26} {result['status']:>4} {result['queries']:>9} {result['db_ms']:>9.1f} "
+              f"{result['median_ms']:>11.1f} {result['p95_ms']:>9.1f} {result['max_ms']:>9.1f} "
+              f"{result['size'] / 1024:>10.0f}")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark de génération des rapports Excel (export comptable)
+Compare l'ancienne génération openpyxl en mémoire (style par cellule) avec
+le ReportWriter write-only (styles nommés, fichier temporaire).
+
+Usage: python scripts/benchmark_excel_reports.py [nombre_de_lignes]
+"""
+
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'EuropGreenSolar.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import openpyxl  # noqa: E402
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side  # noqa: E402
+
+from admin_platform.excel import ReportWriter  # noqa: E402
+
+
+HEADERS = [
+    'Numéro Facture', 'Date Émission', 'Date Échéance', 'Client', 'Montant HT (€)',
+    'TVA (%)', 'TVA (€)', 'Montant TTC (€)', 'Statut', 'Notes',
+]
+
+
+def fake_rows(count):
+    for index in range(count):
+        subtotal = 1000.0 + index % 500
+        yield {
+            'number': f"F-2025-{index:06d}",
+            'issue_date': '01/01/2025',
+            'due_date': '31/01/2025',
+            'client': f"Client {index}",
+            'subtotal': subtotal,
+            'tax_rate': 20.0,
+            'tax_amount': subtotal * 0.2,
+            'total': subtotal * 1.2,
+            'status': 'Payée',
+            'notes': '',
+        }
+
+
+def legacy_export(rows):
+    """Ancienne génération : classeur complet en mémoire, style appliqué à chaque cellule."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    border = Border(left=Side(style='thin'), right=Side(style='thin'),
+                    top=Side(style='thin'), bottom=Side(style='thin'))
+    for col_num, header in enumerate(HEADERS, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+        cell.border = border
+    keys = list(next(fake_rows(1)).keys())
+    for row_num, row in enumerate(rows, 2):
+        for col_num, key in enumerate(keys, 1):
+            ws.cell(row=row_num, column=col_num, value=row[key]).border = border
+        for col in [5, 6, 7, 8]:
+            ws.cell(row=row_num, column=col).number_format = '#,##0.00'
+    output = io.BytesIO()
+    wb.save(output)
+    return output.tell()
+
+
+def writer_export(rows):
+    """Nouvelle génération : ReportWriter write-only, styles nommés, fichier temporaire."""
+    writer = ReportWriter("Export Comptable")
+    writer.header(HEADERS, style='report_header_bordered')
+    text, amount = 'report_cell_bordered', 'report_amount_bordered'
+    for row in rows:
+        writer.row([
+            (row['number'], text), (row['issue_date'], text), (row['due_date'], text),
+            (row['client'], text), (row['subtotal'], amount), (row['tax_rate'], amount),
+            (row['tax_amount'], amount), (row['total'], amount), (row['status'], text),
+            (row['notes'], text),
+        ])
+    with tempfile.TemporaryFile() as output:
+        writer.workbook.save(output)
+        return output.tell()
+
+
+def measure(label, func, count):
+    # Débit mesuré sans tracemalloc (qui ralentit fortement l'exécution)
+    started = time.perf_counter()
+    size = func(fake_rows(count))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(fake_rows(count))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<12} {count / elapsed:>10.0f} lignes/s   "
+          f"{elapsed:>6.2f} s   pic mémoire {peak / 1024 / 1024:>7.1f} Mo   fichier {size / 1024:>8.0f} Ko")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"\nBenchmark export Excel - {count} lignes\n")
+    measure('Avant', legacy_export, count)
+    measure('Après', writer_export, count)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,16 @@ from drf_spectacular.utils import extend_schema, extend_schema_view
 from authentication.permissions import IsAdminOrStaffReadOnly
 from .models import User
 from .serializers import AdminUserSerializer, UserSerializer
-from installations.models import TechnicalVisit, InstallationCompleted, RepresentationMandate
+from installations.models import Form as InstallationForm, TechnicalVisit, InstallationCompleted, RepresentationMandate
 from billing.models import Quote
 from invoices.models import Invoice
 from administrative.models import Cerfa16702, EnedisMandate, Consuel
-from django.db.models import F
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.conf import settings
 from django.core.files.storage import default_storage
+from EuropGreenSolar.pagination import KeysetPagination
+from EuropGreenSolar.search import search_queryset
 
 
 @extend_schema_view(
@@ -44,6 +47,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
     """
     queryset = User.objects.all()
     serializer_class = AdminUserSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsAdminOrStaffReadOnly]
     
     def get_queryset(self):
@@ -87,7 +91,35 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         if role_param is not None:
             queryset = queryset.filter(role=role_param)
 
-        return queryset
+        # Recherche par nom, email ou téléphone
+        queryset = search_queryset(
+            queryset, self.request.query_params.get('search'), User.SEARCH_FIELDS,
+            ranked=not self.paginator.is_active(self.request),
+        )
+
+        return self.with_installations(queryset)
+
+    @staticmethod
+    def with_installations(queryset):
+        """
+        Précalcule les champs installations_count / last_installation d'AdminUserSerializer :
+        un COUNT en sous-requête et la dernière fiche de chaque client en une requête
+        (ROW_NUMBER par client), au lieu de deux requêtes par utilisateur.
+        """
+        installations_count = (
+            InstallationForm.objects.filter(client=OuterRef('pk'))
+            .order_by().values('client').annotate(total=Count('id')).values('total')
+        )
+        latest_installations = InstallationForm.objects.annotate(
+            client_rank=Window(
+                RowNumber(), partition_by=F('client_id'), order_by=[F('created_at').desc(), F('id').desc()],
+            ),
+        ).filter(client_rank=1).select_related('affected_user')
+        return queryset.annotate(
+            installations_total=Coalesce(Subquery(installations_count, output_field=IntegerField()), 0),
+        ).prefetch_related(
+            Prefetch('installations', queryset=latest_installations, to_attr='latest_installations'),
+        )
 
     @extend_schema(
         summary="Documents liés à un utilisateur",
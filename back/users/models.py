@@ -42,12 +42,22 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     # Pas de choices pour permettre les rôles dynamiques créés via Role model
     role = models.CharField(max_length=50, default=UserRoles.COLLABORATOR)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = CustomUserManager()
 
+    # Document de recherche (EuropGreenSolar.search), indexé par la migration 0003
+    SEARCH_FIELDS = ('first_name', 'last_name', 'email', 'phone_number')
+
+    class Meta:
+        indexes = [
+            # Pagination keyset de la liste (EuropGreenSolar.pagination)
+            models.Index(fields=['created_at', 'id'], name='user_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.get_full_name() or self.email
     
@@ -86,9 +96,10 @@ class UserAccess(models.Model):
 
 
 class Role(models.Model):
-    """Rôle dynamique définissable côté admin (non encore relié aux utilisateurs).
+    """Rôle dynamique définissable côté admin, relié aux utilisateurs par `User.role` (nom).
 
-    Champs d'accès calqués sur UserAccess pour réutiliser même logique d'autorisations.
+    Champs d'accès calqués sur UserAccess : les droits effectifs d'un utilisateur
+    cumulent les deux (voir `authentication.access`).
     """
     name = models.CharField(max_length=20, unique=True)
     installation = models.BooleanField(default=False)
@@ -40,6 +40,9 @@ class AdminUserSerializer(serializers.ModelSerializer):
         try:
             if obj.is_staff:
                 return 0
+            # Annoté par AdminUserViewSet.with_installations
+            if hasattr(obj, 'installations_total'):
+                return obj.installations_total
             return InstallationForm.objects.filter(client=obj).count()
         except Exception:
             return 0
@@ -49,13 +52,17 @@ class AdminUserSerializer(serializers.ModelSerializer):
         try:
             if obj.is_staff:
                 return None
-            last_qs = (
-                InstallationForm.objects
-                .select_related('affected_user')
-                .filter(client=obj)
-                .order_by('-created_at')
-            )
-            last = last_qs.first()
+            if hasattr(obj, 'latest_installations'):
+                # Préchargé par AdminUserViewSet.with_installations
+                last = obj.latest_installations[0] if obj.latest_installations else None
+            else:
+                last = (
+                    InstallationForm.objects
+                    .select_related('affected_user')
+                    .filter(client=obj)
+                    .order_by('-created_at')
+                    .first()
+                )
             if not last:
                 return None
             payload = { 